@@ -1,11 +1,38 @@
 import os
-from typing import List
-from fastapi import APIRouter, Depends, File, HTTPException, UploadFile, status, Form
-from sqlmodel import Session, select
+import asyncio
+import logging
+from datetime import datetime
+from typing import List, Optional
+from fastapi import APIRouter, Depends, File, HTTPException, UploadFile, status, Form, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import tuple_
+from sqlmodel import select, delete
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.db.database import get_session
-from app.models.image import Image, ImageRead
-from app.core.image_handler import ImageHandler
+from app.db.database import get_async_session
+from app.models.image import (
+    Image, ImageRead, ImageBatchResult, ChunkedUploadCreate, ChunkedUploadStatus,
+    ImageBulkDelete, ImageBulkDeleteResult
+)
+from app.core.image_handler import ImageHandler, ImageTooLargeError
+from app.core import image_tasks
+from app.core.chunked_upload import (
+    ChunkedUploadManager, UploadSessionNotFoundError, UploadOffsetMismatchError, UploadChecksumError
+)
+from app.core.file_serving import serve_file
+from app.core.record_cache import image_cache
+from app.core.metrics import IMAGE_UPLOAD_BYTES, IMAGE_UPLOAD_SIZE
+from app.core.image_gc import ImageGarbageCollector
+from app.core.pagination import encode_cursor, decode_cursor, escape_like, InvalidCursorError
+from app.core.thumbnail import ThumbnailCache, ThumbnailService, THUMBNAIL_FORMATS
+from app.core.config import (
+    IMAGE_MAX_SIZE, IMAGE_UPLOAD_CHUNK_SIZE, IMAGE_DEDUP_ENABLED, IMAGE_BATCH_MAX_FILES, IMAGE_BATCH_CONCURRENCY,
+    IMAGE_CHUNKED_UPLOAD_DIR, IMAGE_CHUNKED_UPLOAD_TTL, IMAGE_GC_GRACE_SECONDS, IMAGE_GC_RATE_LIMIT,
+    THUMBNAIL_CACHE_DIR, THUMBNAIL_CACHE_MAX_BYTES, THUMBNAIL_WORKERS, THUMBNAIL_MAX_DIMENSION
+)
+
+# 创建日志记录器
+logger = logging.getLogger("images_api")
 
 router = APIRouter()
 
@@ -14,14 +41,33 @@ STATIC_FILES_DIR = os.getenv("STATIC_FILES_DIR", "app/static/images")
 BASE_URL = os.getenv("BASE_URL", "http://localhost:8000")
 
 # 创建图片处理器
-image_handler = ImageHandler(STATIC_FILES_DIR, BASE_URL)
+image_handler = ImageHandler(STATIC_FILES_DIR, BASE_URL, IMAGE_MAX_SIZE, IMAGE_UPLOAD_CHUNK_SIZE, IMAGE_DEDUP_ENABLED)
+
+# 创建分块上传管理器
+chunked_upload_manager = ChunkedUploadManager(IMAGE_CHUNKED_UPLOAD_DIR, IMAGE_MAX_SIZE, IMAGE_CHUNKED_UPLOAD_TTL)
+
+# 创建存储垃圾回收器
+garbage_collector = ImageGarbageCollector(STATIC_FILES_DIR, IMAGE_GC_GRACE_SECONDS, IMAGE_GC_RATE_LIMIT)
+
+# 创建缩略图服务
+thumbnail_service = ThumbnailService(
+    STATIC_FILES_DIR,
+    ThumbnailCache(THUMBNAIL_CACHE_DIR, THUMBNAIL_CACHE_MAX_BYTES),
+    THUMBNAIL_WORKERS
+)
+
+
+def record_upload_size(size: int, mode: str):
+    """记录上传字节数指标"""
+    IMAGE_UPLOAD_BYTES.inc(size, mode=mode)
+    IMAGE_UPLOAD_SIZE.observe(size, mode=mode)
 
 
 @router.post("/upload", response_model=ImageRead, status_code=status.HTTP_201_CREATED)
 async def upload_image(
     file: UploadFile = File(...),
     description: str = Form(None),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     """
     上传图片API
@@ -36,6 +82,7 @@ async def upload_image(
     try:
         # 保存图片
         image_data = await image_handler.save_image(file)
+        record_upload_size(image_data["size"], "single")
         
         # 添加描述
         if description:
@@ -44,10 +91,17 @@ async def upload_image(
         # 保存到数据库
         image = Image(**image_data)
         session.add(image)
-        session.commit()
-        session.refresh(image)
+        await session.commit()
+        await session.refresh(image)
+        await image_cache.ainvalidate(image.id)
         
+        image_tasks.schedule_post_upload(image.id)
         return image
+    except ImageTooLargeError as e:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"上传图片失败: {str(e)}"
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -55,21 +109,314 @@ async def upload_image(
         )
 
 
+@router.post("/batch", response_model=List[ImageBatchResult])
+async def upload_images_batch(
+    files: List[UploadFile] = File(...),
+    description: str = Form(None),
+    session: AsyncSession = Depends(get_async_session)
+):
+    """
+    批量上传图片API
+    
+    文件并发写盘（受 IMAGE_BATCH_CONCURRENCY 限制），所有成功的记录在同一事务中写入数据库。
+    返回每个文件的结果，单个文件失败不影响其他文件。
+    """
+    if len(files) > IMAGE_BATCH_MAX_FILES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"单次最多上传 {IMAGE_BATCH_MAX_FILES} 个文件"
+        )
+    
+    semaphore = asyncio.Semaphore(IMAGE_BATCH_CONCURRENCY)
+    
+    async def save_one(file: UploadFile) -> dict:
+        if not file.content_type or not file.content_type.startswith("image/"):
+            raise ValueError("只允许上传图片文件")
+        async with semaphore:
+            image_data = await image_handler.save_image(file)
+        record_upload_size(image_data["size"], "batch")
+        return image_data
+    
+    saved = await asyncio.gather(*(save_one(file) for file in files), return_exceptions=True)
+    
+    results: List[Optional[ImageBatchResult]] = [None] * len(files)
+    images = []
+    written_paths = []
+    for index, (file, outcome) in enumerate(zip(files, saved)):
+        if isinstance(outcome, BaseException):
+            logger.warning(f"批量上传文件失败: {file.filename}, {outcome}")
+            results[index] = ImageBatchResult(filename=file.filename, success=False, error=str(outcome))
+            continue
+        if description:
+            outcome["description"] = description
+        images.append((index, Image(**outcome)))
+        written_paths.append(outcome["file_path"])
+    
+    if images:
+        try:
+            session.add_all([image for _, image in images])
+            await session.flush()
+            for index, image in images:
+                results[index] = ImageBatchResult(
+                    filename=image.original_filename,
+                    success=True,
+                    image=ImageRead.model_validate(image)
+                )
+            await session.commit()
+        except Exception as e:
+            await session.rollback()
+            # 事务失败时清理本次写入的非共享文件，去重存储的文件交给垃圾回收处理
+            if not image_handler.dedup:
+                for relative_path in written_paths:
+                    file_path = os.path.join(STATIC_FILES_DIR, relative_path)
+                    if os.path.exists(file_path):
+                        os.remove(file_path)
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"批量上传图片失败: {str(e)}"
+            )
+    
+    await image_cache.ainvalidate(*[result.image.id for result in results if result.success])
+    for result in results:
+        if result.success:
+            image_tasks.schedule_post_upload(result.image.id)
+    
+    logger.info(f"批量上传完成: 成功 {len(images)} 个, 失败 {len(files) - len(images)} 个")
+    return results
+
+
+@router.post("/uploads", response_model=ChunkedUploadStatus, status_code=status.HTTP_201_CREATED)
+def create_chunked_upload(upload: ChunkedUploadCreate):
+    """
+    创建可续传的分块上传会话
+    
+    - **filename**: 原始文件名
+    - **content_type**: 图片MIME类型
+    - **size**: 文件总字节数
+    - **sha256**: 文件SHA-256（可选，完成时校验）
+    """
+    if not upload.content_type.startswith("image/"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="只允许上传图片文件"
+        )
+    try:
+        return chunked_upload_manager.create(upload.filename, upload.content_type, upload.size, upload.sha256)
+    except ImageTooLargeError as e:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=str(e)
+        )
+
+
+@router.get("/uploads/{upload_id}", response_model=ChunkedUploadStatus)
+def get_chunked_upload(upload_id: str):
+    """
+    查询分块上传会话已接收的字节数，客户端据此从断点续传
+    """
+    try:
+        return chunked_upload_manager.status(upload_id)
+    except UploadSessionNotFoundError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="上传会话不存在或已过期"
+        )
+
+
+@router.put("/uploads/{upload_id}", response_model=ChunkedUploadStatus)
+async def put_chunked_upload(upload_id: str, request: Request, offset: int = Query(..., ge=0)):
+    """
+    上传一个分块，请求体为原始字节
+    
+    - **offset**: 分块起始位置，必须等于服务端已接收的字节数，不一致时返回409及当前偏移量
+    """
+    try:
+        return await chunked_upload_manager.append(upload_id, offset, request.stream())
+    except UploadSessionNotFoundError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="上传会话不存在或已过期"
+        )
+    except UploadOffsetMismatchError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={"message": str(e), "offset": e.expected}
+        )
+    except UploadChecksumError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+
+@router.post("/uploads/{upload_id}/complete", response_model=ImageRead, status_code=status.HTTP_201_CREATED)
+async def complete_chunked_upload(
+    upload_id: str,
+    description: str = Form(None),
+    session: AsyncSession = Depends(get_async_session)
+):
+    """
+    完成分块上传：校验文件大小和SHA-256后保存为图片
+    """
+    try:
+        # 记录提交成功后才结束会话；失败时数据文件放回原处，客户端可重新完成
+        async with chunked_upload_manager.finalize(upload_id) as (data_path, meta, file_hash):
+            image_data = await image_handler.store_file(
+                data_path, meta["filename"], meta["content_type"], meta["size"], file_hash
+            )
+            try:
+                if description:
+                    image_data["description"] = description
+                image = Image(**image_data)
+                session.add(image)
+                await session.commit()
+                await session.refresh(image)
+            except Exception:
+                await session.rollback()
+                await image_handler.unstore_file(image_data["file_path"], data_path)
+                raise
+    except UploadSessionNotFoundError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="上传会话不存在或已过期"
+        )
+    except UploadChecksumError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"上传图片失败: {str(e)}"
+        )
+    
+    record_upload_size(image_data["size"], "chunked")
+    await image_cache.ainvalidate(image.id)
+    image_tasks.schedule_post_upload(image.id)
+    return image
+
+
+@router.delete("/uploads/{upload_id}", status_code=status.HTTP_204_NO_CONTENT)
+def abort_chunked_upload(upload_id: str):
+    """
+    取消分块上传会话
+    """
+    try:
+        chunked_upload_manager.abort(upload_id)
+    except UploadSessionNotFoundError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="上传会话不存在或已过期"
+        )
+
+
+@router.post("/bulk-delete", response_model=ImageBulkDeleteResult)
+async def bulk_delete_images(request: ImageBulkDelete, session: AsyncSession = Depends(get_async_session)):
+    """
+    批量删除图片
+    
+    数据库记录在同一事务中删除，文件在响应返回后由后台线程删除；
+    去重存储下仍被其他记录引用的文件会保留。
+    """
+    ids = list(dict.fromkeys(request.ids))
+    rows = (await session.exec(select(Image.id, Image.file_path).where(Image.id.in_(ids)))).all()
+    found = {image_id: file_path for image_id, file_path in rows}
+    
+    try:
+        if found:
+            await session.exec(delete(Image).where(Image.id.in_(list(found))))
+            paths = set(found.values())
+            still_referenced = set((await session.exec(
+                select(Image.file_path).where(Image.file_path.in_(paths))
+            )).all())
+            await session.commit()
+            await image_cache.ainvalidate(*found)
+            image_tasks.schedule_file_removal(sorted(paths - still_referenced))
+    except Exception as e:
+        await session.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"批量删除图片失败: {str(e)}"
+        )
+    
+    logger.info(f"批量删除图片: {len(found)} 条")
+    return ImageBulkDeleteResult(
+        deleted=[image_id for image_id in ids if image_id in found],
+        not_found=[image_id for image_id in ids if image_id not in found]
+    )
+
+
+@router.post("/gc")
+async def collect_garbage(dry_run: bool = False):
+    """
+    立即执行一次存储垃圾回收，清理孤儿文件和悬空记录
+    
+    - **dry_run**: 只统计不删除
+    """
+    return await run_in_threadpool(garbage_collector.collect, dry_run)
+
+
 @router.get("/", response_model=List[ImageRead])
-def get_images(session: Session = Depends(get_session)):
+async def get_images(
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    content_type: Optional[str] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    filename_prefix: Optional[str] = None,
+    session: AsyncSession = Depends(get_async_session)
+):
     """
-    获取所有图片
+    分页获取图片，按上传时间倒序
+    
+    使用 (created_at, id) 键集分页，下一页游标通过响应头 X-Next-Cursor 返回，
+    为空表示已到最后一页。
+    
+    - **limit**: 每页数量
+    - **cursor**: 上一页返回的游标
+    - **content_type**: 按MIME类型过滤
+    - **created_after** / **created_before**: 按上传时间范围过滤
+    - **filename_prefix**: 按原始文件名前缀过滤
     """
-    images = session.exec(select(Image).order_by(Image.created_at.desc())).all()
+    try:
+        position = decode_cursor(cursor)
+    except InvalidCursorError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    statement = select(Image)
+    if position:
+        statement = statement.where(tuple_(Image.created_at, Image.id) < position)
+    if content_type:
+        statement = statement.where(Image.content_type == content_type)
+    if created_after:
+        statement = statement.where(Image.created_at >= created_after)
+    if created_before:
+        statement = statement.where(Image.created_at < created_before)
+    if filename_prefix:
+        statement = statement.where(Image.original_filename.like(f"{escape_like(filename_prefix)}%", escape="\\"))
+    
+    # 多取一条用于判断是否还有下一页
+    statement = statement.order_by(Image.created_at.desc(), Image.id.desc()).limit(limit + 1)
+    images = (await session.exec(statement)).all()
+    
+    if len(images) > limit:
+        images = images[:limit]
+        last = images[-1]
+        response.headers["X-Next-Cursor"] = encode_cursor(last.created_at, last.id)
     return images
 
 
 @router.get("/{image_id}", response_model=ImageRead)
-def get_image(image_id: int, session: Session = Depends(get_session)):
+async def get_image(image_id: int, session: AsyncSession = Depends(get_async_session)):
     """
     获取单张图片信息
     """
-    image = session.get(Image, image_id)
+    image = await image_cache.get_or_load(image_id, lambda: session.get(Image, image_id))
     if not image:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -78,12 +425,69 @@ def get_image(image_id: int, session: Session = Depends(get_session)):
     return image
 
 
+@router.get("/{image_id}/thumb")
+async def get_image_thumbnail(
+    image_id: int,
+    request: Request,
+    w: int = Query(200, ge=1, le=THUMBNAIL_MAX_DIMENSION),
+    h: int = Query(200, ge=1, le=THUMBNAIL_MAX_DIMENSION),
+    fmt: str = Query("webp"),
+    session: AsyncSession = Depends(get_async_session)
+):
+    """
+    获取图片缩略图
+    
+    - **w**: 最大宽度
+    - **h**: 最大高度
+    - **fmt**: 输出格式（webp/jpeg/png）
+    """
+    if fmt not in THUMBNAIL_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"不支持的缩略图格式: {fmt}"
+        )
+    
+    image = await image_cache.get_or_load(image_id, lambda: session.get(Image, image_id))
+    if not image:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="图片不存在"
+        )
+    
+    source_path = os.path.join(STATIC_FILES_DIR, image.file_path)
+    if not os.path.exists(source_path):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="图片文件不存在"
+        )
+    
+    # SVG为矢量图，无需缩放，直接返回原图
+    if image.content_type == "image/svg+xml":
+        return await serve_file(request, source_path, media_type=image.content_type)
+    
+    try:
+        thumb_path = await thumbnail_service.get_thumbnail(image.file_path, w, h, fmt)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"生成缩略图失败: {str(e)}"
+        )
+    
+    # 缓存键由原图路径和尺寸决定，内容不会变化，直接作为ETag
+    return await serve_file(
+        request,
+        thumb_path,
+        media_type=THUMBNAIL_FORMATS[fmt],
+        etag=f'"{os.path.basename(thumb_path)}"'
+    )
+
+
 @router.delete("/{image_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_image(image_id: int, session: Session = Depends(get_session)):
+async def delete_image(image_id: int, session: AsyncSession = Depends(get_async_session)):
     """
     删除图片
     """
-    image = session.get(Image, image_id)
+    image = await session.get(Image, image_id)
     if not image:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -91,14 +495,17 @@ def delete_image(image_id: int, session: Session = Depends(get_session)):
         )
     
     try:
-        # 删除文件
-        file_path = os.path.join(STATIC_FILES_DIR, image.file_path)
-        if os.path.exists(file_path):
-            os.remove(file_path)
+        # 删除文件（去重存储下文件可能被其他记录共享，仅在无人引用时删除）
+        shared = (await session.exec(
+            select(Image.id).where(Image.file_path == image.file_path, Image.id != image.id).limit(1)
+        )).first()
+        if shared is None:
+            await run_in_threadpool(image_tasks.remove_image_files, [image.file_path])
         
         # 从数据库删除记录
-        session.delete(image)
-        session.commit()
+        await session.delete(image)
+        await session.commit()
+        await image_cache.ainvalidate(image_id)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -1,33 +1,116 @@
 import os
+import json
+import time
+import asyncio
 import traceback
 import logging
-from typing import List, Optional, Dict, Any
-from fastapi import APIRouter, Depends, File, HTTPException, UploadFile, status, Form
-from fastapi.responses import FileResponse, PlainTextResponse
-from sqlmodel import Session, select
+from typing import AsyncIterator, List, Optional, Dict, Any
+from fastapi import (
+    APIRouter, Depends, File, HTTPException, UploadFile, status, Form, Query, Response, Header, WebSocket,
+    WebSocketDisconnect
+)
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import tuple_
+from sqlmodel import select, delete
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.db.database import get_session
-from app.models.pdf_convert import PDFConversion, PDFConversionRead
-from app.core.pdf_handler import PDFHandler
-from app.core.config import AI_BASE_URL, AI_MODEL, BASE_URL, PDF_UPLOAD_DIR as UPLOAD_DIR, PDF_OUTPUT_DIR as OUTPUT_DIR
+from app.db.database import get_async_session, async_session_maker
+from app.models.pdf_convert import (
+    PDFConversion, PDFConversionSummary, PDFConversionMeta, PDFSearchHit, PDFJob, PDFJobRead, PDFJobEvent
+)
+from app.core.pdf_jobs import PDFJobQueue, TERMINAL_EVENTS, new_event, get_pdf_handler, get_text_store, get_search_index
+from app.core.record_cache import conversion_cache
+from app.core.pagination import encode_cursor, decode_cursor, InvalidCursorError
+from app.core.metrics import PDF_STAGE_DURATION, PDF_CONVERSIONS
+from app.core.config import BASE_URL, PDF_OUTPUT_DIR as OUTPUT_DIR
+from app.core.config import (
+    PDF_JOB_WORKERS, PDF_JOB_MAX_ATTEMPTS, PDF_JOB_POLL_INTERVAL, PDF_JOB_HEARTBEAT_INTERVAL, PDF_JOB_STALE_SECONDS,
+    PDF_JOB_RETENTION_SECONDS, PDF_JOB_EVENT_POLL_INTERVAL, PDF_JOB_EVENT_KEEPALIVE
+)
 
 # 创建日志记录器
 logger = logging.getLogger("pdfs_api")
 
 router = APIRouter()
 
-# 创建PDF处理器
-pdf_handler = PDFHandler(UPLOAD_DIR, OUTPUT_DIR, BASE_URL, AI_BASE_URL, AI_MODEL)
+# 转换任务调度，由应用启动时启动
+pdf_job_queue = PDFJobQueue(
+    PDF_JOB_WORKERS, PDF_JOB_MAX_ATTEMPTS, PDF_JOB_POLL_INTERVAL, PDF_JOB_HEARTBEAT_INTERVAL, PDF_JOB_STALE_SECONDS,
+    PDF_JOB_RETENTION_SECONDS
+)
 
+# 摘要查询只读取这些列，不加载LONGTEXT文本列
+SUMMARY_COLUMNS = (
+    PDFConversion.id,
+    PDFConversion.original_filename,
+    PDFConversion.output_filename,
+    PDFConversion.file_path,
+    PDFConversion.page_count,
+    PDFConversion.markdown_path,
+    PDFConversion.created_at,
+)
 
-@router.post("/convert", response_model=PDFConversionRead, status_code=status.HTTP_201_CREATED)
+# 记录缓存保存摘要列和文本哈希
+CACHED_COLUMNS = SUMMARY_COLUMNS + (PDFConversion.text_hash, PDFConversion.processed_text_hash)
+
+# 旧数据和 TEXT_STORE_BACKEND=inline 时文本所在的列
+TEXT_COLUMNS = {"text": PDFConversion.text_content, "processed": PDFConversion.processed_text}
+
+
+async def load_text(session: AsyncSession, conversion_id: int, kind: str, content_hash: Optional[str]) -> Optional[str]:
+    """读取文本：有内容哈希时从文本存储中解压，否则只查询主表中对应的文本列（旧数据）"""
+    text_store = get_text_store()
+    if content_hash and text_store:
+        text = await run_in_threadpool(text_store.get, conversion_id, kind, content_hash)
+        if text is None:
+            logger.error(f"文本存储中缺少内容: ID {conversion_id}, {kind}, {content_hash}")
+        return text
+    return (await session.exec(select(TEXT_COLUMNS[kind]).where(PDFConversion.id == conversion_id))).first()
+
+
+async def get_cached_conversion(session: AsyncSession, conversion_id: int) -> Optional[PDFConversionMeta]:
+    """按ID读取转换记录的摘要和文本哈希（不加载文本列），经过记录缓存"""
+    async def load() -> Optional[PDFConversionMeta]:
+        row = (await session.exec(select(*CACHED_COLUMNS).where(PDFConversion.id == conversion_id))).first()
+        return PDFConversionMeta(**row._mapping) if row else None
+    
+    return await conversion_cache.get_or_load(conversion_id, load)
+
+
+def job_status_url(job_id: int) -> str:
+    """任务状态查询URL"""
+    return f"{BASE_URL}/api/pdfs/jobs/{job_id}"
+
+
+def build_job_read(job: PDFJob) -> PDFJobRead:
+    """构建任务状态响应，附带状态查询URL"""
+    job_read = PDFJobRead.model_validate(job, from_attributes=True)
+    job_read.status_url = job_status_url(job.id)
+    return job_read
+
+
+def build_summary(row) -> PDFConversionSummary:
+    """由摘要列查询结果（或完整记录）构建响应，附带下载URL"""
+    summary = PDFConversionSummary(**(row._mapping if hasattr(row, "_mapping") else row.model_dump()))
+    summary.download_url = f"{BASE_URL}/api/pdfs/download/{summary.output_filename}"
+    if summary.markdown_path:
+        markdown_filename = os.path.basename(summary.markdown_path)
+        summary.markdown_url = f"{BASE_URL}/api/pdfs/download-markdown/{markdown_filename}"
+    return summary
+
+
+@router.post("/convert", response_model=PDFJobRead, status_code=status.HTTP_202_ACCEPTED)
 async def convert_pdf(
+    response: Response,
     file: UploadFile = File(...),
     description: Optional[str] = Form(None),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     """
-    上传PDF文件并转换为Word文档
+    上传PDF文件，提交转换为Word文档的任务
+    
+    转换在后台工作进程中执行，立即返回任务信息；通过 /jobs/{job_id} 查询进度和结果。
     
     - **file**: 要上传的PDF文件
     - **description**: 文档描述信息
@@ -60,74 +143,32 @@ async def convert_pdf(
             )
         
         # 保存上传的PDF文件
-        pdf_path = await pdf_handler.save_pdf(file)
+        with PDF_STAGE_DURATION.time(stage="save"):
+            pdf_path = await get_pdf_handler().save_pdf(file)
         logger.info(f"PDF文件已保存到: {pdf_path}")
         
         # 检查保存的文件
-        if not os.path.exists(pdf_path):
+        if not os.path.exists(pdf_path) or os.path.getsize(pdf_path) == 0:
             logger.error("保存PDF文件失败")
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="保存PDF文件失败"
             )
-            
-        saved_size = os.path.getsize(pdf_path)
-        logger.info(f"保存的PDF文件大小: {saved_size} 字节")
-        
-        if saved_size == 0:
-            logger.error("保存的PDF文件为空")
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="保存的PDF文件为空"
-            )
-        
-        # 转换PDF到Word
-        logger.info("开始转换PDF到Word...")
-        output_path, page_count, text_content, processed_text, markdown_path = pdf_handler.convert_pdf_to_word(pdf_path,description)
-        logger.info(f"转换完成，输出路径: {output_path}, 页数: {page_count}")
         
-        # 检查生成的文件
-        if not os.path.exists(output_path):
-            logger.error("生成Word文档失败")
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="生成Word文档失败"
-            )
-            
-        output_size = os.path.getsize(output_path)
-        logger.info(f"生成的Word文档大小: {output_size} 字节")
+        # 提交转换任务
+        job = PDFJob(original_filename=file.filename, pdf_path=pdf_path, description=description)
+        session.add(job)
+        await session.flush()
+        session.add(new_event(job.id, "upload_saved", progress=0, filename=file.filename, size=file_size))
+        await session.commit()
+        await session.refresh(job)
+        pdf_job_queue.notify()
         
-        # 相对路径，用于URL
-        relative_path = os.path.relpath(output_path, OUTPUT_DIR)
-        markdown_relative_path = os.path.relpath(markdown_path, OUTPUT_DIR) if markdown_path and os.path.exists(markdown_path) else None
-        
-        # 保存转换记录到数据库
-        conversion = PDFConversion(
-            original_filename=file.filename,
-            output_filename=os.path.basename(output_path),
-            file_path=relative_path,
-            page_count=page_count,
-            text_content=text_content,
-            processed_text=processed_text,
-            markdown_path=markdown_relative_path
-        )
-        
-        session.add(conversion)
-        session.commit()
-        session.refresh(conversion)
-        
-        # 构建下载URL
-        download_url = f"{BASE_URL}/api/pdfs/download/{os.path.basename(output_path)}"
-        markdown_url = f"{BASE_URL}/api/pdfs/download-markdown/{os.path.basename(markdown_path)}" if markdown_relative_path else None
-        logger.info(f"转换成功，下载URL: {download_url}")
-        
-        # 返回结果
-        return {
-            **conversion.dict(),
-            "download_url": download_url,
-            "markdown_url": markdown_url
-        }
+        logger.info(f"已提交转换任务: ID {job.id}")
+        response.headers["Location"] = job_status_url(job.id)
+        return build_job_read(job)
     except HTTPException as he:
+        PDF_CONVERSIONS.inc(result="rejected")
         # 重新抛出HTTP异常
         if pdf_path and os.path.exists(pdf_path):
             os.remove(pdf_path)
@@ -135,8 +176,9 @@ async def convert_pdf(
         raise he
     except Exception as e:
         # 打印详细错误信息
-        logger.error(f"转换PDF时出错: {str(e)}")
+        logger.error(f"提交转换任务时出错: {str(e)}")
         logger.error(traceback.format_exc())
+        PDF_CONVERSIONS.inc(result="error")
         
         # 发生错误时删除临时文件
         if pdf_path and os.path.exists(pdf_path):
@@ -145,18 +187,41 @@ async def convert_pdf(
             
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"转换失败: {str(e)}"
+            detail=f"提交转换任务失败: {str(e)}"
+        )
+
+
+@router.get("/jobs/{job_id}", response_model=PDFJobRead)
+async def get_job(job_id: int, session: AsyncSession = Depends(get_async_session)):
+    """
+    查询PDF转换任务的状态和进度
+    
+    状态为 queued / running / done / failed；完成后 result 中包含转换记录摘要和下载URL。
+    """
+    job = await session.get(PDFJob, job_id)
+    if not job:
+        logger.warning(f"未找到转换任务: ID {job_id}")
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="转换任务不存在"
         )
+    
+    job_read = build_job_read(job)
+    if job.conversion_id:
+        conversion = await get_cached_conversion(session, job.conversion_id)
+        if conversion:
+            job_read.result = build_summary(conversion)
+    return job_read
 
 
 @router.get("/{conversion_id}/text", response_class=PlainTextResponse)
-def get_conversion_text(conversion_id: int, session: Session = Depends(get_session)):
+async def get_conversion_text(conversion_id: int, session: AsyncSession = Depends(get_async_session)):
     """
     获取PDF转换的原始文本内容
     
     - **conversion_id**: 转换记录ID
     """
-    conversion = session.get(PDFConversion, conversion_id)
+    conversion = await get_cached_conversion(session, conversion_id)
     if not conversion:
         logger.warning(f"未找到转换记录: ID {conversion_id}")
         raise HTTPException(
@@ -164,22 +229,23 @@ def get_conversion_text(conversion_id: int, session: Session = Depends(get_sessi
             detail="转换记录不存在"
         )
     
-    if not conversion.text_content:
+    text_content = await load_text(session, conversion_id, "text", conversion.text_hash)
+    if not text_content:
         logger.warning(f"转换记录 {conversion_id} 没有文本内容")
         return "此PDF文件没有提取到文本内容"
     
     logger.info(f"获取转换记录 {conversion_id} 的原始文本内容")
-    return conversion.text_content
+    return text_content
 
 
 @router.get("/{conversion_id}/processed_text", response_class=PlainTextResponse)
-def get_conversion_processed_text(conversion_id: int, session: Session = Depends(get_session)):
+async def get_conversion_processed_text(conversion_id: int, session: AsyncSession = Depends(get_async_session)):
     """
     获取PDF转换的AI处理后的文本内容
     
     - **conversion_id**: 转换记录ID
     """
-    conversion = session.get(PDFConversion, conversion_id)
+    conversion = await get_cached_conversion(session, conversion_id)
     if not conversion:
         logger.warning(f"未找到转换记录: ID {conversion_id}")
         raise HTTPException(
@@ -187,22 +253,23 @@ def get_conversion_processed_text(conversion_id: int, session: Session = Depends
             detail="转换记录不存在"
         )
     
-    if not conversion.processed_text:
+    processed_text = await load_text(session, conversion_id, "processed", conversion.processed_text_hash)
+    if not processed_text:
         logger.warning(f"转换记录 {conversion_id} 没有AI处理后的文本内容")
         return "此PDF文件没有AI处理后的文本内容"
     
     logger.info(f"获取转换记录 {conversion_id} 的AI处理后的文本内容")
-    return conversion.processed_text
+    return processed_text
 
 
 @router.get("/{conversion_id}/text_json")
-def get_conversion_text_json(conversion_id: int, session: Session = Depends(get_session)) -> Dict[str, Any]:
+async def get_conversion_text_json(conversion_id: int, session: AsyncSession = Depends(get_async_session)) -> Dict[str, Any]:
     """
     获取PDF转换的文本内容（JSON格式）
     
     - **conversion_id**: 转换记录ID
     """
-    conversion = session.get(PDFConversion, conversion_id)
+    conversion = await get_cached_conversion(session, conversion_id)
     if not conversion:
         logger.warning(f"未找到转换记录: ID {conversion_id}")
         raise HTTPException(
@@ -210,52 +277,219 @@ def get_conversion_text_json(conversion_id: int, session: Session = Depends(get_
             detail="转换记录不存在"
         )
     
+    text_content = await load_text(session, conversion_id, "text", conversion.text_hash)
+    processed_text = await load_text(session, conversion_id, "processed", conversion.processed_text_hash)
+    
     logger.info(f"获取转换记录 {conversion_id} 的文本内容（JSON格式）")
     return {
         "id": conversion.id,
         "original_filename": conversion.original_filename,
         "page_count": conversion.page_count,
-        "text_content": conversion.text_content or "此PDF文件没有提取到文本内容",
-        "processed_text": conversion.processed_text or "此PDF文件没有AI处理后的文本内容"
+        "text_content": text_content or "此PDF文件没有提取到文本内容",
+        "processed_text": processed_text or "此PDF文件没有AI处理后的文本内容"
     }
 
 
-@router.get("/", response_model=List[PDFConversionRead])
-def get_conversions(session: Session = Depends(get_session)):
+async def iter_job_events(job_id: int, after: int = 0) -> AsyncIterator[Optional[PDFJobEvent]]:
     """
-    获取所有PDF转换记录
+    按顺序读取任务ID大于after的进度事件，读到 done/failed 后结束
+    
+    事件由工作进程写入数据库，这里按间隔轮询；长时间没有新事件时产出None，用于保活。
     """
-    conversions = session.exec(select(PDFConversion).order_by(PDFConversion.created_at.desc())).all()
-    logger.info(f"获取转换记录列表，共 {len(conversions)} 条")
-    return conversions
+    last_id = after
+    idle_since = time.monotonic()
+    while True:
+        async with async_session_maker() as session:
+            events = (await session.exec(
+                select(PDFJobEvent)
+                .where(PDFJobEvent.job_id == job_id, PDFJobEvent.id > last_id)
+                .order_by(PDFJobEvent.id)
+                .limit(500)
+            )).all()
+            if not events:
+                # 续传位置已在结束事件之后
+                job = await session.get(PDFJob, job_id)
+                if job is None or job.status in TERMINAL_EVENTS:
+                    return
+        
+        for event in events:
+            last_id = event.id
+            yield event
+            if event.event in TERMINAL_EVENTS:
+                return
+        
+        if events:
+            idle_since = time.monotonic()
+        elif time.monotonic() - idle_since >= PDF_JOB_EVENT_KEEPALIVE:
+            idle_since = time.monotonic()
+            yield None
+        await asyncio.sleep(PDF_JOB_EVENT_POLL_INTERVAL)
 
 
-@router.get("/{conversion_id}", response_model=PDFConversionRead)
-def get_conversion(conversion_id: int, session: Session = Depends(get_session)):
+def event_payload(event: PDFJobEvent) -> Dict[str, Any]:
+    """WebSocket推送的事件内容"""
+    return {"id": event.id, "event": event.event, "data": json.loads(event.data)}
+
+
+@router.get("/jobs/{job_id}/events")
+async def stream_job_events(
+    job_id: int,
+    after: int = Query(0, ge=0),
+    last_event_id: Optional[int] = Header(None),
+    session: AsyncSession = Depends(get_async_session)
+):
     """
-    获取单个PDF转换记录
+    以Server-Sent Events推送转换任务的进度事件，任务结束（done/failed）后关闭
+    
+    事件依次为 upload_saved、started、pages_extracted、docx_written、ai_tokens（累计输出段数和字符数）、
+    markdown_written、ragflow_pushed，失败重试时为 retrying。断线重连时浏览器自动携带 Last-Event-ID，从该事件之后继续推送。
+    
+    - **after**: 只推送ID大于该值的事件
     """
-    conversion = session.get(PDFConversion, conversion_id)
-    if not conversion:
+    if not await session.get(PDFJob, job_id):
+        logger.warning(f"未找到转换任务: ID {job_id}")
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="转换任务不存在"
+        )
+    
+    async def events():
+        async for event in iter_job_events(job_id, max(after, last_event_id or 0)):
+            if event is None:
+                yield ": keep-alive\n\n"
+                continue
+            yield f"id: {event.id}\nevent: {event.event}\ndata: {event.data}\n\n"
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # 禁止代理缓冲，事件即时送达
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.websocket("/jobs/{job_id}/ws")
+async def job_events_websocket(websocket: WebSocket, job_id: int, after: int = 0):
+    """
+    以WebSocket推送转换任务的进度事件（JSON: id、event、data），任务结束后关闭
+    """
+    async with async_session_maker() as session:
+        job = await session.get(PDFJob, job_id)
+    if not job:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="转换任务不存在")
+        return
+    
+    await websocket.accept()
+    try:
+        async for event in iter_job_events(job_id, after):
+            if event is not None:
+                await websocket.send_json(event_payload(event))
+        await websocket.close()
+    except WebSocketDisconnect:
+        logger.info(f"进度推送连接已断开: 任务 ID {job_id}")
+
+
+@router.get("/search", response_model=List[PDFSearchHit])
+async def search_conversions(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0, le=1000),
+    session: AsyncSession = Depends(get_async_session)
+):
+    """
+    按内容全文搜索PDF转换记录，返回按相关度排序的命中页和摘要
+    
+    - **q**: 搜索词，多个词用空格分隔，需同时命中；不少于3个字符的词走索引
+    - **limit** / **offset**: 分页
+    """
+    search_index = get_search_index()
+    if not search_index:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="未启用全文索引"
+        )
+    
+    try:
+        hits = await run_in_threadpool(search_index.search, q, limit, offset)
+    except Exception as e:
+        logger.error(f"全文搜索失败: {q}, {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"搜索失败: {str(e)}"
+        )
+    if not hits:
+        return []
+    
+    # 补充文件名，忽略索引中残留的已删除记录
+    ids = {hit["conversion_id"] for hit in hits}
+    rows = (await session.exec(
+        select(PDFConversion.id, PDFConversion.original_filename, PDFConversion.output_filename)
+        .where(PDFConversion.id.in_(ids))
+    )).all()
+    records = {row.id: row for row in rows}
+    
+    results = []
+    for hit in hits:
+        record = records.get(hit["conversion_id"])
+        if record is None:
+            continue
+        results.append(PDFSearchHit(
+            **hit,
+            original_filename=record.original_filename,
+            download_url=f"{BASE_URL}/api/pdfs/download/{record.output_filename}"
+        ))
+    logger.info(f"全文搜索: {q}, 命中 {len(results)} 页")
+    return results
+
+
+@router.get("/", response_model=List[PDFConversionSummary])
+async def get_conversions(
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    session: AsyncSession = Depends(get_async_session)
+):
+    """
+    分页获取PDF转换记录摘要，按创建时间倒序
+    
+    不包含文本内容，全文请通过 /{conversion_id}/text 等接口获取。
+    下一页游标通过响应头 X-Next-Cursor 返回，为空表示已到最后一页。
+    """
+    try:
+        position = decode_cursor(cursor)
+    except InvalidCursorError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    statement = select(*SUMMARY_COLUMNS)
+    if position:
+        statement = statement.where(tuple_(PDFConversion.created_at, PDFConversion.id) < position)
+    statement = statement.order_by(PDFConversion.created_at.desc(), PDFConversion.id.desc()).limit(limit + 1)
+    rows = (await session.exec(statement)).all()
+    
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(rows[-1].created_at, rows[-1].id)
+    logger.info(f"获取转换记录列表，本页 {len(rows)} 条")
+    return [build_summary(row) for row in rows]
+
+
+@router.get("/{conversion_id}", response_model=PDFConversionSummary)
+async def get_conversion(conversion_id: int, session: AsyncSession = Depends(get_async_session)):
+    """
+    获取单个PDF转换记录（摘要，不含文本内容）
+    """
+    row = await get_cached_conversion(session, conversion_id)
+    if not row:
         logger.warning(f"未找到转换记录: ID {conversion_id}")
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="转换记录不存在"
         )
     logger.info(f"获取转换记录: ID {conversion_id}")
-    
-    # 构建下载URL
-    download_url = f"{BASE_URL}/api/pdfs/download/{conversion.output_filename}"
-    markdown_url = None
-    if conversion.markdown_path:
-        markdown_filename = os.path.basename(conversion.markdown_path)
-        markdown_url = f"{BASE_URL}/api/pdfs/download-markdown/{markdown_filename}"
-    
-    return {
-        **conversion.dict(),
-        "download_url": download_url,
-        "markdown_url": markdown_url
-    }
+    return build_summary(row)
 
 
 @router.get("/download/{filename}")
@@ -315,11 +549,14 @@ def download_markdown(filename: str):
 
 
 @router.delete("/{conversion_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_conversion(conversion_id: int, session: Session = Depends(get_session)):
+async def delete_conversion(conversion_id: int, session: AsyncSession = Depends(get_async_session)):
     """
     删除PDF转换记录
     """
-    conversion = session.get(PDFConversion, conversion_id)
+    # 只查询删除文件所需的列，不加载文本列
+    conversion = (await session.exec(
+        select(PDFConversion.file_path, PDFConversion.markdown_path).where(PDFConversion.id == conversion_id)
+    )).first()
     if not conversion:
         logger.warning(f"删除时未找到转换记录: ID {conversion_id}")
         raise HTTPException(
@@ -341,9 +578,21 @@ def delete_conversion(conversion_id: int, session: Session = Depends(get_session
                 os.remove(markdown_path)
                 logger.info(f"删除Markdown文件: {markdown_path}")
         
-        # 从数据库删除记录
-        session.delete(conversion)
-        session.commit()
+        # 从数据库删除记录，连同生成它的转换任务和进度事件
+        job_ids = select(PDFJob.id).where(PDFJob.conversion_id == conversion_id)
+        await session.exec(delete(PDFJobEvent).where(PDFJobEvent.job_id.in_(job_ids)))
+        await session.exec(delete(PDFJob).where(PDFJob.conversion_id == conversion_id))
+        await session.exec(delete(PDFConversion).where(PDFConversion.id == conversion_id))
+        await session.commit()
+        await conversion_cache.ainvalidate(conversion_id)
+        
+        # 删除文本存储中的内容和全文索引
+        text_store = get_text_store()
+        search_index = get_search_index()
+        if text_store:
+            await run_in_threadpool(text_store.delete, conversion_id)
+        if search_index:
+            await run_in_threadpool(search_index.remove_conversion, conversion_id)
         logger.info(f"删除转换记录: ID {conversion_id}")
     except Exception as e:
         logger.error(f"删除转换记录失败: {str(e)}")
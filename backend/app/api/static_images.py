@@ -0,0 +1,77 @@
+import os
+from typing import Dict
+
+from fastapi import APIRouter, HTTPException, Request, status
+
+from app.core.config import STATIC_FILES_DIR
+from app.core.file_serving import serve_file
+from app.core.transcoder import VARIANT_FORMATS, variant_path
+
+router = APIRouter()
+
+# 图片根目录的绝对路径，用于防止路径穿越
+STATIC_ROOT = os.path.realpath(STATIC_FILES_DIR)
+
+# 可能存在转码变体的原图扩展名
+TRANSCODABLE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".webp"}
+
+
+def _accepted_types(accept: str) -> Dict[str, float]:
+    """解析 Accept 请求头为 MIME类型 -> q值，q值无效时按0处理"""
+    accepted = {}
+    for item in accept.lower().split(","):
+        media_type, *params = [part.strip() for part in item.split(";")]
+        if not media_type:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[media_type] = quality
+    return accepted
+
+
+def _negotiate_variant(full_path: str, accept: str):
+    """
+    根据 Accept 请求头选择最优的转码变体（需明确列出该格式且q值大于0）
+    
+    Returns:
+        (文件路径, MIME类型)，没有可用变体时返回 (原图路径, None)
+    """
+    accepted = _accepted_types(accept)
+    for fmt, media_type in VARIANT_FORMATS.items():
+        if accepted.get(media_type, 0) > 0:
+            candidate = variant_path(full_path, fmt)
+            if os.path.isfile(candidate):
+                return candidate, media_type
+    return full_path, None
+
+
+@router.api_route("/{file_path:path}", methods=["GET", "HEAD"], include_in_schema=False)
+async def serve_image(file_path: str, request: Request):
+    """
+    提供已上传图片的访问
+    
+    图片写入后内容不再变化，返回长期缓存头和基于内容的ETag，支持304和范围请求。
+    若已生成WebP/AVIF变体，按 Accept 请求头返回客户端支持的最小格式，URL保持不变。
+    """
+    full_path = os.path.realpath(os.path.join(STATIC_ROOT, file_path))
+    if (
+        not full_path.startswith(STATIC_ROOT + os.sep)
+        or full_path.endswith(".part")
+        or not os.path.isfile(full_path)
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="图片不存在"
+        )
+    
+    if os.path.splitext(full_path)[1].lower() not in TRANSCODABLE_EXTENSIONS:
+        return await serve_file(request, full_path)
+    
+    served_path, media_type = _negotiate_variant(full_path, request.headers.get("accept", ""))
+    return await serve_file(request, served_path, media_type=media_type, extra_headers={"Vary": "Accept"})
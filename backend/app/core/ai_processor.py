@@ -1,39 +1,17 @@
-import requests
+import re
 import logging
 import json
-from typing import Generator, Dict, Any
-import sseclient
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Generator, Dict, Any, List, Optional
+
+from app.core.metrics import AI_REQUEST_DURATION, AI_REQUEST_ERRORS
 
 # 创建日志记录器
 logger = logging.getLogger("ai_processor")
 
-
-class AIProcessor:
-    """AI文本处理类"""
-
-    def __init__(self, base_url: str, model: str):
-        self.base_url = base_url
-        self.model = model
-        logger.info(f"初始化AI处理器: {base_url}, 模型: {model}")
-
-    def process_text(self, text: str, enter_text=None) -> str:
-        """
-        使用AI模型处理文本
-        
-        Args:
-            text: 要处理的文本
-            enter_text: 额外的文本输入（未使用，但保留接口一致性）
-            
-        Returns:
-            处理后的文本
-        """
-        if not text or len(text.strip()) == 0:
-            logger.warning("输入文本为空")
-            return ""
-
-        try:
-
-            prompt = f"""
+# 格式优化提示词，{part_note} 为分段处理时的附加说明（整篇处理时为空）
+PROMPT_TEMPLATE = """
 请根据以下要求和参考示例，优化所提供文本的格式。
 
 **核心要求：**
@@ -67,48 +45,259 @@ class AIProcessor:
   o 比如，在同类型项目投标中，强调公司拥有完整的可切和客户实际需求的方案、高效的项目管理团队以及成功的类似项目案例。
 ---
 
-请开始处理以下文本：
+{part_note}请开始处理以下文本：
 {text}
 """
 
-            if enter_text:
-                prompt += f"\n\n下面内容为重要的链接信息，追加到正文后面：\n{enter_text}"
-            print(prompt)
-            # 构建API请求
-            headers = {
-                "Content-Type": "application/json"
-            }
-
-            payload = {
-                "model": self.model,
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                "temperature": 0.3,
-                "max_tokens": 1024 * 130
-            }
-
-            logger.info(f"发送请求到AI模型: {self.model}")
+# 分段处理时每段的附加说明
+PART_NOTE = "（本次内容为长文档的第 {index}/{total} 部分，各部分输出将按顺序拼接，只输出本部分内容，不要添加开场白或总结。）\n\n"
+OVERLAP_NOTE = "以下为上一部分的结尾，仅供衔接参考，不要输出：\n{tail}\n\n"
+
+# 切分边界：分页标记（见 pdf_pages.join_pages）、标题行、普通行
+PAGE_BOUNDARY = re.compile(r"(?m)^(?=--- 第 \d+ 页 ---$)")
+HEADING_BOUNDARY = re.compile(
+    r"(?m)^(?=[ \t]*(?:#{1,6}\s|第[一二三四五六七八九十百千\d]+[章节条篇部分]|[一二三四五六七八九十]+[、.．]|\d+(?:\.\d+)*[、.．]))"
+)
+LINE_BOUNDARY = re.compile(r"(?<=\n)")
+CJK_CHARS = re.compile(r"[\u3000-\u9fff\uf900-\ufaff\uff00-\uffef]")
+
+
+class AIResponseError(Exception):
+    """AI接口返回非200状态"""
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算token数：中日韩字符约1个token，其余约4个字符1个token"""
+    cjk = len(CJK_CHARS.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def _split_units(text: str, budget: int) -> List[str]:
+    """把超出预算的文本依次按分页、标题、行切开，单行仍超出时按字符硬切"""
+    if estimate_tokens(text) <= budget:
+        return [text]
+    for boundary in (PAGE_BOUNDARY, HEADING_BOUNDARY, LINE_BOUNDARY):
+        parts = [part for part in boundary.split(text) if part]
+        if len(parts) > 1:
+            units = []
+            for part in parts:
+                units.extend(_split_units(part, budget))
+            return units
+    # 按每字符1个token的最坏情况切分
+    return [text[start:start + budget] for start in range(0, len(text), budget)]
+
+
+def split_into_chunks(text: str, budget: int) -> List[str]:
+    """
+    按分页和标题边界把文本切分为不超过预算的分段
+    
+    Args:
+        text: 要切分的文本
+        budget: 每段的估算token上限
+        
+    Returns:
+        按顺序的分段，直接拼接即为原文
+    """
+    chunks, current, used = [], [], 0
+    for unit in _split_units(text, budget):
+        tokens = estimate_tokens(unit)
+        if current and used + tokens > budget:
+            chunks.append("".join(current))
+            current, used = [], 0
+        current.append(unit)
+        used += tokens
+    if current:
+        chunks.append("".join(current))
+    return chunks
+
+
+def _tail(text: str, budget: int) -> str:
+    """取文本结尾不超过预算的若干整行，作为下一段的衔接参考"""
+    lines = []
+    used = 0
+    for line in reversed(text.rstrip().splitlines()):
+        used += estimate_tokens(line) + 1
+        if used > budget:
+            break
+        lines.append(line)
+    if not lines:
+        return text.rstrip()[-budget:]
+    return "\n".join(reversed(lines))
+
+
+class _OrderedDeltas:
+    """并发分段的流式输出按分段顺序转发：当前分段实时转发，后续分段先缓存，轮到时再补发"""
+
+    def __init__(self, on_delta: Callable[[str], None], count: int):
+        self.on_delta = on_delta
+        self.buffers: List[List[str]] = [[] for _ in range(count)]
+        self.finished = [False] * count
+        self.current = 0
+        self.lock = threading.Lock()
+
+    def delta(self, index: int, text: str):
+        with self.lock:
+            if index == self.current:
+                self.on_delta(text)
+            else:
+                self.buffers[index].append(text)
+
+    def finish(self, index: int):
+        with self.lock:
+            self.finished[index] = True
+            while self.current < len(self.finished) and self.finished[self.current]:
+                self.current += 1
+                if self.current < len(self.finished):
+                    # 与拼接结果保持一致，分段之间空一行
+                    self.on_delta("\n\n")
+                    for text in self.buffers[self.current]:
+                        self.on_delta(text)
+                    self.buffers[self.current] = []
+
+
+class AIProcessor:
+    """AI文本处理类"""
+
+    def __init__(self, base_url: str, model: str, chunk_tokens: int = 0, chunk_overlap: int = 0,
+                 concurrency: int = 1):
+        self.base_url = base_url
+        self.model = model
+        # 文本估算超过chunk_tokens时分段并发处理，0表示整篇一次处理
+        self.chunk_tokens = chunk_tokens
+        self.chunk_overlap = chunk_overlap
+        self.concurrency = max(concurrency, 1)
+        logger.info(f"初始化AI处理器: {base_url}, 模型: {model}")
+
+    def process_text(self, text: str, enter_text=None, on_delta: Optional[Callable[[str], None]] = None) -> str:
+        """
+        使用AI模型处理文本
+        
+        Args:
+            text: 要处理的文本
+            enter_text: 重要的链接信息，追加到正文后面（分段处理时只附在最后一段）
+            on_delta: 传入时以流式方式请求，每收到一段输出调用一次（分段处理时按分段顺序回调）
+            
+        Returns:
+            处理后的文本
+        """
+        if not text or len(text.strip()) == 0:
+            logger.warning("输入文本为空")
+            return ""
+
+        if self.chunk_tokens > 0 and estimate_tokens(text) > self.chunk_tokens:
+            return self._process_chunks(text, enter_text, on_delta)
+
+        try:
+            prompt = self._build_prompt(text, enter_text)
+            processed_text = self._complete(prompt, 1024 * 130, on_delta)
+            logger.info(f"AI处理成功，输出长度: {len(processed_text)}")
+            return processed_text
+
+        except AIResponseError as e:
+            return str(e)
+        except Exception as e:
+            logger.error(f"AI处理异常: {str(e)}")
+            AI_REQUEST_ERRORS.inc(model=self.model, reason=type(e).__name__)
+            return f"处理文本时出错: {str(e)}"
+
+    def _build_prompt(self, text: str, enter_text=None, part_note: str = "") -> str:
+        prompt = PROMPT_TEMPLATE.format(part_note=part_note, text=text)
+        if enter_text:
+            prompt += f"\n\n下面内容为重要的链接信息，追加到正文后面：\n{enter_text}"
+        return prompt
+
+    def _process_chunks(self, text: str, enter_text=None, on_delta: Optional[Callable[[str], None]] = None) -> str:
+        """按分页和标题切分后并发处理各分段，按原顺序拼接输出"""
+        chunks = split_into_chunks(text, self.chunk_tokens)
+        total = len(chunks)
+        logger.info(f"文本较长，分为 {total} 段处理，并发数: {self.concurrency}")
+        deltas = _OrderedDeltas(on_delta, total) if on_delta else None
+        # 输出与输入篇幅相近，按分段预算的两倍限制输出长度
+        max_tokens = self.chunk_tokens * 2
+
+        def process(index: int) -> str:
+            chunk = chunks[index]
+            part_note = PART_NOTE.format(index=index + 1, total=total)
+            if index > 0 and self.chunk_overlap > 0:
+                part_note += OVERLAP_NOTE.format(tail=_tail(chunks[index - 1], self.chunk_overlap))
+            prompt = self._build_prompt(chunk.strip(), enter_text if index == total - 1 else None, part_note)
+            try:
+                return self._complete(
+                    prompt, max_tokens, (lambda delta: deltas.delta(index, delta)) if deltas else None
+                ).strip()
+            except Exception as e:
+                # 单段失败时保留原文，不影响其他分段
+                logger.error(f"第 {index + 1}/{total} 段AI处理失败，保留原文: {str(e)}")
+                if not isinstance(e, AIResponseError):
+                    AI_REQUEST_ERRORS.inc(model=self.model, reason=type(e).__name__)
+                return chunk.strip()
+            finally:
+                if deltas:
+                    deltas.finish(index)
+
+        with ThreadPoolExecutor(max_workers=min(self.concurrency, total), thread_name_prefix="ai-chunk") as executor:
+            outputs = list(executor.map(process, range(total)))
+        processed_text = "\n\n".join(output for output in outputs if output)
+        logger.info(f"AI分段处理完成，输出长度: {len(processed_text)}")
+        return processed_text
+
+    def _complete(self, prompt: str, max_tokens: int, on_delta: Optional[Callable[[str], None]] = None) -> str:
+        """发送一次对话请求并返回输出，非200响应时抛出 AIResponseError"""
+        logger.debug(prompt)
+        # 构建API请求
+        headers = {
+            "Content-Type": "application/json"
+        }
+
+        payload = {
+            "model": self.model,
+            "messages": [
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            "temperature": 0.3,
+            "max_tokens": max_tokens,
+            "stream": on_delta is not None
+        }
+
+        # 延迟导入，只提供图片服务的进程无需加载
+        import requests
+        
+        logger.info(f"发送请求到AI模型: {self.model}")
+        with AI_REQUEST_DURATION.time(model=self.model):
+            # 流式请求时超时作用于每次读取，长输出不会因总耗时超时
             response = requests.post(
                 f"{self.base_url}/chat/completions",
                 headers=headers,
                 json=payload,
-                timeout=60
+                timeout=60,
+                stream=on_delta is not None
             )
+            if response.status_code == 200 and on_delta is not None:
+                return self._read_stream(response, on_delta)
 
-            # 检查响应
-            if response.status_code == 200:
-                result = response.json()
-                processed_text = result.get("choices", [{}])[0].get("message", {}).get("content", "")
-                logger.info(f"AI处理成功，输出长度: {len(processed_text)}")
-                return processed_text
-            else:
-                logger.error(f"AI处理失败: HTTP {response.status_code}, {response.text}")
-                return f"AI处理失败: {response.status_code}"
+        # 检查响应
+        if response.status_code == 200:
+            result = response.json()
+            return result.get("choices", [{}])[0].get("message", {}).get("content", "")
+        logger.error(f"AI处理失败: HTTP {response.status_code}, {response.text}")
+        AI_REQUEST_ERRORS.inc(model=self.model, reason=f"http_{response.status_code}")
+        raise AIResponseError(f"AI处理失败: {response.status_code}")
 
-        except Exception as e:
-            logger.error(f"AI处理异常: {str(e)}")
-            return f"处理文本时出错: {str(e)}"
+    def _read_stream(self, response, on_delta: Callable[[str], None]) -> str:
+        """读取流式响应（SSE），逐段回调并返回完整输出"""
+        # 延迟导入，只在流式处理时使用
+        import sseclient
+        
+        parts = []
+        for event in sseclient.SSEClient(response).events():
+            if event.data == "[DONE]":
+                break
+            chunk = json.loads(event.data)
+            delta = chunk.get("choices", [{}])[0].get("delta", {}).get("content")
+            if delta:
+                parts.append(delta)
+                on_delta(delta)
+        return "".join(parts)
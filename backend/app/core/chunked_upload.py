@@ -0,0 +1,231 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import hashlib
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.core.image_handler import ImageTooLargeError
+
+# 创建日志记录器
+logger = logging.getLogger("chunked_upload")
+
+try:
+    import fcntl
+except ImportError:
+    # Windows上只有进程内的锁，需以单进程运行
+    fcntl = None
+
+
+class UploadSessionNotFoundError(LookupError):
+    """上传会话不存在或已过期"""
+    pass
+
+
+class UploadOffsetMismatchError(ValueError):
+    """分块偏移量与服务端已接收的字节数不一致"""
+    
+    def __init__(self, expected: int):
+        self.expected = expected
+        super().__init__(f"偏移量不匹配，服务端已接收 {expected} 字节")
+
+
+class UploadChecksumError(ValueError):
+    """合并后的文件大小或校验和与声明不符"""
+    pass
+
+
+class ChunkedUploadManager:
+    """
+    可续传的分块上传管理器
+    
+    每个会话在临时目录中对应两个文件：<id>.part 保存已接收的数据，<id>.json 保存会话信息。
+    已接收字节数即 .part 文件大小，服务重启后会话仍可继续。
+    同一会话的追加和完成在进程内按asyncio锁排队，多个工作进程之间通过 .json 文件上的flock互斥。
+    """
+    
+    def __init__(self, temp_dir: str, max_size: int = 0, session_ttl: int = 24 * 3600):
+        self.temp_dir = temp_dir
+        self.max_size = max_size
+        self.session_ttl = session_ttl
+        self._locks: Dict[str, asyncio.Lock] = {}
+        os.makedirs(temp_dir, exist_ok=True)
+    
+    def _data_path(self, upload_id: str) -> str:
+        return os.path.join(self.temp_dir, f"{upload_id}.part")
+    
+    def _meta_path(self, upload_id: str) -> str:
+        return os.path.join(self.temp_dir, f"{upload_id}.json")
+    
+    @asynccontextmanager
+    async def _session_lock(self, upload_id: str) -> AsyncIterator[None]:
+        """持有会话锁；会话在等待期间被结束时抛出 UploadSessionNotFoundError"""
+        lock = self._locks.setdefault(upload_id, asyncio.Lock())
+        async with lock:
+            try:
+                handle = open(self._meta_path(upload_id), "rb")
+            except FileNotFoundError:
+                raise UploadSessionNotFoundError(upload_id)
+            try:
+                if fcntl is not None:
+                    # 其他进程持有锁时在线程中等待，不阻塞事件循环；关闭文件即释放
+                    await run_in_threadpool(fcntl.flock, handle.fileno(), fcntl.LOCK_EX)
+                yield
+            finally:
+                handle.close()
+    
+    def _load(self, upload_id: str) -> dict:
+        """读取会话信息"""
+        # 会话ID由服务端生成，只允许十六进制字符，防止路径穿越
+        if not upload_id or not all(c in "0123456789abcdef" for c in upload_id):
+            raise UploadSessionNotFoundError(upload_id)
+        try:
+            with open(self._meta_path(upload_id), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise UploadSessionNotFoundError(upload_id)
+    
+    def create(self, filename: str, content_type: str, size: int, sha256: Optional[str] = None) -> dict:
+        """
+        创建上传会话
+        
+        Args:
+            filename: 原始文件名
+            content_type: MIME类型
+            size: 文件总字节数
+            sha256: 文件的SHA-256，提供时合并后校验
+            
+        Returns:
+            会话状态
+        """
+        if self.max_size and size > self.max_size:
+            raise ImageTooLargeError(self.max_size)
+        self.cleanup_expired()
+        
+        upload_id = uuid.uuid4().hex
+        meta = {
+            "filename": filename,
+            "content_type": content_type,
+            "size": size,
+            "sha256": sha256.lower() if sha256 else None,
+            "created_at": time.time(),
+        }
+        open(self._data_path(upload_id), "wb").close()
+        with open(self._meta_path(upload_id), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        logger.info(f"创建上传会话: {upload_id}, 文件: {filename}, 大小: {size} 字节")
+        return {"upload_id": upload_id, "offset": 0, "size": size}
+    
+    def status(self, upload_id: str) -> dict:
+        """查询会话已接收的字节数"""
+        meta = self._load(upload_id)
+        return {"upload_id": upload_id, "offset": os.path.getsize(self._data_path(upload_id)), "size": meta["size"]}
+    
+    async def append(self, upload_id: str, offset: int, chunks: AsyncIterator[bytes]) -> dict:
+        """
+        追加一个分块
+        
+        Args:
+            upload_id: 会话ID
+            offset: 分块在文件中的起始位置，必须等于已接收字节数
+            chunks: 请求体数据流
+            
+        Returns:
+            会话状态
+        """
+        self._load(upload_id)
+        async with self._session_lock(upload_id):
+            # 等待锁期间会话可能已被其他请求结束
+            meta = self._load(upload_id)
+            data_path = self._data_path(upload_id)
+            received = os.path.getsize(data_path)
+            if offset != received:
+                raise UploadOffsetMismatchError(received)
+            
+            buffer = await run_in_threadpool(open, data_path, "ab")
+            try:
+                async for chunk in chunks:
+                    if not chunk:
+                        continue
+                    received += len(chunk)
+                    if received > meta["size"]:
+                        raise UploadChecksumError(f"接收的数据超过声明的文件大小: {meta['size']} 字节")
+                    await run_in_threadpool(buffer.write, chunk)
+            finally:
+                await run_in_threadpool(buffer.close)
+            # 刷新会话信息的修改时间，活跃的会话不会被当作过期清理
+            os.utime(self._meta_path(upload_id))
+        
+        return {"upload_id": upload_id, "offset": received, "size": meta["size"]}
+    
+    @asynccontextmanager
+    async def finalize(self, upload_id: str) -> AsyncIterator[Tuple[str, dict, str]]:
+        """
+        校验并结束上传会话
+        
+        在会话锁内校验，产出 (数据文件路径, 会话信息, SHA-256十六进制摘要)，由调用方移走数据文件并保存记录。
+        代码块正常结束后才删除会话（及未被移走的数据文件）；代码块抛出异常时保留会话，
+        调用方需确保数据文件仍在原位置，客户端可重新完成。
+        
+        Raises:
+            UploadSessionNotFoundError: 会话不存在或已完成
+            UploadChecksumError: 文件大小或校验和不符
+        """
+        self._load(upload_id)
+        async with self._session_lock(upload_id):
+            # 等待锁期间会话可能已被并发的完成请求结束
+            meta = self._load(upload_id)
+            data_path = self._data_path(upload_id)
+            received = os.path.getsize(data_path)
+            if received != meta["size"]:
+                raise UploadChecksumError(f"文件不完整，已接收 {received}/{meta['size']} 字节")
+            
+            file_hash = await run_in_threadpool(self._hash_file, data_path)
+            if meta["sha256"] and meta["sha256"] != file_hash:
+                raise UploadChecksumError("文件校验和不匹配")
+            
+            yield data_path, meta, file_hash
+            
+            os.remove(self._meta_path(upload_id))
+            if os.path.exists(data_path):
+                os.remove(data_path)
+            self._locks.pop(upload_id, None)
+            logger.info(f"上传会话完成: {upload_id}, SHA-256: {file_hash}")
+    
+    def abort(self, upload_id: str):
+        """取消上传会话并删除已接收的数据"""
+        self._load(upload_id)
+        for path in (self._data_path(upload_id), self._meta_path(upload_id)):
+            if os.path.exists(path):
+                os.remove(path)
+        self._locks.pop(upload_id, None)
+        logger.info(f"取消上传会话: {upload_id}")
+    
+    def cleanup_expired(self):
+        """删除超过有效期的会话"""
+        now = time.time()
+        for name in os.listdir(self.temp_dir):
+            path = os.path.join(self.temp_dir, name)
+            try:
+                if now - os.path.getmtime(path) > self.session_ttl:
+                    os.remove(path)
+                    logger.info(f"删除过期的上传会话文件: {name}")
+            except OSError:
+                pass
+    
+    @staticmethod
+    def _hash_file(path: str) -> str:
+        """计算文件的SHA-256"""
+        hasher = hashlib.sha256()
+        with open(path, "rb") as f:
+            while True:
+                chunk = f.read(1024 * 1024)
+                if not chunk:
+                    break
+                hasher.update(chunk)
+        return hasher.hexdigest()
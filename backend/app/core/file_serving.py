@@ -0,0 +1,196 @@
+import os
+import hashlib
+import logging
+import mimetypes
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from fastapi import Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, StreamingResponse
+
+# 创建日志记录器
+logger = logging.getLogger("file_serving")
+
+# 写入后内容不再变化的文件使用的缓存策略
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# 分段读取文件时的块大小
+READ_CHUNK_SIZE = 64 * 1024
+
+
+class ETagCache:
+    """按 (路径, 修改时间, 大小) 缓存文件内容哈希，避免每次请求重新读取文件"""
+    
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, int, int], str]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: Tuple[str, int, int]) -> Optional[str]:
+        with self._lock:
+            etag = self._entries.get(key)
+            if etag is not None:
+                self._entries.move_to_end(key)
+            return etag
+    
+    def put(self, key: Tuple[str, int, int], etag: str):
+        with self._lock:
+            self._entries[key] = etag
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+_etag_cache = ETagCache()
+
+
+def _hash_file(path: str) -> str:
+    """计算文件内容的SHA-256"""
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(READ_CHUNK_SIZE * 16)
+            if not chunk:
+                break
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+async def content_etag(path: str, stat_result: os.stat_result) -> str:
+    """
+    获取文件基于内容的强ETag
+    
+    内容寻址存储的文件名本身就是SHA-256，直接使用；其他文件计算一次后缓存。
+    """
+    stem = os.path.splitext(os.path.basename(path))[0]
+    if len(stem) == 64 and all(c in "0123456789abcdef" for c in stem):
+        return f'"{stem}"'
+    
+    key = (path, stat_result.st_mtime_ns, stat_result.st_size)
+    etag = _etag_cache.get(key)
+    if etag is None:
+        etag = f'"{await run_in_threadpool(_hash_file, path)}"'
+        _etag_cache.put(key, etag)
+    return etag
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    """按弱比较规则判断 If-None-Match / If-Range 是否与ETag匹配"""
+    if header.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in header.split(",")]
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def _parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    解析单个字节范围
+    
+    Returns:
+        (起始位置, 结束位置) 闭区间；多段范围或格式不支持时返回None，按完整文件响应
+        
+    Raises:
+        ValueError: 范围无法满足
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    start_text, _, end_text = spec.strip().partition("-")
+    try:
+        if start_text == "":
+            # 后缀范围: bytes=-N 表示最后N个字节
+            length = int(end_text)
+            if length <= 0:
+                raise ValueError("无效的字节范围")
+            start, end = max(size - length, 0), size - 1
+        else:
+            start = int(start_text)
+            end = int(end_text) if end_text else size - 1
+    except ValueError:
+        raise ValueError("无效的字节范围")
+    end = min(end, size - 1)
+    if start >= size or start > end:
+        raise ValueError("字节范围超出文件大小")
+    return start, end
+
+
+def _iter_file_range(path: str, start: int, end: int):
+    """按块读取文件的指定区间"""
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(READ_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+async def serve_file(
+    request: Request,
+    path: str,
+    media_type: Optional[str] = None,
+    cache_control: str = IMMUTABLE_CACHE_CONTROL,
+    etag: Optional[str] = None,
+    extra_headers: Optional[dict] = None
+) -> Response:
+    """
+    带缓存协商和范围请求支持的文件响应
+    
+    - 返回 Cache-Control 与基于内容的强ETag
+    - If-None-Match 命中时返回304
+    - 支持单段 Range 请求（206），If-Range 不匹配时返回完整文件
+    
+    Args:
+        request: 当前请求
+        path: 文件路径
+        media_type: MIME类型，为空时根据扩展名推断
+        cache_control: Cache-Control 响应头
+        etag: 指定ETag，为空时根据文件内容计算
+        extra_headers: 额外响应头
+    """
+    stat_result = await run_in_threadpool(os.stat, path)
+    size = stat_result.st_size
+    if etag is None:
+        etag = await content_etag(path, stat_result)
+    if media_type is None:
+        media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    
+    headers = {
+        "Cache-Control": cache_control,
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+    }
+    if extra_headers:
+        headers.update(extra_headers)
+    
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (not if_range or _etag_matches(if_range, etag)):
+        try:
+            byte_range = _parse_range(range_header, size)
+        except ValueError:
+            headers["Content-Range"] = f"bytes */{size}"
+            return Response(status_code=416, headers=headers)
+        
+        if byte_range is not None:
+            start, end = byte_range
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+            headers["Content-Length"] = str(end - start + 1)
+            if request.method == "HEAD":
+                return Response(status_code=206, headers=headers, media_type=media_type)
+            return StreamingResponse(
+                _iter_file_range(path, start, end),
+                status_code=206,
+                headers=headers,
+                media_type=media_type
+            )
+    
+    return FileResponse(path=path, media_type=media_type, headers=headers, stat_result=stat_result)
@@ -0,0 +1,209 @@
+import os
+import re
+import time
+import asyncio
+import logging
+from typing import Iterator, List
+
+from fastapi.concurrency import run_in_threadpool
+from sqlmodel import Session, select, delete
+
+from app.core.transcoder import VARIANT_FORMATS
+from app.core.record_cache import image_cache
+from app.db import database
+from app.models.image import Image
+
+# 创建日志记录器
+logger = logging.getLogger("image_gc")
+
+try:
+    import fcntl
+except ImportError:
+    # Windows上只能防止同一进程内的并发回收
+    fcntl = None
+
+# 图片存储中由垃圾回收管理的目录：年月目录和内容寻址目录
+YEAR_MONTH_DIR = re.compile(r"^\d{6}$")
+CAS_DIR = "cas"
+
+# 每批检查的文件数/记录数
+BATCH_SIZE = 500
+
+# 多个工作进程共用的回收锁文件（位于静态目录下，不在受管理目录中）
+LOCK_FILE = ".gc.lock"
+
+
+class ImageGarbageCollector:
+    """
+    图片存储垃圾回收
+    
+    - 孤儿文件：年月目录和 cas 目录下没有任何记录引用的文件（含残留的 .part 临时文件）
+    - 悬空记录：文件已不存在的 Image 记录
+    
+    只处理修改时间早于宽限期的文件/记录，避免与进行中的上传冲突；按每秒处理数限速。
+    多个工作进程通过静态目录下的锁文件互斥，同一时间只有一个进程执行回收，其余跳过。
+    """
+    
+    def __init__(self, static_dir: str, grace_seconds: int = 3600, rate_limit: int = 1000):
+        self.static_dir = static_dir
+        self.grace_seconds = grace_seconds
+        # 每秒最多检查的文件/记录数，0表示不限速
+        self.rate_limit = rate_limit
+        self._running = False
+    
+    def _throttle(self, processed: int, started: float):
+        """按速率限制休眠"""
+        if not self.rate_limit:
+            return
+        expected = processed / self.rate_limit
+        elapsed = time.monotonic() - started
+        if expected > elapsed:
+            time.sleep(expected - elapsed)
+    
+    def _walk_files(self) -> Iterator[str]:
+        """遍历受管理目录下的所有文件，返回相对于静态目录的路径"""
+        if not os.path.isdir(self.static_dir):
+            return
+        for name in sorted(os.listdir(self.static_dir)):
+            top = os.path.join(self.static_dir, name)
+            if not os.path.isdir(top) or not (YEAR_MONTH_DIR.match(name) or name == CAS_DIR):
+                continue
+            for root, _, files in os.walk(top):
+                for filename in files:
+                    yield os.path.relpath(os.path.join(root, filename), self.static_dir)
+    
+    @staticmethod
+    def _source_path(relative_path: str) -> str:
+        """临时文件和转码变体归属的原图路径"""
+        if relative_path.endswith(".part"):
+            return ""
+        base, ext = os.path.splitext(relative_path)
+        if ext.lstrip(".") in VARIANT_FORMATS and os.path.splitext(base)[1]:
+            return base
+        return relative_path
+    
+    def _collect_files(self, report: dict, dry_run: bool, started: float):
+        """删除没有记录引用的文件"""
+        cutoff = time.time() - self.grace_seconds
+        batch: List[str] = []
+        
+        def flush():
+            sources = {self._source_path(path) for path in batch} - {""}
+            with Session(database.engine) as session:
+                referenced = set(session.exec(select(Image.file_path).where(Image.file_path.in_(sources))).all())
+            for path in batch:
+                if self._source_path(path) in referenced:
+                    continue
+                full_path = os.path.join(self.static_dir, path)
+                try:
+                    stat = os.stat(full_path)
+                except FileNotFoundError:
+                    continue
+                if stat.st_mtime > cutoff:
+                    continue
+                if not dry_run:
+                    try:
+                        os.remove(full_path)
+                    except FileNotFoundError:
+                        # 已被其他进程删除（如删除图片的后台任务）
+                        continue
+                report["orphan_files"] += 1
+                report["reclaimed_bytes"] += stat.st_size
+                logger.info(f"{'发现' if dry_run else '删除'}孤儿文件: {path}, {stat.st_size} 字节")
+            report["scanned_files"] += len(batch)
+            batch.clear()
+            self._throttle(report["scanned_files"] + report["scanned_rows"], started)
+        
+        for path in self._walk_files():
+            batch.append(path)
+            if len(batch) >= BATCH_SIZE:
+                flush()
+        if batch:
+            flush()
+    
+    def _collect_rows(self, report: dict, dry_run: bool, started: float):
+        """删除文件已不存在的记录，按ID分批扫描"""
+        cutoff = time.time() - self.grace_seconds
+        last_id = 0
+        while True:
+            with Session(database.engine) as session:
+                rows = session.exec(
+                    select(Image.id, Image.file_path, Image.created_at)
+                    .where(Image.id > last_id)
+                    .order_by(Image.id)
+                    .limit(BATCH_SIZE)
+                ).all()
+                if not rows:
+                    break
+                last_id = rows[-1][0]
+                
+                dangling = [
+                    image_id for image_id, file_path, created_at in rows
+                    if created_at.timestamp() < cutoff
+                    and not os.path.exists(os.path.join(self.static_dir, file_path))
+                ]
+                if dangling:
+                    report["dangling_rows"] += len(dangling)
+                    logger.info(f"{'发现' if dry_run else '删除'}悬空记录: {dangling}")
+                    if not dry_run:
+                        session.exec(delete(Image).where(Image.id.in_(dangling)))
+                        session.commit()
+                        image_cache.invalidate(*dangling)
+            
+            report["scanned_rows"] += len(rows)
+            self._throttle(report["scanned_files"] + report["scanned_rows"], started)
+    
+    def collect(self, dry_run: bool = False) -> dict:
+        """
+        执行一次垃圾回收（阻塞，应在工作线程中调用）
+        
+        Args:
+            dry_run: 只统计不删除
+            
+        Returns:
+            回收报告
+        """
+        report = {
+            "dry_run": dry_run,
+            "scanned_files": 0,
+            "scanned_rows": 0,
+            "orphan_files": 0,
+            "reclaimed_bytes": 0,
+            "dangling_rows": 0,
+            "skipped": False,
+        }
+        if self._running:
+            report["skipped"] = True
+            return report
+        
+        self._running = True
+        lock_file = None
+        started = time.monotonic()
+        try:
+            if fcntl is not None:
+                os.makedirs(self.static_dir, exist_ok=True)
+                lock_file = open(os.path.join(self.static_dir, LOCK_FILE), "a")
+                try:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    logger.info("其他进程正在执行垃圾回收，本次跳过")
+                    report["skipped"] = True
+                    return report
+            self._collect_files(report, dry_run, started)
+            self._collect_rows(report, dry_run, started)
+        finally:
+            if lock_file is not None:
+                lock_file.close()
+            self._running = False
+        report["duration"] = round(time.monotonic() - started, 3)
+        logger.info(f"垃圾回收完成: {report}")
+        return report
+    
+    async def run_periodically(self, interval: int):
+        """按固定间隔执行垃圾回收，直到任务被取消"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await run_in_threadpool(self.collect)
+            except Exception as e:
+                logger.error(f"垃圾回收出错: {str(e)}")
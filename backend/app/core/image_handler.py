@@ -1,28 +1,57 @@
 import os
 import uuid
-from fastapi import UploadFile
 import shutil
+import hashlib
+from fastapi import UploadFile
+from fastapi.concurrency import run_in_threadpool
 from datetime import datetime
 
 
+class ImageTooLargeError(ValueError):
+    """上传图片超过大小限制"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        super().__init__(f"图片大小超过限制: {max_size} 字节")
+
+
 class ImageHandler:
     """图片处理工具类"""
     
-    def __init__(self, static_dir: str, base_url: str):
+    # 内容寻址存储的子目录，文件按SHA-256命名
+    CAS_DIR = "cas"
+    
+    def __init__(self, static_dir: str, base_url: str, max_size: int = 0, chunk_size: int = 1024 * 1024,
+                 dedup: bool = False):
         self.static_dir = static_dir
         self.base_url = base_url
+        # 单个图片的最大字节数，0表示不限制
+        self.max_size = max_size
+        # 流式写入时每次读取的块大小
+        self.chunk_size = chunk_size
+        # 是否启用内容寻址存储（相同内容只保存一份）
+        self.dedup = dedup
         os.makedirs(static_dir, exist_ok=True)
     
     async def save_image(self, file: UploadFile) -> dict:
         """
         保存上传的图片文件
         
+        按固定大小分块读取上传内容，在线程池中写入磁盘，同时统计字节数和SHA-256，
+        超过大小限制时立即中止并清理已写入的部分。
+        
         Args:
             file: 上传的图片文件
             
         Returns:
             包含图片信息的字典
+            
+        Raises:
+            ImageTooLargeError: 图片超过大小限制
         """
+        if self.dedup:
+            return await self._save_content_addressed(file)
+        
         # 获取文件扩展名
         content_type = file.content_type
         ext = self._get_extension_from_content_type(content_type)
@@ -38,25 +67,167 @@ class ImageHandler:
         # 文件保存路径
         file_path = os.path.join(dir_path, filename)
         
-        # 保存文件
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        # 先写入临时文件，完成后再原子重命名，避免出现半截文件
+        temp_path = f"{file_path}.part"
+        size, file_hash = await self._stream_to_file(file, temp_path)
+        os.replace(temp_path, file_path)
         
         # 计算相对路径供URL使用
         relative_path = os.path.join(year_month, filename)
-        url = f"{self.base_url}/static/images/{relative_path}"
+        return self._build_image_data(file.filename, content_type, relative_path, size, file_hash)
+    
+    async def store_file(self, source_path: str, original_filename: str, content_type: str,
+                         size: int, file_hash: str) -> dict:
+        """
+        将已写入磁盘的图片（如分块上传合并后的文件）移入图片目录
         
-        # 获取文件大小
-        size = os.path.getsize(file_path)
+        Args:
+            source_path: 临时文件路径，调用后该文件被移走；去重模式下内容已存在时保留，由调用方删除
+            original_filename: 原始文件名
+            content_type: MIME类型
+            size: 文件大小
+            file_hash: 文件的SHA-256
+            
+        Returns:
+            包含图片信息的字典
+        """
+        ext = self._get_extension_from_content_type(content_type)
+        if self.dedup:
+            relative_path = os.path.join(self.CAS_DIR, file_hash[:2], f"{file_hash}{ext}")
+        else:
+            relative_path = os.path.join(datetime.now().strftime("%Y%m"), f"{uuid.uuid4()}{ext}")
+        
+        file_path = os.path.join(self.static_dir, relative_path)
+        if not (self.dedup and self._reuse_existing(file_path)):
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            await run_in_threadpool(shutil.move, source_path, file_path)
+        
+        return self._build_image_data(original_filename, content_type, relative_path, size, file_hash)
+    
+    async def unstore_file(self, relative_path: str, source_path: str):
+        """
+        撤销 store_file（保存记录失败时），把文件放回source_path
         
+        去重模式下内容寻址文件可能已被其他记录引用，复制回去，未被引用时由垃圾回收删除
+        """
+        if os.path.exists(source_path):
+            return
+        file_path = os.path.join(self.static_dir, relative_path)
+        if self.dedup:
+            await run_in_threadpool(shutil.copyfile, file_path, source_path)
+        else:
+            await run_in_threadpool(shutil.move, file_path, source_path)
+    
+    @staticmethod
+    def _reuse_existing(file_path: str) -> bool:
+        """
+        内容寻址文件已存在时刷新其修改时间并返回True
+        
+        复用的文件可能是尚无记录引用的旧文件，刷新后垃圾回收的宽限期从此刻重新计算，
+        不会在新记录提交前被当作孤儿文件删除
+        """
+        try:
+            os.utime(file_path)
+            return True
+        except FileNotFoundError:
+            return False
+    
+    async def _save_content_addressed(self, file: UploadFile) -> dict:
+        """
+        以内容寻址方式保存图片
+        
+        先流式计算上传内容的SHA-256，若同哈希的文件已存在则直接复用，
+        不再重复写盘；否则写入 cas/<哈希前两位>/<哈希><扩展名>。
+        
+        Args:
+            file: 上传的图片文件
+            
+        Returns:
+            包含图片信息的字典
+        """
+        ext = self._get_extension_from_content_type(file.content_type)
+        size, file_hash = await self._hash_upload(file)
+        
+        relative_path = os.path.join(self.CAS_DIR, file_hash[:2], f"{file_hash}{ext}")
+        file_path = os.path.join(self.static_dir, relative_path)
+        
+        if not self._reuse_existing(file_path):
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            await file.seek(0)
+            # 临时文件名带随机后缀，避免并发上传相同内容时互相覆盖
+            temp_path = f"{file_path}.{uuid.uuid4().hex}.part"
+            await self._stream_to_file(file, temp_path)
+            os.replace(temp_path, file_path)
+        
+        return self._build_image_data(file.filename, file.content_type, relative_path, size, file_hash)
+    
+    def _build_image_data(self, original_filename: str, content_type: str, relative_path: str,
+                          size: int, file_hash: str) -> dict:
+        """构建图片信息字典"""
+        url = f"{self.base_url}/static/images/{relative_path}"
         return {
-            "original_filename": file.filename,
+            "original_filename": original_filename,
             "file_path": relative_path,
             "url": url,
             "size": size,
-            "content_type": content_type
+            "content_type": content_type,
+            "file_hash": file_hash
         }
     
+    async def _hash_upload(self, file: UploadFile):
+        """
+        分块读取上传内容并计算SHA-256，不写盘
+        
+        Args:
+            file: 上传的文件
+            
+        Returns:
+            tuple: (字节数, SHA-256十六进制摘要)
+        """
+        hasher = hashlib.sha256()
+        size = 0
+        while True:
+            chunk = await file.read(self.chunk_size)
+            if not chunk:
+                break
+            size += len(chunk)
+            if self.max_size and size > self.max_size:
+                raise ImageTooLargeError(self.max_size)
+            hasher.update(chunk)
+        return size, hasher.hexdigest()
+    
+    async def _stream_to_file(self, file: UploadFile, path: str):
+        """
+        分块将上传内容写入文件
+        
+        Args:
+            file: 上传的文件
+            path: 目标文件路径
+            
+        Returns:
+            tuple: (写入的字节数, SHA-256十六进制摘要)
+        """
+        hasher = hashlib.sha256()
+        size = 0
+        buffer = await run_in_threadpool(open, path, "wb")
+        try:
+            while True:
+                chunk = await file.read(self.chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if self.max_size and size > self.max_size:
+                    raise ImageTooLargeError(self.max_size)
+                hasher.update(chunk)
+                await run_in_threadpool(buffer.write, chunk)
+        except BaseException:
+            await run_in_threadpool(buffer.close)
+            if os.path.exists(path):
+                os.remove(path)
+            raise
+        await run_in_threadpool(buffer.close)
+        return size, hasher.hexdigest()
+    
     @staticmethod
     def _get_extension_from_content_type(content_type: str) -> str:
         """从MIME类型获取文件扩展名"""
@@ -67,4 +238,4 @@ class ImageHandler:
             "image/webp": ".webp",
             "image/svg+xml": ".svg",
         }
-        return content_type_map.get(content_type, ".jpg") 
\ No newline at end of file
+        return content_type_map.get(content_type, ".jpg")
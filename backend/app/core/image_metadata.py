@@ -0,0 +1,122 @@
+import os
+import logging
+from datetime import datetime
+from typing import Optional
+
+from PIL import Image as PILImage
+
+# 创建日志记录器
+logger = logging.getLogger("image_metadata")
+
+# EXIF标签编号
+EXIF_MAKE = 0x010F
+EXIF_MODEL = 0x0110
+EXIF_ORIENTATION = 0x0112
+EXIF_DATETIME = 0x0132
+EXIF_DATETIME_ORIGINAL = 0x9003
+EXIF_IFD = 0x8769
+
+
+def sniff_format(header: bytes) -> Optional[str]:
+    """
+    根据文件头魔数判断真实的图片格式，不依赖客户端声明的 content_type
+    
+    Args:
+        header: 文件开头的若干字节（至少32字节）
+        
+    Returns:
+        格式名称（png/jpeg/gif/webp/bmp/tiff/avif/heic/ico/svg），无法识别时返回None
+    """
+    if header.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if header.startswith(b"\xff\xd8\xff"):
+        return "jpeg"
+    if header[:6] in (b"GIF87a", b"GIF89a"):
+        return "gif"
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "webp"
+    if header.startswith(b"BM"):
+        return "bmp"
+    if header[:4] in (b"II*\x00", b"MM\x00*"):
+        return "tiff"
+    if header[4:8] == b"ftyp":
+        brand = header[8:12]
+        if brand in (b"avif", b"avis"):
+            return "avif"
+        if brand in (b"heic", b"heix", b"mif1", b"msf1"):
+            return "heic"
+    if header.startswith(b"\x00\x00\x01\x00"):
+        return "ico"
+    text = header.lstrip().lower()
+    if text.startswith(b"<svg") or (text.startswith(b"<?xml") and b"<svg" in header.lower()):
+        return "svg"
+    return None
+
+
+def _clean_text(value) -> Optional[str]:
+    """清理EXIF文本字段"""
+    if value is None:
+        return None
+    if isinstance(value, bytes):
+        value = value.decode("utf-8", errors="ignore")
+    value = str(value).strip("\x00 ").strip()
+    return value[:255] or None
+
+
+def _parse_exif_datetime(value) -> Optional[datetime]:
+    """解析EXIF日期格式 YYYY:MM:DD HH:MM:SS"""
+    text = _clean_text(value)
+    if not text:
+        return None
+    try:
+        return datetime.strptime(text[:19], "%Y:%m:%d %H:%M:%S")
+    except ValueError:
+        return None
+
+
+def extract_metadata(path: str) -> dict:
+    """
+    提取图片尺寸、真实格式和部分EXIF信息
+    
+    Args:
+        path: 图片文件路径
+        
+    Returns:
+        可直接写入 Image 记录的字段字典
+    """
+    with open(path, "rb") as f:
+        header = f.read(512)
+    
+    metadata = {
+        "image_format": sniff_format(header),
+        "width": None,
+        "height": None,
+        "exif_make": None,
+        "exif_model": None,
+        "exif_orientation": None,
+        "exif_taken_at": None,
+    }
+    
+    # SVG等矢量图无法由Pillow解析，只记录格式
+    if metadata["image_format"] in (None, "svg"):
+        return metadata
+    
+    try:
+        # 只读取文件头，不解码像素数据
+        with PILImage.open(path) as img:
+            metadata["width"], metadata["height"] = img.size
+            exif = img.getexif()
+            if exif:
+                metadata["exif_make"] = _clean_text(exif.get(EXIF_MAKE))
+                metadata["exif_model"] = _clean_text(exif.get(EXIF_MODEL))
+                orientation = exif.get(EXIF_ORIENTATION)
+                metadata["exif_orientation"] = int(orientation) if orientation else None
+                taken_at = exif.get_ifd(EXIF_IFD).get(EXIF_DATETIME_ORIGINAL) or exif.get(EXIF_DATETIME)
+                metadata["exif_taken_at"] = _parse_exif_datetime(taken_at)
+                # 方向为5-8时图片需要旋转90度显示，布局尺寸应交换宽高
+                if metadata["exif_orientation"] in (5, 6, 7, 8):
+                    metadata["width"], metadata["height"] = metadata["height"], metadata["width"]
+    except Exception as e:
+        logger.warning(f"解析图片元数据失败: {os.path.basename(path)}, {str(e)}")
+    
+    return metadata
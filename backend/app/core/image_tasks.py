@@ -0,0 +1,78 @@
+import os
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from sqlmodel import Session
+
+from app.core.config import (
+    STATIC_FILES_DIR, IMAGE_TRANSCODE_ENABLED, IMAGE_TRANSCODE_QUALITY, IMAGE_TASK_WORKERS, IMAGE_METADATA_ENABLED
+)
+from app.core.image_metadata import extract_metadata
+from app.core.record_cache import image_cache
+from app.core.transcoder import ImageTranscoder, remove_variants
+from app.db import database
+from app.models.image import Image
+
+# 创建日志记录器
+logger = logging.getLogger("image_tasks")
+
+# 上传后处理任务的后台线程池，与请求处理线程池隔离
+executor = ThreadPoolExecutor(max_workers=IMAGE_TASK_WORKERS, thread_name_prefix="image-task")
+
+transcoder = ImageTranscoder(STATIC_FILES_DIR, IMAGE_TRANSCODE_QUALITY) if IMAGE_TRANSCODE_ENABLED else None
+
+
+def process_image(image_id: int):
+    """上传后处理：提取元数据、生成WebP/AVIF变体，并记录到数据库"""
+    with Session(database.engine) as session:
+        image = session.get(Image, image_id)
+        if not image:
+            return
+        
+        if IMAGE_METADATA_ENABLED:
+            try:
+                metadata = extract_metadata(os.path.join(STATIC_FILES_DIR, image.file_path))
+                for key, value in metadata.items():
+                    setattr(image, key, value)
+            except Exception as e:
+                logger.error(f"提取图片元数据失败: ID {image_id}, {str(e)}")
+        
+        if transcoder:
+            try:
+                # 优先使用按文件头识别的真实格式
+                source_type = f"image/{image.image_format}" if image.image_format else image.content_type
+                variants = transcoder.transcode(image.file_path, source_type)
+                image.webp_path = variants["webp"]
+                image.avif_path = variants["avif"]
+            except Exception as e:
+                logger.error(f"图片转码失败: ID {image_id}, {str(e)}")
+        
+        session.add(image)
+        session.commit()
+    image_cache.invalidate(image_id)
+
+
+def remove_image_files(relative_paths: List[str]):
+    """删除图片文件及其转码变体"""
+    for relative_path in relative_paths:
+        file_path = os.path.join(STATIC_FILES_DIR, relative_path)
+        try:
+            if os.path.exists(file_path):
+                os.remove(file_path)
+            remove_variants(file_path)
+        except OSError as e:
+            # 删除失败的文件由垃圾回收兜底
+            logger.error(f"删除图片文件失败: {relative_path}, {str(e)}")
+
+
+def schedule_file_removal(relative_paths: List[str]):
+    """异步删除图片文件，不阻塞请求"""
+    if relative_paths:
+        executor.submit(remove_image_files, list(relative_paths))
+
+
+def schedule_post_upload(image_id: int):
+    """提交上传后的后台处理任务，不阻塞上传请求"""
+    if IMAGE_METADATA_ENABLED or transcoder:
+        executor.submit(process_image, image_id)
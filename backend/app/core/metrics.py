@@ -0,0 +1,406 @@
+import os
+import re
+import json
+import time
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# 默认的延迟直方图分桶（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+# 字节数直方图分桶
+BYTES_BUCKETS = (1024, 10 * 1024, 100 * 1024, 512 * 1024, 1024 ** 2, 5 * 1024 ** 2, 10 * 1024 ** 2, 50 * 1024 ** 2)
+
+# 多进程快照目录中的文件：各进程的快照 <pid>.json、已退出进程的累计值和目录锁
+SNAPSHOT_FILE = re.compile(r"^(\d+)\.json$")
+TOTALS_FILE = "totals.json"
+LOCK_FILE = ".lock"
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+def _escape(value: str) -> str:
+    """转义标签值"""
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    """格式化标签为 {a="x",b="y"}"""
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """指标基类，按标签值保存各时间序列"""
+    
+    metric_type = ""
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], object] = {}
+    
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+    
+    def dump(self) -> list:
+        """当前进程各时间序列的副本（可JSON序列化）"""
+        with self._lock:
+            return [[list(key), json.loads(json.dumps(value))] for key, value in self._values.items()]
+    
+    def merge(self, dump: list):
+        """把其他进程 dump() 的增量累加到当前进程"""
+        with self._lock:
+            for key, value in dump:
+                key = tuple(key)
+                self._values[key] = self._merge(self._values[key], value) if key in self._values else value
+    
+    def reset(self):
+        """清空所有时间序列"""
+        with self._lock:
+            self._values.clear()
+    
+    @staticmethod
+    def _merge(total, value):
+        """合并多个进程的同一时间序列，计数器和瞬时值相加"""
+        return total + value
+    
+    def combine(self, dumps: List[list]) -> list:
+        """合并多个进程的 dump() 结果"""
+        merged: Dict[Tuple[str, ...], object] = {}
+        for dump in dumps:
+            for key, value in dump:
+                key = tuple(key)
+                merged[key] = self._merge(merged[key], value) if key in merged else value
+        return [[list(key), value] for key, value in merged.items()]
+    
+    def render(self, dumps: Optional[List[list]] = None) -> List[str]:
+        """输出当前进程的指标；传入多个进程的 dump() 结果时输出合并后的值"""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+        if dumps is None:
+            with self._lock:
+                items = list(self._values.items())
+        else:
+            items = [(tuple(key), value) for key, value in self.combine(dumps)]
+        for key, value in items:
+            lines.extend(self._render_series(key, value))
+        return lines
+    
+    def _render_series(self, key, value) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_number(value)}"]
+
+
+class Counter(_Metric):
+    """只增计数器"""
+    
+    metric_type = "counter"
+    
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """可增可减的瞬时值"""
+    
+    metric_type = "gauge"
+    
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+    
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+    
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+    
+    @contextmanager
+    def track_inprogress(self, **labels):
+        """在代码块执行期间加一"""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram(_Metric):
+    """累积分桶直方图"""
+    
+    metric_type = "histogram"
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+    
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+                self._values[key] = series
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["buckets"][index] += 1
+                    break
+            series["sum"] += value
+            series["count"] += 1
+    
+    @contextmanager
+    def time(self, **labels):
+        """记录代码块的执行耗时（秒）"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+    
+    @staticmethod
+    def _merge(total, value):
+        return {
+            "buckets": [a + b for a, b in zip(total["buckets"], value["buckets"])],
+            "sum": total["sum"] + value["sum"],
+            "count": total["count"] + value["count"],
+        }
+    
+    def _render_series(self, key, value) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, value["buckets"]):
+            cumulative += count
+            labels = _format_labels(self.labelnames, key, ("le", _format_number(bound)))
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {_format_number(value['sum'])}")
+        lines.append(f"{self.name}_count{labels} {value['count']}")
+        return lines
+
+
+def _read_json(path: str) -> Optional[dict]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json(path: str, data: dict):
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(temp_path, path)
+
+
+def _pid_alive(pid: int) -> bool:
+    if os.name == "nt":
+        # Windows上 os.kill 会结束目标进程，无法用于探测
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+@contextmanager
+def _directory_lock(directory: str):
+    """快照目录锁，同一主机的多个进程互斥地读写快照和累计值"""
+    with open(os.path.join(directory, LOCK_FILE), "a") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        yield
+
+
+class Registry:
+    """指标注册表"""
+    
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        # 区分先后使用同一PID的不同进程
+        self._started = time.time_ns()
+    
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+    
+    def render(self) -> str:
+        """按Prometheus文本格式输出所有指标"""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+    
+    def dump(self) -> Dict[str, list]:
+        """当前进程所有指标的副本，按指标名索引"""
+        return {metric.name: metric.dump() for metric in self._metrics}
+    
+    def merge(self, dumps: Dict[str, list]):
+        """
+        合并其他进程（如PDF转换工作进程）记录的指标增量
+        
+        工作进程执行任务前调用 reset()，任务结束后把 dump() 结果交给服务进程合并。
+        """
+        for metric in self._metrics:
+            metric.merge(dumps.get(metric.name, []))
+    
+    def reset(self):
+        """清空所有指标"""
+        for metric in self._metrics:
+            metric.reset()
+    
+    def _fold(self, directory: str, snapshots: List[dict]):
+        """把已退出进程的计数器和直方图并入累计值文件，瞬时值随进程退出丢弃（调用方需持有目录锁）"""
+        path = os.path.join(directory, TOTALS_FILE)
+        totals = _read_json(path) or {}
+        for metric in self._metrics:
+            if isinstance(metric, Gauge):
+                continue
+            totals[metric.name] = metric.combine(
+                [totals.get(metric.name, [])] + [snapshot["metrics"].get(metric.name, []) for snapshot in snapshots]
+            )
+        _write_json(path, totals)
+    
+    def write_snapshot(self, directory: str):
+        """把当前进程的指标写入快照目录（<pid>.json），供多进程部署时汇总"""
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{os.getpid()}.json")
+        with _directory_lock(directory):
+            previous = _read_json(path)
+            if previous and previous.get("started") != self._started:
+                # PID被复用：先保留上一个进程的累计值，避免计数器回退
+                self._fold(directory, [previous])
+            _write_json(path, {"pid": os.getpid(), "started": self._started, "metrics": self.dump()})
+    
+    def render_multiprocess(self, directory: str) -> str:
+        """
+        汇总快照目录中所有进程的指标（目录只供同一主机上的进程使用）
+        
+        运行中进程的快照直接合并；已退出进程（退出前会写入最终快照）的计数器和直方图并入累计值文件后
+        删除其快照，瞬时值不再计入。
+        """
+        os.makedirs(directory, exist_ok=True)
+        snapshots = []
+        with _directory_lock(directory):
+            dead = []
+            for name in os.listdir(directory):
+                match = SNAPSHOT_FILE.match(name)
+                if not match:
+                    continue
+                snapshot = _read_json(os.path.join(directory, name))
+                if snapshot is None:
+                    continue
+                if _pid_alive(int(match.group(1))):
+                    snapshots.append(snapshot["metrics"])
+                else:
+                    dead.append((name, snapshot))
+            if dead:
+                self._fold(directory, [snapshot for _, snapshot in dead])
+                for name, _ in dead:
+                    os.remove(os.path.join(directory, name))
+            totals = _read_json(os.path.join(directory, TOTALS_FILE)) or {}
+        lines = []
+        for metric in self._metrics:
+            dumps = [snapshot.get(metric.name, []) for snapshot in snapshots] + [totals.get(metric.name, [])]
+            lines.extend(metric.render(dumps))
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# HTTP请求
+HTTP_REQUEST_DURATION = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "HTTP请求处理耗时", ("method", "route", "status")
+))
+HTTP_REQUESTS_IN_FLIGHT = REGISTRY.register(Gauge(
+    "http_requests_in_flight", "正在处理的HTTP请求数"
+))
+
+# 图片上传
+IMAGE_UPLOAD_BYTES = REGISTRY.register(Counter(
+    "image_upload_bytes_total", "已保存的上传图片总字节数", ("mode",)
+))
+IMAGE_UPLOAD_SIZE = REGISTRY.register(Histogram(
+    "image_upload_size_bytes", "单张上传图片大小", ("mode",), buckets=BYTES_BUCKETS
+))
+
+# 数据库
+DB_QUERY_DURATION = REGISTRY.register(Histogram(
+    "db_query_duration_seconds", "数据库语句执行耗时", ("operation",),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+))
+
+# PDF转换
+PDF_STAGE_DURATION = REGISTRY.register(Histogram(
+    "pdf_conversion_stage_duration_seconds", "PDF转换各阶段耗时", ("stage",)
+))
+PDF_CONVERSIONS_IN_FLIGHT = REGISTRY.register(Gauge(
+    "pdf_conversions_in_flight", "正在进行的PDF转换数"
+))
+PDF_CONVERSIONS = REGISTRY.register(Counter(
+    "pdf_conversions_total", "PDF转换次数", ("result",)
+))
+
+# AI调用
+AI_REQUEST_DURATION = REGISTRY.register(Histogram(
+    "ai_request_duration_seconds", "AI模型请求耗时", ("model",)
+))
+AI_REQUEST_ERRORS = REGISTRY.register(Counter(
+    "ai_request_errors_total", "AI模型请求失败次数", ("model", "reason")
+))
+
+# 记录读缓存
+RECORD_CACHE_REQUESTS = REGISTRY.register(Counter(
+    "record_cache_requests_total", "记录缓存查询次数", ("cache", "result")
+))
+RECORD_CACHE_EVICTIONS = REGISTRY.register(Counter(
+    "record_cache_evictions_total", "记录缓存因容量淘汰的条数", ("cache",)
+))
+
+
+def instrument_engine(engine):
+    """为SQLAlchemy同步引擎（或异步引擎的 sync_engine）注册语句耗时统计"""
+    from sqlalchemy import event
+    
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+    
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_start_time"].pop()
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+        if operation not in ("SELECT", "INSERT", "UPDATE", "DELETE"):
+            operation = "OTHER"
+        DB_QUERY_DURATION.observe(time.perf_counter() - started, operation=operation)
+    
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        # 语句执行失败时不会触发 after_cursor_execute，需丢弃对应的开始时间
+        if context.connection is not None:
+            stack = context.connection.info.get("query_start_time")
+            if stack:
+                stack.pop()
@@ -0,0 +1,51 @@
+import base64
+from datetime import datetime
+from typing import Optional, Tuple
+
+
+class InvalidCursorError(ValueError):
+    """分页游标格式错误"""
+    pass
+
+
+def encode_cursor(created_at: datetime, item_id: int) -> str:
+    """
+    将 (created_at, id) 编码为不透明的分页游标
+    
+    Args:
+        created_at: 当前页最后一条记录的创建时间
+        item_id: 当前页最后一条记录的ID
+        
+    Returns:
+        URL安全的游标字符串
+    """
+    raw = f"{created_at.isoformat()}|{item_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[datetime, int]]:
+    """
+    解码分页游标
+    
+    Args:
+        cursor: encode_cursor 生成的游标，为空表示第一页
+        
+    Returns:
+        (created_at, id) 元组，游标为空时返回None
+        
+    Raises:
+        InvalidCursorError: 游标无法解析
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, item_id = base64.urlsafe_b64decode(padded).decode("utf-8").split("|", 1)
+        return datetime.fromisoformat(created_at), int(item_id)
+    except Exception:
+        raise InvalidCursorError(f"无效的分页游标: {cursor}")
+
+
+def escape_like(value: str) -> str:
+    """转义LIKE模式中的通配符，用于前缀匹配"""
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
@@ -1,34 +1,59 @@
 import os
+import math
 import uuid
-import PyPDF2
-from docx import Document
-from docx.shared import Pt, Inches
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from fastapi import UploadFile
 import shutil
 import logging
-from typing import  Tuple
+from dataclasses import dataclass
+from typing import  List, Optional, Callable
 
 from app.core.ai_processor import AIProcessor
+from app.core.pdf_pages import PageText, extract_page_range, join_pages
+from app.core.metrics import PDF_STAGE_DURATION
 from app.core.ragflow import upload_files_to_dataset
 
 # 创建日志记录器
 logger = logging.getLogger("pdf_handler")
 
 
+@dataclass
+class ConversionResult:
+    """PDF转换结果"""
+    output_path: str
+    pages: List[PageText]
+    text_content: str
+    processed_text: str
+    markdown_path: str
+    
+    @property
+    def page_count(self) -> int:
+        return len(self.pages)
+
+
 class PDFHandler:
     """PDF处理工具类"""
     
-    def __init__(self, upload_dir: str, output_dir: str, base_url: str, ai_base_url: str = None, ai_model: str = None):
+    def __init__(self, upload_dir: str, output_dir: str, base_url: str, ai_base_url: str = None, ai_model: str = None,
+                 parallel_min_pages: int = 0, extract_workers: int = 0,
+                 ai_chunk_tokens: int = 0, ai_chunk_overlap: int = 0, ai_chunk_concurrency: int = 1):
         self.upload_dir = upload_dir
         self.output_dir = output_dir
         self.base_url = base_url
+        # 页数达到parallel_min_pages时按页范围分给extract_workers个进程提取，0表示始终串行
+        self.parallel_min_pages = parallel_min_pages
+        self.extract_workers = extract_workers or 1
         os.makedirs(upload_dir, exist_ok=True)
         os.makedirs(output_dir, exist_ok=True)
         
         # 初始化AI处理器
         self.ai_processor = None
         if ai_base_url and ai_model:
-            self.ai_processor = AIProcessor(ai_base_url, ai_model)
+            self.ai_processor = AIProcessor(
+                ai_base_url, ai_model, ai_chunk_tokens, ai_chunk_overlap, ai_chunk_concurrency
+            )
             logger.info(f"AI处理器已初始化: {ai_base_url}, 模型: {ai_model}")
     
     async def save_pdf(self, file: UploadFile) -> str:
@@ -56,65 +81,106 @@ class PDFHandler:
         
         return pdf_path
     
-    def extract_pdf_text(self, pdf_path: str) -> str:
+    def extract_pages(self, pdf_path: str, on_page: Optional[Callable[[int, int], None]] = None) -> List[PageText]:
         """
-        从PDF文件中提取文本
+        解析PDF并逐页提取文本（只解析一次，结果供Word、AI处理和数据库共用）
         
         Args:
             pdf_path: PDF文件路径
+            on_page: 提取进度回调，参数为 (已提取页数, 总页数)；并行提取时按页范围回调
             
         Returns:
-            提取的文本内容
+            按页码顺序的逐页文本，包含无文本的页
         """
+        import PyPDF2
+        
         logger.info(f"开始从PDF提取文本: {pdf_path}")
         
-        try:
-            # 用于存储所有提取的文本
-            all_text = []
-            
-            # 打开PDF文件
-            with open(pdf_path, 'rb') as file:
-                reader = PyPDF2.PdfReader(file)
-                
-                # 获取PDF页数
-                total_pages = len(reader.pages)
-                logger.info(f"PDF共有 {total_pages} 页")
-                
-                # 处理每一页
-                for page_num in range(total_pages):
-                    # 获取页面
-                    page = reader.pages[page_num]
-                    
-                    # 提取文本
-                    text = page.extract_text()
-                    
-                    # 添加到文本集合
-                    if text:
-                        all_text.append(f"--- 第 {page_num + 1} 页 ---\n{text}")
-                    
-                    logger.info(f"已提取第 {page_num + 1} 页文本")
-            
-            # 合并所有文本
-            full_text = "\n\n".join(all_text)
-            logger.info(f"文本提取完成，总长度: {len(full_text)}")
+        pages = None
+        with open(pdf_path, 'rb') as file:
+            reader = PyPDF2.PdfReader(file)
+            total_pages = len(reader.pages)
+            logger.info(f"PDF共有 {total_pages} 页")
             
-            return full_text
+            if not self._should_parallelize(total_pages):
+                pages = []
+                for page_num, page in enumerate(reader.pages, start=1):
+                    pages.append(PageText(page_num, page.extract_text() or ""))
+                    if on_page:
+                        on_page(page_num, total_pages)
+        
+        if pages is None:
+            try:
+                pages = self._extract_parallel(pdf_path, total_pages, on_page)
+            except (OSError, BrokenProcessPool) as e:
+                logger.error(f"并行提取失败，改为串行提取: {str(e)}")
+                pages = extract_page_range(pdf_path, 0, total_pages)
+                if on_page:
+                    on_page(total_pages, total_pages)
+        
+        logger.info(f"文本提取完成，{len(pages)} 页，总字符数: {sum(page.char_count for page in pages)}")
+        return pages
+    
+    def _should_parallelize(self, total_pages: int) -> bool:
+        return self.parallel_min_pages > 0 and total_pages >= self.parallel_min_pages and self.extract_workers > 1
+    
+    def _extract_parallel(self, pdf_path: str, total_pages: int,
+                          on_page: Optional[Callable[[int, int], None]] = None) -> List[PageText]:
+        """按页范围分给进程池提取，按范围顺序拼接结果"""
+        # 每个进程分到两个范围，部分页面特别复杂时负载更均衡；每个范围都需重新打开PDF，不宜过小
+        chunk_size = max(math.ceil(total_pages / (self.extract_workers * 2)), 25)
+        ranges = [(start, min(start + chunk_size, total_pages)) for start in range(0, total_pages, chunk_size)]
+        workers = min(self.extract_workers, len(ranges))
+        logger.info(f"并行提取: {workers} 个进程, {len(ranges)} 个页范围")
+        
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            results = executor.map(
+                extract_page_range, [pdf_path] * len(ranges), [start for start, _ in ranges], [end for _, end in ranges]
+            )
+            pages = []
+            for chunk in results:
+                pages.extend(chunk)
+                if on_page:
+                    on_page(len(pages), total_pages)
+            return pages
+    
+    def extract_pdf_text(self, pdf_path: str) -> str:
+        """
+        从PDF文件中提取文本
+        
+        Args:
+            pdf_path: PDF文件路径
             
+        Returns:
+            提取的文本内容
+        """
+        try:
+            return join_pages(self.extract_pages(pdf_path))
         except Exception as e:
             logger.error(f"提取PDF文本时出错: {str(e)}")
             return f"提取文本时出错: {str(e)}"
     
-    def convert_pdf_to_word(self, pdf_path: str,enter_text:str=None) -> Tuple[str, int, str, str, str]:
+    def convert_pdf_to_word(self, pdf_path: str,enter_text:str=None,
+                            progress: Optional[Callable[..., None]] = None) -> ConversionResult:
         """
         将PDF文件转换为Word文档
         
         Args:
             pdf_path: PDF文件路径
             enter_text: 额外的文本输入
+            progress: 进度回调，参数为 (事件, 百分比, **事件内容)，事件依次为
+                pages_extracted、docx_written、ai_tokens、markdown_written、ragflow_pushed
         
         Returns:
-            tuple: (输出文件的路径, 总页数, 提取的文本内容, 处理后的文本内容, markdown文件路径)
+            转换结果：输出文件路径、逐页文本、合并后的文本、AI处理后的文本和Markdown文件路径
+            
+        Raises:
+            PDF无法解析（损坏、加密等）或生成Word失败时抛出原异常
         """
+        # Word生成依赖较重，首次转换时才导入
+        from docx import Document
+        from docx.shared import Pt, Inches
+        
         # 生成输出文件名
         base_name = os.path.splitext(os.path.basename(pdf_path))[0]
         docx_filename = f"{base_name}.docx"
@@ -126,6 +192,10 @@ class PDFHandler:
         
         logger.info(f"开始转换PDF到Word: {pdf_path} -> {output_path}")
         
+        def report(event: str, percent: int, **data):
+            if progress:
+                progress(event, percent, **data)
+        
         try:
             # 创建一个新的Word文档
             doc = Document()
@@ -138,64 +208,61 @@ class PDFHandler:
                 section.left_margin = Inches(1)
                 section.right_margin = Inches(1)
             
-            # 提取文本
-            full_text = self.extract_pdf_text(pdf_path)
+            # 提取文本（只解析一次PDF）
+            with PDF_STAGE_DURATION.time(stage="extract"):
+                pages = self.extract_pages(
+                    pdf_path,
+                    on_page=lambda extracted, total: report(
+                        "pages_extracted", 5 + 25 * extracted // total, extracted=extracted, total=total
+                    )
+                )
+            full_text = join_pages(pages)
             
-            # 打开PDF文件获取页数
-            with open(pdf_path, 'rb') as file:
-                reader = PyPDF2.PdfReader(file)
-                total_pages = len(reader.pages)
-                
-                # 处理每一页
-                for page_num in range(total_pages):
-                    # 获取页面
-                    page = reader.pages[page_num]
-                    
-                    # 提取文本
-                    text = page.extract_text()
-                    
+            # 处理每一页，Word文档不依赖AI处理结果，先行保存
+            with PDF_STAGE_DURATION.time(stage="docx"):
+                for page in pages:
                     # 添加页码标题
-                    doc.add_heading(f'第 {page_num + 1} 页', level=1)
+                    doc.add_heading(f'第 {page.page_number} 页', level=1)
                     
                     # 添加提取的文本
                     paragraph = doc.add_paragraph()
-                    run = paragraph.add_run(text)
+                    run = paragraph.add_run(page.text)
                     run.font.size = Pt(11)  # 设置字体大小
                     
                     # 添加分页符（除了最后一页）
-                    if page_num < total_pages - 1:
+                    if page.page_number < len(pages):
                         doc.add_page_break()
-                    
-                    logger.info(f"已处理第 {page_num + 1} 页")
+                doc.save(output_path)
+            logger.info(f"已保存Word文档: {output_path}, {len(pages)} 页")
+            report("docx_written", 50, pages=len(pages))
             
             # 使用AI处理文本
             processed_text = ""
             if self.ai_processor and full_text:
                 logger.info("使用AI处理提取的文本")
-                processed_text = self.ai_processor.process_text(full_text,enter_text=enter_text)
+                with PDF_STAGE_DURATION.time(stage="ai"):
+                    processed_text = self.ai_processor.process_text(
+                        full_text, enter_text=enter_text,
+                        on_delta=(lambda delta: report("ai_tokens", 50, delta=delta)) if progress else None
+                    )
                 
                 # 保存为Markdown文件
                 with open(markdown_path, "w", encoding="utf-8") as md_file:
                     md_file.write(processed_text)
                 logger.info(f"已保存Markdown文件: {markdown_path}")
+                report("markdown_written", 80, chars=len(processed_text))
                 # 将markdown文件上传至ragflow
-                upload_files_to_dataset([markdown_path])
+                with PDF_STAGE_DURATION.time(stage="ragflow"):
+                    response = upload_files_to_dataset([markdown_path])
+                report("ragflow_pushed", 90, ok=response is not None and response.status_code < 400)
             else:
                 logger.info("未配置AI处理器或文本为空，跳过AI处理")
             
-            # 保存Word文档
-            doc.save(output_path)
             logger.info(f"转换完成！已保存为: {output_path}")
             
-            return output_path, total_pages, full_text, processed_text, markdown_path
+            return ConversionResult(output_path, pages, full_text, processed_text, markdown_path)
             
         except Exception as e:
+            # 不生成错误文档，由任务队列把任务标记为失败并记录原因
             logger.error(f"转换PDF到Word时出错: {str(e)}")
-            # 创建一个包含错误信息的文档
-            error_doc = Document()
-            error_doc.add_heading("转换错误", level=1)
-            error_doc.add_paragraph(f"转换PDF文件时出现错误: {str(e)}")
-            error_doc.save(output_path)
-            
-            # 返回错误文档、0页和空文本
-            return output_path, 0, "", "", "" 
\ No newline at end of file
+            raise
@@ -0,0 +1,560 @@
+"""
+PDF转换任务队列
+
+转换请求只保存PDF并写入一条 queued 状态的 PDFJob 记录，随即返回。
+每个服务进程运行一个调度协程，从数据库中认领任务，交给有上限的工作进程池执行：
+
+- 认领通过带状态条件的UPDATE完成，多个服务进程共享同一张任务表时不会重复执行；
+- 工作进程执行转换、保存转换记录和文本，并把阶段和进度写回任务记录；
+- 调度协程定期为执行中的任务更新心跳，心跳超时（服务重启、进程被杀）的任务重新排队，
+  超过最大尝试次数后标记为失败；
+- 结束超过保留时间的任务记录和进度事件定期删除；
+- 任务的每次执行以尝试次数（attempts）标识，进度、完成、失败和重新排队都是带
+  「执行中且尝试次数相同」条件的UPDATE。已被重新排队的旧执行（如服务停止后仍在运行的工作进程）
+  不会再写入进度，也不会保存转换记录，避免同一任务产生重复结果。
+"""
+import os
+import json
+import time
+import asyncio
+import logging
+import multiprocessing
+from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from sqlmodel import Session, select, update, delete
+
+from app.core.pdf_handler import PDFHandler, ConversionResult
+from app.core.text_store import TextStore, create_text_store
+from app.core.search_index import SearchIndex, create_search_index
+from app.core.metrics import REGISTRY, PDF_STAGE_DURATION, PDF_CONVERSIONS_IN_FLIGHT, PDF_CONVERSIONS
+from app.core.config import AI_BASE_URL, AI_MODEL, BASE_URL, PDF_UPLOAD_DIR, PDF_OUTPUT_DIR
+from app.core.config import AI_CHUNK_TOKENS, AI_CHUNK_OVERLAP_TOKENS, AI_CHUNK_CONCURRENCY
+from app.core.config import PDF_PARALLEL_EXTRACT_MIN_PAGES, PDF_EXTRACT_WORKERS, PDF_JOB_WORKERS, SERVER_WORKERS
+from app.core.config import TEXT_STORE_BACKEND, TEXT_STORE_DIR, TEXT_STORE_CODEC, SEARCH_INDEX_PATH
+from app.db import database
+from app.models.pdf_convert import PDFConversion, PDFJob, PDFJobEvent
+
+# 创建日志记录器
+logger = logging.getLogger("pdf_jobs")
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+# 进度事件：upload_saved、started、pages_extracted、docx_written、ai_tokens、markdown_written、
+# ragflow_pushed、retrying，以 done 或 failed 结束
+TERMINAL_EVENTS = (JOB_DONE, JOB_FAILED)
+
+# 工作进程中页数和AI输出事件的最小写入间隔（秒），间隔内的AI输出合并为一个事件
+EVENT_THROTTLE_SECONDS = 0.5
+
+# 清理已结束任务的间隔（秒）和每次删除的任务数上限
+PURGE_INTERVAL_SECONDS = 600
+PURGE_BATCH_SIZE = 500
+
+# 处理器、文本存储和全文索引在首次使用时创建，只提供图片服务的进程不会初始化
+
+
+def default_extract_workers() -> int:
+    """
+    并行提取的默认进程数：主机上同时运行的转换工作进程（服务进程数 × PDF_JOB_WORKERS）平分CPU
+
+    serve.py 启动时把实际的服务进程数写入 SERVER_WORKERS；结果为1时不并行提取
+    """
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    return max(cpus // (max(SERVER_WORKERS, 1) * max(PDF_JOB_WORKERS, 1)), 1)
+
+
+@lru_cache(maxsize=None)
+def get_pdf_handler() -> PDFHandler:
+    """PDF处理器"""
+    return PDFHandler(
+        PDF_UPLOAD_DIR, PDF_OUTPUT_DIR, BASE_URL, AI_BASE_URL, AI_MODEL,
+        PDF_PARALLEL_EXTRACT_MIN_PAGES, PDF_EXTRACT_WORKERS or default_extract_workers(),
+        AI_CHUNK_TOKENS, AI_CHUNK_OVERLAP_TOKENS, AI_CHUNK_CONCURRENCY
+    )
+
+
+@lru_cache(maxsize=None)
+def get_text_store() -> Optional[TextStore]:
+    """文本存储，为None时文本直接保存在主表中"""
+    return create_text_store(TEXT_STORE_BACKEND, TEXT_STORE_DIR, TEXT_STORE_CODEC)
+
+
+@lru_cache(maxsize=None)
+def get_search_index() -> Optional[SearchIndex]:
+    """全文索引，为None时不提供搜索"""
+    return create_search_index(SEARCH_INDEX_PATH)
+
+
+def new_event(job_id: int, event: str, **data) -> PDFJobEvent:
+    """构建进度事件记录"""
+    return PDFJobEvent(job_id=job_id, event=event, data=json.dumps(data, ensure_ascii=False))
+
+
+class JobLostError(Exception):
+    """任务已不归本次执行所有（心跳超时后被重新排队或已结束）"""
+
+
+def owned_by(job_id: int, attempt: int, stale_before: Optional[datetime] = None) -> list:
+    """任务仍由第attempt次执行持有的条件；stale_before非空时还要求心跳早于该时间"""
+    conditions = [PDFJob.id == job_id, PDFJob.status == JOB_RUNNING, PDFJob.attempts == attempt]
+    if stale_before is not None:
+        conditions.append(PDFJob.heartbeat_at < stale_before)
+    return conditions
+
+
+def update_job(job_id: int, attempt: int, **values):
+    """更新本次执行持有的任务记录，同时刷新心跳；任务已不归本次执行时抛出 JobLostError"""
+    with Session(database.engine) as session:
+        result = session.exec(
+            update(PDFJob).where(*owned_by(job_id, attempt)).values(heartbeat_at=datetime.now(), **values)
+        )
+        session.commit()
+    if result.rowcount != 1:
+        raise JobLostError(f"任务已被重新排队或已结束: ID {job_id}")
+
+
+# ---- 以下在工作进程中执行 ----
+
+
+def _init_worker():
+    """工作进程初始化：与服务进程使用相同的日志格式"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+
+class JobProgress:
+    """
+    转换进度回调：更新任务的阶段和进度并写入进度事件，高频事件按时间间隔合并
+
+    任务不再归本次执行所有时停止写入，并在下一个阶段事件时抛出 JobLostError 中止转换
+    （AI输出在模型调用线程中回调，只停止写入，不在其中抛出）
+    """
+
+    def __init__(self, job_id: int, attempt: int, interval: float = EVENT_THROTTLE_SECONDS):
+        self.job_id = job_id
+        self.attempt = attempt
+        self.interval = interval
+        self.owned = True
+        self._last_write = 0.0
+        self._tokens = 0
+        self._chars = 0
+        self._pending = False
+        self._pending_percent = 0
+
+    def __call__(self, event: str, percent: int, **data):
+        throttled = time.monotonic() - self._last_write < self.interval
+        if event == "ai_tokens":
+            self._tokens += 1
+            self._chars += len(data["delta"])
+            self._pending = True
+            self._pending_percent = percent
+            if not throttled:
+                self.flush()
+            return
+        self.flush()
+        self._check_owned()
+        # 提取进度只保留间隔内的最后一次，最后一页总会写入
+        if event == "pages_extracted" and throttled and data["extracted"] < data["total"]:
+            return
+        self._write(event, percent, data)
+        self._check_owned()
+
+    def _check_owned(self):
+        if not self.owned:
+            raise JobLostError(f"任务已被重新排队或已结束: ID {self.job_id}")
+
+    def flush(self):
+        """写入合并中的AI输出进度：只记录累计的输出段数和字符数，输出文本保存在Markdown文件中"""
+        if self._pending:
+            self._pending = False
+            self._write("ai_tokens", self._pending_percent, {"tokens": self._tokens, "chars": self._chars})
+
+    def _write(self, event: str, percent: int, data: dict):
+        if not self.owned:
+            return
+        with Session(database.engine) as session:
+            result = session.exec(update(PDFJob).where(*owned_by(self.job_id, self.attempt)).values(
+                stage=event, progress=percent, heartbeat_at=datetime.now()
+            ))
+            if result.rowcount == 1:
+                session.add(new_event(self.job_id, event, progress=percent, **data))
+            else:
+                self.owned = False
+            session.commit()
+        self._last_write = time.monotonic()
+
+
+def save_conversion(session: Session, original_filename: str, result: ConversionResult) -> PDFConversion:
+    """保存转换记录和文本（启用文本存储时文本不写入主表），并按页更新全文索引"""
+    text_content, processed_text, markdown_path = result.text_content, result.processed_text, result.markdown_path
+    relative_path = os.path.relpath(result.output_path, PDF_OUTPUT_DIR)
+    markdown_relative_path = (
+        os.path.relpath(markdown_path, PDF_OUTPUT_DIR) if markdown_path and os.path.exists(markdown_path) else None
+    )
+    text_store = get_text_store()
+    conversion = PDFConversion(
+        original_filename=original_filename,
+        output_filename=os.path.basename(result.output_path),
+        file_path=relative_path,
+        page_count=result.page_count,
+        text_content=None if text_store else text_content,
+        processed_text=None if text_store else processed_text,
+        markdown_path=markdown_relative_path
+    )
+
+    with PDF_STAGE_DURATION.time(stage="db_commit"):
+        session.add(conversion)
+        session.commit()
+        if text_store:
+            # 记录提交后才写入文本存储，避免与数据库存储的写事务互相等待
+            try:
+                if text_content:
+                    conversion.text_hash = text_store.put(conversion.id, "text", text_content)
+                if processed_text:
+                    conversion.processed_text_hash = text_store.put(conversion.id, "processed", processed_text)
+                session.add(conversion)
+                session.commit()
+            except Exception:
+                text_store.delete(conversion.id)
+                session.delete(conversion)
+                session.commit()
+                raise
+        session.refresh(conversion)
+
+    # 更新全文索引，失败不影响转换结果（可通过 rebuild_search_index 重建）
+    search_index = get_search_index()
+    if search_index and text_content:
+        try:
+            with PDF_STAGE_DURATION.time(stage="index"):
+                search_index.index_conversion(
+                    conversion.id, text_content, [(page.page_number, page.text) for page in result.pages]
+                )
+        except Exception as e:
+            logger.error(f"更新全文索引失败: ID {conversion.id}, {str(e)}")
+    return conversion
+
+
+def discard_conversion(session: Session, conversion: PDFConversion):
+    """删除已保存的转换记录、文本和全文索引（输出文件可能已被同一任务的新执行覆盖，予以保留）"""
+    conversion_id = conversion.id
+    session.delete(conversion)
+    session.commit()
+    text_store = get_text_store()
+    if text_store:
+        text_store.delete(conversion_id)
+    search_index = get_search_index()
+    if search_index:
+        search_index.remove_conversion(conversion_id)
+
+
+def run_job(job_id: int, attempt: int):
+    """
+    执行一个转换任务（工作进程中调用）
+
+    Args:
+        job_id: 任务ID
+        attempt: 认领时的尝试次数，用于确认任务仍归本次执行所有
+    """
+    with Session(database.engine) as session:
+        job = session.get(PDFJob, job_id)
+        if not job:
+            raise ValueError(f"任务不存在: ID {job_id}")
+        original_filename, pdf_path, description = job.original_filename, job.pdf_path, job.description
+
+    if not os.path.exists(pdf_path):
+        raise FileNotFoundError("上传的PDF文件不存在")
+
+    logger.info(f"开始执行转换任务: ID {job_id}, {original_filename}")
+    progress = JobProgress(job_id, attempt)
+    result = get_pdf_handler().convert_pdf_to_word(pdf_path, description, progress=progress)
+    progress.flush()
+    if not os.path.exists(result.output_path):
+        raise RuntimeError("生成Word文档失败")
+    logger.info(
+        f"转换完成，输出路径: {result.output_path}, 页数: {result.page_count}, "
+        f"大小: {os.path.getsize(result.output_path)} 字节"
+    )
+
+    update_job(job_id, attempt, stage="db_commit", progress=95)
+    with Session(database.engine) as session:
+        # 带归属条件刷新心跳，与转换记录在同一事务中提交：提交时任务仍归本次执行，
+        # 且之后至少 stale_seconds 内不会被重新排队
+        owned = session.exec(
+            update(PDFJob).where(*owned_by(job_id, attempt)).values(heartbeat_at=datetime.now())
+        ).rowcount == 1
+        if not owned:
+            session.rollback()
+            raise JobLostError(f"任务已被重新排队或已结束: ID {job_id}")
+        conversion = save_conversion(session, original_filename, result)
+        conversion_id = conversion.id
+        done = session.exec(update(PDFJob).where(*owned_by(job_id, attempt)).values(
+            status=JOB_DONE, stage=None, progress=100, conversion_id=conversion_id,
+            finished_at=datetime.now(), heartbeat_at=datetime.now()
+        ))
+        if done.rowcount != 1:
+            # 保存期间超过了心跳超时，任务已由其他执行接手，撤销本次结果
+            session.rollback()
+            discard_conversion(session, conversion)
+            raise JobLostError(f"任务已被重新排队或已结束: ID {job_id}")
+        session.add(new_event(job_id, JOB_DONE, progress=100, conversion_id=conversion_id))
+        session.commit()
+    logger.info(f"转换任务完成: ID {job_id}, 转换记录 ID {conversion_id}")
+
+
+def execute_job(job_id: int, attempt: int) -> Tuple[Dict[str, list], Optional[Exception]]:
+    """
+    工作进程入口：执行任务并返回本次任务记录的监控指标和异常（成功时为None）
+
+    工作进程中的指标（各阶段耗时、AI请求、数据库语句等）不会被 /metrics 输出，
+    每个任务开始前清空，结束后无论成败都交给服务进程合并。工作进程同一时间只执行一个任务。
+    """
+    REGISTRY.reset()
+    try:
+        run_job(job_id, attempt)
+        error = None
+    except Exception as e:
+        error = e
+    return REGISTRY.dump(), error
+
+
+# ---- 以下在服务进程中执行 ----
+
+
+def claim_jobs(limit: int) -> List[PDFJob]:
+    """按提交顺序认领最多limit个排队中的任务"""
+    claimed_ids = []
+    with Session(database.engine) as session:
+        candidates = session.exec(
+            select(PDFJob.id).where(PDFJob.status == JOB_QUEUED).order_by(PDFJob.id).limit(limit)
+        ).all()
+        for job_id in candidates:
+            now = datetime.now()
+            result = session.exec(
+                update(PDFJob)
+                .where(PDFJob.id == job_id, PDFJob.status == JOB_QUEUED)
+                .values(status=JOB_RUNNING, stage=None, progress=0, attempts=PDFJob.attempts + 1,
+                        started_at=now, heartbeat_at=now)
+            )
+            session.commit()
+            # 行数为0表示已被其他服务进程认领
+            if result.rowcount == 1:
+                claimed_ids.append(job_id)
+                session.add(new_event(job_id, "started", progress=0))
+                session.commit()
+        if not claimed_ids:
+            return []
+        return list(session.exec(select(PDFJob).where(PDFJob.id.in_(claimed_ids)).order_by(PDFJob.id)).all())
+
+
+def touch_jobs(attempts: Dict[int, int]):
+    """为本进程执行中的任务更新心跳，参数为 任务ID -> 认领时的尝试次数"""
+    if not attempts:
+        return
+    with Session(database.engine) as session:
+        now = datetime.now()
+        for job_id, attempt in attempts.items():
+            session.exec(update(PDFJob).where(*owned_by(job_id, attempt)).values(heartbeat_at=now))
+        session.commit()
+
+
+def fail_job(job_id: int, attempt: int, error: str, stale_before: Optional[datetime] = None) -> bool:
+    """
+    标记第attempt次执行的任务失败，并删除上传的PDF文件
+
+    Returns:
+        任务已不归该次执行（已完成、已重新排队）时不做修改，返回False
+    """
+    with Session(database.engine) as session:
+        job = session.get(PDFJob, job_id)
+        if not job:
+            return False
+        pdf_path, progress = job.pdf_path, job.progress
+        result = session.exec(
+            update(PDFJob).where(*owned_by(job_id, attempt, stale_before))
+            .values(status=JOB_FAILED, error=error, finished_at=datetime.now())
+        )
+        if result.rowcount != 1:
+            session.rollback()
+            return False
+        session.add(new_event(job_id, JOB_FAILED, progress=progress, error=error))
+        session.commit()
+    if pdf_path and os.path.exists(pdf_path):
+        os.remove(pdf_path)
+        logger.info(f"删除临时PDF文件: {pdf_path}")
+    return True
+
+
+def retry_or_fail(job_id: int, attempts: int, max_attempts: int, reason: str,
+                  stale_before: Optional[datetime] = None):
+    """
+    第attempts次执行异常结束的任务：未超过最大尝试次数时重新排队，否则标记失败
+
+    只在任务仍归该次执行（且心跳早于stale_before）时修改，刚被其他进程认领的任务不受影响
+    """
+    if attempts < max_attempts:
+        with Session(database.engine) as session:
+            result = session.exec(update(PDFJob).where(*owned_by(job_id, attempts, stale_before)).values(
+                status=JOB_QUEUED, stage=None, progress=0, started_at=None, heartbeat_at=datetime.now()
+            ))
+            if result.rowcount != 1:
+                session.rollback()
+                return
+            session.add(new_event(job_id, "retrying", progress=0, attempts=attempts, reason=reason))
+            session.commit()
+        logger.warning(f"任务重新排队: ID {job_id}, 已尝试 {attempts} 次, {reason}")
+    elif fail_job(job_id, attempts, f"{reason}，已尝试 {attempts} 次", stale_before):
+        logger.error(f"任务失败: ID {job_id}, 已尝试 {attempts} 次, {reason}")
+
+
+def requeue_stale_jobs(stale_seconds: int, max_attempts: int) -> int:
+    """心跳超时的执行中任务（执行它的服务进程已退出）重新排队"""
+    deadline = datetime.now() - timedelta(seconds=stale_seconds)
+    with Session(database.engine) as session:
+        stale = session.exec(
+            select(PDFJob.id, PDFJob.attempts)
+            .where(PDFJob.status == JOB_RUNNING, PDFJob.heartbeat_at < deadline)
+        ).all()
+    # 逐个带条件更新：查询之后心跳恢复或被重新认领的任务不会被改回排队
+    for job_id, attempts in stale:
+        retry_or_fail(job_id, attempts, max_attempts, "执行超时或服务重启", deadline)
+    return len(stale)
+
+
+def purge_finished_jobs(retention_seconds: int) -> int:
+    """删除结束（done/failed）超过retention_seconds的任务记录及其进度事件"""
+    cutoff = datetime.now() - timedelta(seconds=retention_seconds)
+    with Session(database.engine) as session:
+        job_ids = session.exec(
+            select(PDFJob.id)
+            .where(PDFJob.status.in_((JOB_DONE, JOB_FAILED)), PDFJob.finished_at < cutoff)
+            .limit(PURGE_BATCH_SIZE)
+        ).all()
+        if job_ids:
+            session.exec(delete(PDFJobEvent).where(PDFJobEvent.job_id.in_(job_ids)))
+            session.exec(delete(PDFJob).where(PDFJob.id.in_(job_ids)))
+            session.commit()
+            logger.info(f"已删除 {len(job_ids)} 个已结束的转换任务及其进度事件")
+    return len(job_ids)
+
+
+class PDFJobQueue:
+    """PDF转换任务调度（每个服务进程一个实例）"""
+
+    def __init__(self, workers: int = 2, max_attempts: int = 3, poll_interval: float = 2,
+                 heartbeat_interval: int = 10, stale_seconds: int = 120, retention_seconds: int = 86400):
+        self.workers = max(workers, 1)
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.stale_seconds = stale_seconds
+        # 已结束任务的保留秒数，0表示不删除
+        self.retention_seconds = retention_seconds
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._running: Dict[int, asyncio.Task] = {}
+        # 任务ID -> 认领时的尝试次数
+        self._attempts: Dict[int, int] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop_task: Optional[asyncio.Task] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """首次执行任务时才启动工作进程；使用spawn，避免复制服务进程中的线程和连接"""
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker
+            )
+        return self._executor
+
+    def start(self):
+        """启动调度协程（需在事件循环中调用）"""
+        self._wakeup = asyncio.Event()
+        self._loop_task = asyncio.create_task(self._run())
+
+    def notify(self):
+        """有新任务提交，立即调度"""
+        if self._wakeup:
+            self._wakeup.set()
+
+    async def _run(self):
+        last_heartbeat = last_purge = 0.0
+        while True:
+            try:
+                if time.monotonic() - last_heartbeat >= self.heartbeat_interval:
+                    last_heartbeat = time.monotonic()
+                    await run_in_threadpool(touch_jobs, dict(self._attempts))
+                    await run_in_threadpool(requeue_stale_jobs, self.stale_seconds, self.max_attempts)
+                if self.retention_seconds > 0 and time.monotonic() - last_purge >= PURGE_INTERVAL_SECONDS:
+                    last_purge = time.monotonic()
+                    await run_in_threadpool(purge_finished_jobs, self.retention_seconds)
+                await self._dispatch()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"任务调度出错: {str(e)}")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def _dispatch(self):
+        """按空闲工作进程数认领任务"""
+        free = self.workers - len(self._running)
+        if free <= 0:
+            return
+        for job in await run_in_threadpool(claim_jobs, free):
+            self._attempts[job.id] = job.attempts
+            self._running[job.id] = asyncio.create_task(self._execute(job))
+
+    async def _execute(self, job: PDFJob):
+        PDF_CONVERSIONS_IN_FLIGHT.inc()
+        PDF_STAGE_DURATION.observe((job.started_at - job.created_at).total_seconds(), stage="queue")
+        executor = self._get_executor()
+        try:
+            metrics, error = await asyncio.wrap_future(executor.submit(execute_job, job.id, job.attempts))
+            REGISTRY.merge(metrics)
+            if error is not None:
+                raise error
+            PDF_CONVERSIONS.inc(result="success")
+        except JobLostError as e:
+            # 任务已由其他执行接手或已结束，不再修改任务状态
+            logger.warning(f"转换结果已丢弃: {str(e)}")
+            PDF_CONVERSIONS.inc(result="lost")
+        except BrokenProcessPool:
+            # 工作进程异常退出（如内存不足被杀），重建进程池后按尝试次数重试
+            if self._executor is executor:
+                self._executor = None
+                executor.shutdown(wait=False)
+            await run_in_threadpool(retry_or_fail, job.id, job.attempts, self.max_attempts, "转换进程异常退出")
+            PDF_CONVERSIONS.inc(result="error")
+        except Exception as e:
+            logger.error(f"转换任务失败: ID {job.id}, {str(e)}")
+            await run_in_threadpool(fail_job, job.id, job.attempts, f"转换失败: {str(e)}")
+            PDF_CONVERSIONS.inc(result="error")
+        finally:
+            PDF_CONVERSIONS_IN_FLIGHT.dec()
+            self._running.pop(job.id, None)
+            self._attempts.pop(job.id, None)
+            self.notify()
+
+    async def stop(self, timeout: float = 30):
+        """停止认领新任务，等待执行中的任务完成；超时未完成的任务在心跳超时后由其他进程重新执行"""
+        if self._loop_task:
+            self._loop_task.cancel()
+        if self._running:
+            logger.info(f"等待 {len(self._running)} 个转换任务完成")
+            await asyncio.wait(list(self._running.values()), timeout=timeout)
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,32 @@
+"""
+PDF逐页文本
+
+只依赖PyPDF2，并行提取时子进程只需导入本模块，启动开销小。
+"""
+from dataclasses import dataclass
+from typing import List
+
+
+@dataclass
+class PageText:
+    """单页提取结果"""
+    page_number: int
+    text: str
+    
+    @property
+    def char_count(self) -> int:
+        return len(self.text)
+
+
+def extract_page_range(pdf_path: str, start: int, end: int) -> List[PageText]:
+    """提取 [start, end) 范围内的页（页序号从0开始），并行提取时在子进程中执行，各自打开PDF"""
+    import PyPDF2
+    
+    with open(pdf_path, 'rb') as file:
+        reader = PyPDF2.PdfReader(file)
+        return [PageText(index + 1, reader.pages[index].extract_text() or "") for index in range(start, end)]
+
+
+def join_pages(pages: List[PageText]) -> str:
+    """合并逐页文本，每页前加分页标记（跳过无文本的页），用于AI处理和保存"""
+    return "\n\n".join(f"--- 第 {page.page_number} 页 ---\n{page.text}" for page in pages if page.text)
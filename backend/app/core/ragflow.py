@@ -1,4 +1,4 @@
-import requests
+from app.core.config import RAGFLOW_BASE_URL, RAGFLOW_DATASET_ID, RAGFLOW_API_KEY
 
 
 def upload_files_to_dataset(file_paths):
@@ -14,10 +14,13 @@ def upload_files_to_dataset(file_paths):
     返回:
     - requests.Response 对象
     """
-    url = f"http://123.157.247.187:27100/api/v1/datasets/759295ee36af11f0a73cd65ac74b6c9e/documents"
+    # 延迟导入，只提供图片服务的进程无需加载
+    import requests
+    
+    url = f"{RAGFLOW_BASE_URL}/api/v1/datasets/{RAGFLOW_DATASET_ID}/documents"
 
     headers = {
-        "Authorization": f"Bearer ragflow-BlNGFjOWZlMzQ2ODExZjA4N2I0ZDY1YW"
+        "Authorization": f"Bearer {RAGFLOW_API_KEY}"
     }
 
     files = [('file', (path.split('/')[-1], open(path, 'rb'))) for path in file_paths]
@@ -27,7 +30,7 @@ def upload_files_to_dataset(file_paths):
             response = session.post(url, headers=headers, files=files).json()
             doc_id = response['data'][0]['id']
             # 解析文档：
-            url_chunks = f"http://123.157.247.187:27100/api/v1/datasets/759295ee36af11f0a73cd65ac74b6c9e/chunks"
+            url_chunks = f"{RAGFLOW_BASE_URL}/api/v1/datasets/{RAGFLOW_DATASET_ID}/chunks"
             data = {
                 'document_ids': [doc_id],
             }
@@ -0,0 +1,248 @@
+import json
+import time
+import logging
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Generic, Optional, Type, TypeVar
+
+from fastapi.concurrency import run_in_threadpool
+from sqlmodel import SQLModel
+
+from app.core.config import (
+    RECORD_CACHE_BACKEND, RECORD_CACHE_MAX_ENTRIES, RECORD_CACHE_TTL, RECORD_CACHE_REDIS_URL
+)
+from app.core.metrics import RECORD_CACHE_REQUESTS, RECORD_CACHE_EVICTIONS
+from app.models.image import Image
+from app.models.pdf_convert import PDFConversionMeta
+
+# 创建日志记录器
+logger = logging.getLogger("record_cache")
+
+ModelT = TypeVar("ModelT", bound=SQLModel)
+
+
+class CacheBackend(ABC):
+    """
+    缓存后端接口
+
+    值为可JSON序列化的字典。blocking为True的后端涉及网络IO，异步代码中会放到线程池调用。
+    """
+
+    blocking = False
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: Dict[str, Any]):
+        ...
+
+    @abstractmethod
+    def delete(self, key: str):
+        ...
+
+    @abstractmethod
+    def clear(self):
+        ...
+
+    @abstractmethod
+    def __len__(self) -> int:
+        ...
+
+
+class LocalCacheBackend(CacheBackend):
+    """进程内LRU缓存，条目超过TTL后失效；多进程部署时各进程独立，最多过期TTL秒"""
+
+    def __init__(self, max_entries: int, ttl: int, name: str = "local"):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.name = name
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at and expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Dict[str, Any]):
+        expires_at = time.monotonic() + self.ttl if self.ttl > 0 else 0
+        evicted = 0
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                evicted += 1
+        if evicted:
+            RECORD_CACHE_EVICTIONS.inc(evicted, cache=self.name)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+class RedisCacheBackend(CacheBackend):
+    """Redis共享缓存，多个工作进程读写同一份数据，删除/写入后所有进程立即一致"""
+
+    blocking = True
+
+    def __init__(self, url: str, ttl: int, prefix: str):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("RECORD_CACHE_BACKEND=redis 需要安装redis")
+        self.client = redis.Redis.from_url(url, socket_timeout=1, socket_connect_timeout=1)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}:{key}"
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        data = self.client.get(self._key(key))
+        return json.loads(data) if data is not None else None
+
+    def set(self, key: str, value: Dict[str, Any]):
+        self.client.set(self._key(key), json.dumps(value), ex=self.ttl if self.ttl > 0 else None)
+
+    def delete(self, key: str):
+        self.client.delete(self._key(key))
+
+    def clear(self):
+        for key in self.client.scan_iter(f"{self.prefix}:*"):
+            self.client.delete(key)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self.client.scan_iter(f"{self.prefix}:*"))
+
+
+class RecordCache(Generic[ModelT]):
+    """
+    按主键的读穿透缓存
+
+    未命中时调用loader从数据库读取并写入缓存；缓存的是模型字段的副本，
+    返回的对象不绑定数据库会话，只能用于读取。记录插入、更新或删除后需调用invalidate。
+    后端出错时直接回源数据库，不影响请求。
+    """
+
+    def __init__(self, name: str, model: Type[ModelT], backend: CacheBackend):
+        self.name = name
+        self.model = model
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    async def _call(self, func, *args):
+        if self.backend.blocking:
+            return await run_in_threadpool(func, *args)
+        return func(*args)
+
+    async def get_or_load(self, key: Any, loader: Callable[[], Awaitable[Optional[ModelT]]]) -> Optional[ModelT]:
+        """读取缓存，未命中时通过loader加载；记录不存在时返回None且不缓存"""
+        cache_key = str(key)
+        try:
+            cached = await self._call(self.backend.get, cache_key)
+        except Exception as e:
+            logger.warning(f"读取缓存失败: {self.name} {cache_key}, {str(e)}")
+            cached = None
+        if cached is not None:
+            self.hits += 1
+            RECORD_CACHE_REQUESTS.inc(cache=self.name, result="hit")
+            return self.model.model_validate(cached)
+
+        self.misses += 1
+        RECORD_CACHE_REQUESTS.inc(cache=self.name, result="miss")
+        record = await loader()
+        if record is not None:
+            try:
+                await self._call(self.backend.set, cache_key, record.model_dump(mode="json"))
+            except Exception as e:
+                logger.warning(f"写入缓存失败: {self.name} {cache_key}, {str(e)}")
+        return record
+
+    def invalidate(self, *keys: Any):
+        """同步删除缓存条目，可在后台线程中调用"""
+        for key in keys:
+            try:
+                self.backend.delete(str(key))
+            except Exception as e:
+                logger.warning(f"删除缓存失败: {self.name} {key}, {str(e)}")
+
+    async def ainvalidate(self, *keys: Any):
+        """异步代码中删除缓存条目"""
+        if self.backend.blocking:
+            await run_in_threadpool(self.invalidate, *keys)
+        else:
+            self.invalidate(*keys)
+
+    def stats(self) -> Dict[str, Any]:
+        """当前进程的命中统计"""
+        total = self.hits + self.misses
+        try:
+            size = len(self.backend)
+        except Exception:
+            size = None
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            "size": size,
+        }
+
+
+class _NullCacheBackend(CacheBackend):
+    """禁用缓存时使用，所有查询都回源数据库"""
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return None
+
+    def set(self, key: str, value: Dict[str, Any]):
+        pass
+
+    def delete(self, key: str):
+        pass
+
+    def clear(self):
+        pass
+
+    def __len__(self) -> int:
+        return 0
+
+
+def create_backend(name: str) -> CacheBackend:
+    """按配置为一类记录创建缓存后端"""
+    if RECORD_CACHE_BACKEND == "none":
+        return _NullCacheBackend()
+    if RECORD_CACHE_BACKEND == "redis":
+        return RedisCacheBackend(RECORD_CACHE_REDIS_URL, RECORD_CACHE_TTL, f"record:{name}")
+    return LocalCacheBackend(RECORD_CACHE_MAX_ENTRIES, RECORD_CACHE_TTL, name)
+
+
+image_cache: RecordCache[Image] = RecordCache("image", Image, create_backend("image"))
+# 转换记录只缓存摘要列和文本哈希，文本列按需单独查询
+conversion_cache: RecordCache[PDFConversionMeta] = RecordCache(
+    "pdfconversion", PDFConversionMeta, create_backend("pdfconversion")
+)
+
+
+def cache_stats() -> Dict[str, Dict[str, Any]]:
+    """所有记录缓存的统计"""
+    return {cache.name: cache.stats() for cache in (image_cache, conversion_cache)}
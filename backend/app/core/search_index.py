@@ -0,0 +1,308 @@
+import os
+import re
+import html
+import sqlite3
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from app.core.pagination import escape_like
+
+# 创建日志记录器
+logger = logging.getLogger("search_index")
+
+# extract_pdf_text 输出的分页标记
+PAGE_MARKER = re.compile(r"^--- 第 (\d+) 页 ---$", re.MULTILINE)
+
+# trigram分词下短于3个字符的词无法走trigram索引：中日韩文字的短词走二元分词索引，其他短词用LIKE扫描
+MIN_INDEXED_TERM_LENGTH = 3
+
+# 中日韩文字（不含标点）
+CJK_CHARS = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff"
+CJK_RUN = re.compile(f"[{CJK_CHARS}]+")
+CJK_TERM = re.compile(f"^[{CJK_CHARS}]+$")
+
+# 索引结构版本（PRAGMA user_version），旧版本的索引在打开时补建二元分词索引
+SCHEMA_VERSION = 1
+
+# 手工截取摘要时命中词前后保留的字符数
+SNIPPET_CONTEXT = 30
+
+# FTS5摘要的高亮占位符（私用区字符），HTML转义后再替换为<mark>标签
+MARK_START = "\ue000"
+MARK_END = "\ue001"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS page_text (
+    id INTEGER PRIMARY KEY,
+    conversion_id INTEGER NOT NULL,
+    page INTEGER NOT NULL,
+    content TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_page_text_conversion_id ON page_text (conversion_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS page_fts USING fts5(
+    content, content='page_text', content_rowid='id', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS page_text_ai AFTER INSERT ON page_text BEGIN
+    INSERT INTO page_fts (rowid, content) VALUES (new.id, new.content);
+END;
+CREATE TRIGGER IF NOT EXISTS page_text_ad AFTER DELETE ON page_text BEGIN
+    INSERT INTO page_fts (page_fts, rowid, content) VALUES ('delete', old.id, old.content);
+END;
+CREATE VIRTUAL TABLE IF NOT EXISTS page_bigram USING fts5(
+    content, content='', tokenize='unicode61'
+);
+"""
+
+
+def split_pages(text: str) -> List[Tuple[int, str]]:
+    """按分页标记拆分提取的文本，返回 [(页码, 文本)]；没有标记时整体视为第1页"""
+    if not text:
+        return []
+    matches = list(PAGE_MARKER.finditer(text))
+    if not matches:
+        return [(1, text.strip())] if text.strip() else []
+    pages = []
+    for index, match in enumerate(matches):
+        end = matches[index + 1].start() if index + 1 < len(matches) else len(text)
+        content = text[match.end():end].strip()
+        if content:
+            pages.append((int(match.group(1)), content))
+    return pages
+
+
+def cjk_bigrams(text: str) -> str:
+    """
+    把文本中连续的中日韩文字切分为二元词，以空格分隔，交给unicode61分词建立索引
+
+    每段的末字另作一个一元词，单字查询按前缀匹配时不会漏掉段尾的字，例如「地图」索引为「地图 图」。
+    """
+    tokens = []
+    for match in CJK_RUN.finditer(text):
+        run = match.group(0)
+        tokens.extend(run[index:index + 2] for index in range(len(run) - 1))
+        tokens.append(run[-1])
+    return " ".join(tokens)
+
+
+def _bigram_query(term: str) -> str:
+    """短词的二元分词查询：两个字为完整的二元词，单字按前缀匹配"""
+    return f'"{term}"' if len(term) > 1 else f'"{term}"*'
+
+
+def _escape_snippet(snippet: str) -> str:
+    """转义摘要中的HTML，再把高亮占位符替换为<mark>标签"""
+    return html.escape(snippet).replace(MARK_START, "<mark>").replace(MARK_END, "</mark>")
+
+
+def _make_snippet(content: str, terms: List[str]) -> str:
+    """围绕第一个命中词截取摘要，转义HTML后高亮"""
+    lowered = content.lower()
+    position = min((lowered.find(term.lower()) for term in terms if term.lower() in lowered), default=0)
+    start = max(position - SNIPPET_CONTEXT, 0)
+    end = min(position + SNIPPET_CONTEXT, len(content))
+    snippet = content[start:end]
+    # 先在原文上找出命中区间并合并重叠部分，再逐段转义
+    pattern = re.compile("|".join(re.escape(term) for term in terms), re.IGNORECASE)
+    spans: List[List[int]] = []
+    for match in pattern.finditer(snippet):
+        if spans and match.start() <= spans[-1][1]:
+            spans[-1][1] = max(spans[-1][1], match.end())
+        else:
+            spans.append([match.start(), match.end()])
+    parts = []
+    last = 0
+    for span_start, span_end in spans:
+        parts.append(html.escape(snippet[last:span_start]))
+        parts.append(f"<mark>{html.escape(snippet[span_start:span_end])}</mark>")
+        last = span_end
+    parts.append(html.escape(snippet[last:]))
+    return ("…" if start > 0 else "") + "".join(parts) + ("…" if end < len(content) else "")
+
+
+class SearchIndex:
+    """
+    PDF文本全文索引
+
+    使用SQLite FTS5（trigram分词，支持中文子串匹配）按页建立倒排索引，存放在独立的数据库文件中，
+    与业务数据库类型无关。trigram无法检索的一两个字的中日韩短词另有二元分词索引（page_bigram，
+    不保存原文，删除时按原文重新切分）。每个线程使用独立连接，写操作串行执行。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        with self._write_lock:
+            self._connection().executescript(SCHEMA)
+            self._migrate()
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def _migrate(self):
+        """为旧版本的索引补建二元分词索引（多个进程同时打开时由写事务保证只执行一次）"""
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            if connection.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+                last_id = 0
+                while True:
+                    rows = connection.execute(
+                        "SELECT id, content FROM page_text WHERE id > ? ORDER BY id LIMIT 500", (last_id,)
+                    ).fetchall()
+                    if not rows:
+                        break
+                    self._insert_bigrams(connection, rows)
+                    last_id = rows[-1][0]
+                if last_id:
+                    logger.info(f"已补建二元分词索引，最后页ID: {last_id}")
+                connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+
+    @staticmethod
+    def _insert_bigrams(connection: sqlite3.Connection, rows: List[Tuple[int, str]], command: str = ""):
+        """写入（command为 'delete' 时删除）各页的二元分词索引，没有中日韩文字的页不写入"""
+        values = []
+        for row_id, content in rows:
+            bigrams = cjk_bigrams(content)
+            if bigrams:
+                values.append((row_id, bigrams))
+        if command:
+            connection.executemany(
+                "INSERT INTO page_bigram (page_bigram, rowid, content) VALUES (?, ?, ?)",
+                [(command, row_id, bigrams) for row_id, bigrams in values]
+            )
+        else:
+            connection.executemany("INSERT INTO page_bigram (rowid, content) VALUES (?, ?)", values)
+
+    def _delete_pages(self, connection: sqlite3.Connection, conversion_id: int):
+        rows = connection.execute(
+            "SELECT id, content FROM page_text WHERE conversion_id = ?", (conversion_id,)
+        ).fetchall()
+        self._insert_bigrams(connection, rows, "delete")
+        connection.execute("DELETE FROM page_text WHERE conversion_id = ?", (conversion_id,))
+
+    def index_conversion(self, conversion_id: int, text: str, pages: Optional[List[Tuple[int, str]]] = None) -> int:
+        """
+        按页索引转换记录的文本（已存在时先删除旧索引），返回索引的页数
+
+        已有逐页文本时通过pages传入 [(页码, 文本)]，不再按分页标记拆分text
+        """
+        if pages is None:
+            pages = split_pages(text)
+        else:
+            pages = [(page, content.strip()) for page, content in pages if content.strip()]
+        with self._write_lock:
+            connection = self._connection()
+            with connection:
+                self._delete_pages(connection, conversion_id)
+                rows = []
+                for page, content in pages:
+                    cursor = connection.execute(
+                        "INSERT INTO page_text (conversion_id, page, content) VALUES (?, ?, ?)",
+                        (conversion_id, page, content)
+                    )
+                    rows.append((cursor.lastrowid, content))
+                self._insert_bigrams(connection, rows)
+        logger.info(f"已索引转换记录: ID {conversion_id}, {len(pages)} 页")
+        return len(pages)
+
+    def remove_conversion(self, conversion_id: int):
+        """删除转换记录的索引"""
+        with self._write_lock:
+            connection = self._connection()
+            with connection:
+                self._delete_pages(connection, conversion_id)
+
+    def indexed_ids(self) -> List[int]:
+        """已建立索引的转换记录ID"""
+        rows = self._connection().execute("SELECT DISTINCT conversion_id FROM page_text").fetchall()
+        return [row[0] for row in rows]
+
+    def search(self, query: str, limit: int = 20, offset: int = 0) -> List[Dict]:
+        """
+        按页搜索，多个词以空格分隔且需同时命中
+
+        长度不少于3的词走trigram索引并按BM25排序；一两个字的中日韩短词走二元分词索引，
+        没有长词时按二元分词索引的BM25排序；其他短词用LIKE过滤，只有这类短词时按记录ID倒序扫描。
+        返回 [{conversion_id, page, snippet, score}]。
+        """
+        terms = [term for term in query.split() if term]
+        if not terms:
+            return []
+        indexed = [term for term in terms if len(term) >= MIN_INDEXED_TERM_LENGTH]
+        short = [term for term in terms if len(term) < MIN_INDEXED_TERM_LENGTH]
+        bigram_terms = [term for term in short if CJK_TERM.match(term)]
+        like_terms = [term for term in short if not CJK_TERM.match(term)]
+
+        like_sql = "".join(" AND page_text.content LIKE ? ESCAPE '\\'" for _ in like_terms)
+        like_params = [f"%{escape_like(term)}%" for term in like_terms]
+        bigram_match = " ".join(_bigram_query(term) for term in bigram_terms)
+
+        if indexed:
+            match = " ".join('"' + term.replace('"', '""') + '"' for term in indexed)
+            bigram_sql = ""
+            bigram_params = []
+            if bigram_terms:
+                bigram_sql = " AND page_text.id IN (SELECT rowid FROM page_bigram WHERE page_bigram MATCH ?)"
+                bigram_params = [bigram_match]
+            sql = (
+                "SELECT page_text.conversion_id, page_text.page, page_text.content,"
+                " snippet(page_fts, 0, ?, ?, '…', 24), bm25(page_fts)"
+                " FROM page_fts JOIN page_text ON page_text.id = page_fts.rowid"
+                " WHERE page_fts MATCH ?" + bigram_sql + like_sql +
+                " ORDER BY bm25(page_fts) LIMIT ? OFFSET ?"
+            )
+            params = [MARK_START, MARK_END, match, *bigram_params, *like_params, limit, offset]
+        elif bigram_terms:
+            sql = (
+                "SELECT page_text.conversion_id, page_text.page, page_text.content, NULL, bm25(page_bigram)"
+                " FROM page_bigram JOIN page_text ON page_text.id = page_bigram.rowid"
+                " WHERE page_bigram MATCH ?" + like_sql +
+                " ORDER BY bm25(page_bigram) LIMIT ? OFFSET ?"
+            )
+            params = [bigram_match, *like_params, limit, offset]
+        else:
+            sql = (
+                "SELECT conversion_id, page, content, NULL, NULL FROM page_text"
+                " WHERE 1 = 1" + like_sql +
+                " ORDER BY conversion_id DESC, page LIMIT ? OFFSET ?"
+            )
+            params = [*like_params, limit, offset]
+
+        rows = self._connection().execute(sql, params).fetchall()
+        hits = []
+        for conversion_id, page, content, snippet, rank in rows:
+            if short:
+                # FTS5摘要只高亮索引词，含短词时统一手工截取
+                snippet = _make_snippet(content, terms)
+            else:
+                snippet = _escape_snippet(snippet)
+            hits.append({
+                "conversion_id": conversion_id,
+                "page": page,
+                "snippet": snippet,
+                # bm25越小越相关，取反便于阅读
+                "score": round(-rank, 6) if rank is not None else None,
+            })
+        return hits
+
+
+def create_search_index(path: Optional[str]) -> Optional[SearchIndex]:
+    """按配置创建全文索引，路径为空时不启用"""
+    if not path:
+        return None
+    return SearchIndex(path)
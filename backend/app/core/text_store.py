@@ -0,0 +1,173 @@
+import os
+import gzip
+import hashlib
+import logging
+from abc import ABC, abstractmethod
+from typing import Optional
+
+from sqlmodel import Session, select, delete
+
+from app.db import database
+from app.models.pdf_convert import PDFTextBlob
+
+# 创建日志记录器
+logger = logging.getLogger("text_store")
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+def text_hash(text: str) -> str:
+    """计算文本内容的SHA-256"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class TextCodec:
+    """文本压缩编解码器"""
+    
+    def __init__(self, name: str = "zstd", level: Optional[int] = None):
+        if name == "zstd" and zstandard is None:
+            logger.warning("未安装zstandard，文本存储改用gzip压缩")
+            name = "gzip"
+        self.name = name
+        self.level = level
+    
+    def compress(self, text: str) -> bytes:
+        data = text.encode("utf-8")
+        if self.name == "zstd":
+            return zstandard.ZstdCompressor(level=self.level or 10).compress(data)
+        return gzip.compress(data, compresslevel=self.level or 6)
+    
+    @staticmethod
+    def decompress(data: bytes, name: str) -> str:
+        """按写入时的编解码器解压"""
+        if name == "zstd":
+            if zstandard is None:
+                raise RuntimeError("读取zstd压缩的文本需要安装zstandard")
+            return zstandard.ZstdDecompressor().decompress(data).decode("utf-8")
+        return gzip.decompress(data).decode("utf-8")
+
+
+class TextStore(ABC):
+    """
+    PDF文本存储接口
+    
+    文本按 (转换记录ID, 类型, 内容哈希) 存放，类型为 text（原始文本）或 processed（AI处理后文本）。
+    所有方法均为阻塞调用，异步代码中应放到线程池执行。
+    """
+    
+    @abstractmethod
+    def put(self, conversion_id: int, kind: str, text: str) -> str:
+        """保存文本，返回内容哈希"""
+    
+    @abstractmethod
+    def get(self, conversion_id: int, kind: str, content_hash: str) -> Optional[str]:
+        """读取文本，不存在时返回None"""
+    
+    @abstractmethod
+    def delete(self, conversion_id: int):
+        """删除转换记录的所有文本"""
+
+
+class FileTextStore(TextStore):
+    """压缩后存放在磁盘上：<root>/<id>/<类型>-<哈希>.<编解码器>"""
+    
+    def __init__(self, root: str, codec: TextCodec):
+        self.root = root
+        self.codec = codec
+        os.makedirs(root, exist_ok=True)
+    
+    def _dir(self, conversion_id: int) -> str:
+        return os.path.join(self.root, str(conversion_id))
+    
+    def put(self, conversion_id: int, kind: str, text: str) -> str:
+        content_hash = text_hash(text)
+        dir_path = self._dir(conversion_id)
+        os.makedirs(dir_path, exist_ok=True)
+        path = os.path.join(dir_path, f"{kind}-{content_hash}.{self.codec.name}")
+        if not os.path.exists(path):
+            data = self.codec.compress(text)
+            temp_path = f"{path}.part"
+            with open(temp_path, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+            logger.info(f"保存文本: ID {conversion_id}, {kind}, {len(text)} 字符 -> {len(data)} 字节")
+        return content_hash
+    
+    def get(self, conversion_id: int, kind: str, content_hash: str) -> Optional[str]:
+        dir_path = self._dir(conversion_id)
+        for codec_name in ("zstd", "gzip"):
+            path = os.path.join(dir_path, f"{kind}-{content_hash}.{codec_name}")
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    return TextCodec.decompress(f.read(), codec_name)
+        return None
+    
+    def delete(self, conversion_id: int):
+        dir_path = self._dir(conversion_id)
+        if not os.path.isdir(dir_path):
+            return
+        for name in os.listdir(dir_path):
+            os.remove(os.path.join(dir_path, name))
+        os.rmdir(dir_path)
+
+
+class DatabaseTextStore(TextStore):
+    """压缩后存放在独立的 pdftextblob 表中，主表行保持精简"""
+    
+    def __init__(self, codec: TextCodec):
+        self.codec = codec
+    
+    def put(self, conversion_id: int, kind: str, text: str) -> str:
+        content_hash = text_hash(text)
+        with Session(database.engine) as session:
+            existing = session.exec(select(PDFTextBlob.id).where(
+                PDFTextBlob.conversion_id == conversion_id,
+                PDFTextBlob.kind == kind,
+                PDFTextBlob.content_hash == content_hash
+            )).first()
+            if existing is None:
+                session.add(PDFTextBlob(
+                    conversion_id=conversion_id,
+                    kind=kind,
+                    content_hash=content_hash,
+                    codec=self.codec.name,
+                    data=self.codec.compress(text)
+                ))
+                session.commit()
+        return content_hash
+    
+    def get(self, conversion_id: int, kind: str, content_hash: str) -> Optional[str]:
+        with Session(database.engine) as session:
+            blob = session.exec(select(PDFTextBlob).where(
+                PDFTextBlob.conversion_id == conversion_id,
+                PDFTextBlob.kind == kind,
+                PDFTextBlob.content_hash == content_hash
+            )).first()
+            if blob is None:
+                return None
+            return TextCodec.decompress(blob.data, blob.codec)
+    
+    def delete(self, conversion_id: int):
+        with Session(database.engine) as session:
+            session.exec(delete(PDFTextBlob).where(PDFTextBlob.conversion_id == conversion_id))
+            session.commit()
+
+
+def create_text_store(backend: str, root: str, codec_name: str) -> Optional[TextStore]:
+    """
+    按配置创建文本存储
+    
+    Args:
+        backend: file（磁盘）/ database（独立表）/ inline（沿用主表文本列，不启用）
+        root: 磁盘存储根目录
+        codec_name: zstd 或 gzip
+    """
+    if backend == "inline":
+        return None
+    codec = TextCodec(codec_name)
+    if backend == "database":
+        return DatabaseTextStore(codec)
+    return FileTextStore(root, codec)
@@ -0,0 +1,210 @@
+import os
+import io
+import asyncio
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from fastapi.concurrency import run_in_threadpool
+from PIL import Image as PILImage, ImageOps
+
+# 创建日志记录器
+logger = logging.getLogger("thumbnail")
+
+try:
+    import fcntl
+except ImportError:
+    # Windows上只在进程内加锁，需以单进程运行
+    fcntl = None
+
+# 支持输出的缩略图格式及对应的MIME类型
+THUMBNAIL_FORMATS = {
+    "webp": "image/webp",
+    "jpeg": "image/jpeg",
+    "png": "image/png",
+}
+
+# 多个工作进程统计和淘汰缓存时共用的锁文件
+LOCK_FILE = ".lock"
+
+
+class ThumbnailCache:
+    """
+    缩略图磁盘缓存，按总字节数限制容量，超出时淘汰最久未访问的文件
+    
+    多个工作进程共用缓存目录：命中时刷新文件的访问时间，各进程只累计自己写入的字节数。
+    估算用量超过上限，或本进程写入量达到上限的 1/SYNC_FRACTION 时，持有目录锁从磁盘重新统计并淘汰，
+    因此所有进程合计最多超出上限约 工作进程数/SYNC_FRACTION。
+    """
+    
+    # 本进程写入量达到上限的多少分之一时重新统计磁盘用量
+    SYNC_FRACTION = 16
+    
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        # 上次统计的磁盘用量加上此后本进程写入的字节数
+        self.total_bytes = 0
+        self._written = 0
+        self._lock = threading.Lock()
+        self._loaded = False
+        os.makedirs(cache_dir, exist_ok=True)
+    
+    def _sync(self):
+        """在目录锁内扫描缓存目录，按访问时间淘汰直到总大小不超过上限（调用方需持有线程锁）"""
+        with open(os.path.join(self.cache_dir, LOCK_FILE), "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            entries = []
+            for name in os.listdir(self.cache_dir):
+                if name.startswith(".") or name.endswith(".part"):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(self.cache_dir, name))
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_atime, name, stat.st_size))
+            entries.sort()
+            total = sum(size for _, _, size in entries)
+            # 至少保留最近访问的一项，避免单个大文件被立即淘汰
+            for _, name, size in entries[:-1]:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                except FileNotFoundError:
+                    pass
+                total -= size
+                logger.info(f"淘汰缩略图缓存: {name}, {size} 字节")
+        if not self._loaded:
+            logger.info(f"缩略图缓存已加载: {len(entries)} 个文件, {total} 字节")
+        self._loaded = True
+        self.total_bytes = total
+        self._written = 0
+    
+    def path_for(self, key: str) -> str:
+        """获取缓存键对应的文件路径"""
+        return os.path.join(self.cache_dir, key)
+    
+    def get(self, key: str) -> Optional[str]:
+        """
+        查询缓存（涉及文件系统调用，应在工作线程中调用）
+        
+        Args:
+            key: 缓存键
+            
+        Returns:
+            命中时返回文件路径，否则返回None
+        """
+        path = self.path_for(key)
+        # 更新访问时间，淘汰时按访问时间排序
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except OSError:
+            if not os.path.exists(path):
+                return None
+        return path
+    
+    def put(self, key: str, data: bytes) -> str:
+        """
+        写入缓存并在超出容量时淘汰最久未访问的文件
+        
+        Args:
+            key: 缓存键
+            data: 缩略图内容
+            
+        Returns:
+            缓存文件路径
+        """
+        path = self.path_for(key)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.part"
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+        with self._lock:
+            self.total_bytes += len(data)
+            self._written += len(data)
+            if (not self._loaded or self.total_bytes > self.max_bytes
+                    or self._written * self.SYNC_FRACTION >= self.max_bytes):
+                self._sync()
+        return path
+
+
+def thumbnail_key(file_path: str, width: int, height: int, fmt: str) -> str:
+    """根据原图路径和尺寸参数生成缓存键"""
+    digest = hashlib.sha256(f"{file_path}:{width}x{height}".encode("utf-8")).hexdigest()[:32]
+    return f"{digest}_{width}x{height}.{fmt}"
+
+
+def render_thumbnail(source_path: str, width: int, height: int, fmt: str) -> bytes:
+    """
+    生成缩略图（CPU密集，应在工作线程中调用）
+    
+    按比例缩放到不超过 width x height 的尺寸，不会放大原图。
+    
+    Args:
+        source_path: 原图路径
+        width: 最大宽度
+        height: 最大高度
+        fmt: 输出格式（webp/jpeg/png）
+        
+    Returns:
+        缩略图的二进制内容
+    """
+    with PILImage.open(source_path) as img:
+        # GIF等多帧图片只取第一帧
+        img.seek(0)
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail((width, height), PILImage.LANCZOS)
+        
+        if fmt == "jpeg":
+            if img.mode not in ("RGB", "L"):
+                img = img.convert("RGB")
+        elif img.mode not in ("RGB", "RGBA", "L", "LA"):
+            img = img.convert("RGBA")
+        
+        buffer = io.BytesIO()
+        save_kwargs = {"optimize": True}
+        if fmt in ("jpeg", "webp"):
+            save_kwargs["quality"] = 80
+        img.save(buffer, format=fmt.upper(), **save_kwargs)
+        return buffer.getvalue()
+
+
+class ThumbnailService:
+    """缩略图服务：命中缓存直接返回，否则在工作线程池中生成并写入缓存"""
+    
+    def __init__(self, static_dir: str, cache: ThumbnailCache, workers: int):
+        self.static_dir = static_dir
+        self.cache = cache
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="thumbnail")
+    
+    async def get_thumbnail(self, file_path: str, width: int, height: int, fmt: str) -> str:
+        """
+        获取缩略图文件路径
+        
+        Args:
+            file_path: 原图相对于静态目录的路径
+            width: 最大宽度
+            height: 最大高度
+            fmt: 输出格式
+            
+        Returns:
+            缩略图缓存文件路径
+        """
+        key = thumbnail_key(file_path, width, height, fmt)
+        # 查询缓存涉及文件系统调用，放到线程池中执行；不占用生成缩略图的线程，命中时无需排队
+        cached = await run_in_threadpool(self.cache.get, key)
+        if cached:
+            return cached
+        
+        source_path = os.path.join(self.static_dir, file_path)
+        loop = asyncio.get_running_loop()
+        data = await loop.run_in_executor(self.executor, render_thumbnail, source_path, width, height, fmt)
+        path = await loop.run_in_executor(self.executor, self.cache.put, key, data)
+        logger.info(f"生成缩略图: {file_path} -> {key}, {len(data)} 字节")
+        return path
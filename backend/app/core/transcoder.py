@@ -0,0 +1,106 @@
+import os
+import io
+import logging
+from typing import Dict, Optional
+
+from PIL import Image as PILImage, ImageOps
+
+# 创建日志记录器
+logger = logging.getLogger("transcoder")
+
+# 转码格式及MIME类型，按优先级排列（体积更小的格式优先）
+VARIANT_FORMATS = {
+    "avif": "image/avif",
+    "webp": "image/webp",
+}
+
+# 可转码的源图片类型
+TRANSCODABLE_TYPES = {"image/png", "image/jpeg", "image/webp"}
+
+
+def variant_path(path: str, fmt: str) -> str:
+    """转码变体与原图放在同一目录，文件名追加格式扩展名"""
+    return f"{path}.{fmt}"
+
+
+def remove_variants(source_path: str):
+    """删除原图的所有转码变体"""
+    for fmt in VARIANT_FORMATS:
+        target = variant_path(source_path, fmt)
+        if os.path.exists(target):
+            os.remove(target)
+
+
+def avif_supported() -> bool:
+    """检查当前Pillow是否支持AVIF编码（原生或 pillow-avif-plugin）"""
+    try:
+        import pillow_avif  # noqa: F401
+    except ImportError:
+        pass
+    return ".avif" in PILImage.registered_extensions()
+
+
+class ImageTranscoder:
+    """将原图转码为WebP/AVIF变体，仅保留比原图更小的结果"""
+    
+    def __init__(self, static_dir: str, quality: int = 80):
+        self.static_dir = static_dir
+        self.quality = quality
+        self.formats = ["webp"]
+        if avif_supported():
+            self.formats.insert(0, "avif")
+        logger.info(f"图片转码格式: {', '.join(self.formats)}")
+    
+    def transcode(self, file_path: str, content_type: str) -> Dict[str, Optional[str]]:
+        """
+        生成转码变体
+        
+        Args:
+            file_path: 原图相对于静态目录的路径
+            content_type: 原图MIME类型
+            
+        Returns:
+            格式 -> 变体相对路径，未生成或不比原图小的格式为None
+        """
+        results: Dict[str, Optional[str]] = {fmt: None for fmt in VARIANT_FORMATS}
+        if content_type not in TRANSCODABLE_TYPES:
+            return results
+        
+        source_path = os.path.join(self.static_dir, file_path)
+        original_size = os.path.getsize(source_path)
+        
+        with PILImage.open(source_path) as img:
+            # 动图只能转出第一帧，不生成变体
+            if getattr(img, "is_animated", False):
+                logger.info(f"动图不生成转码变体: {file_path}")
+                return results
+            img.load()
+            # 保留色彩配置，并按EXIF方向旋转（变体不含EXIF，否则会横置显示）
+            icc_profile = img.info.get("icc_profile")
+            img = ImageOps.exif_transpose(img)
+            save_kwargs = {"quality": self.quality}
+            if icc_profile:
+                save_kwargs["icc_profile"] = icc_profile
+            if img.mode not in ("RGB", "RGBA"):
+                img = img.convert("RGBA" if "transparency" in img.info or img.mode in ("LA", "PA") else "RGB")
+            
+            for fmt in self.formats:
+                if VARIANT_FORMATS[fmt] == content_type:
+                    continue
+                target = variant_path(source_path, fmt)
+                # 去重存储下多条记录共享同一原图，变体已存在时直接复用
+                if not os.path.exists(target):
+                    buffer = io.BytesIO()
+                    img.save(buffer, format=fmt.upper(), **save_kwargs)
+                    data = buffer.getvalue()
+                    if len(data) >= original_size:
+                        logger.info(f"{fmt} 变体不小于原图，跳过: {file_path}")
+                        continue
+                    temp_path = f"{target}.part"
+                    with open(temp_path, "wb") as f:
+                        f.write(data)
+                    os.replace(temp_path, target)
+                    logger.info(f"生成 {fmt} 变体: {file_path}, {original_size} -> {len(data)} 字节")
+                results[fmt] = variant_path(file_path, fmt)
+        
+        return results
@@ -1,53 +1,127 @@
-import pymysql
-from urllib.parse import quote_plus
-import os
-from dotenv import load_dotenv
-
-# 加载环境变量
-load_dotenv()
-
-# 数据库连接参数
-password = 'Mysql@123'
-encoded_password = quote_plus(password)
-host = '10.17.48.246'
-port = 3306
-user = 'mysql'
-database = 'nettrix_dev'
+"""
+数据库结构迁移
+
+通过应用的同步引擎（DATABASE_URL）执行，兼容MySQL和SQLite；
+所有迁移均可重复执行，已存在的列和索引会被跳过。
+
+用法: python -m app.db.alter_table
+"""
+from sqlalchemy import inspect, text
+
+from app.db.database import engine, create_db_and_tables
+
+
+def _column_exists(connection, table: str, column: str) -> bool:
+    """检查表中是否已存在指定列"""
+    return column in {item["name"] for item in inspect(connection).get_columns(table)}
+
+
+def _index_exists(connection, table: str, index: str) -> bool:
+    """检查表中是否已存在指定索引"""
+    return index in {item["name"] for item in inspect(connection).get_indexes(table)}
+
+
+def _ensure_columns(table: str, columns: dict):
+    """为表添加缺失的列，columns 为 列名 -> 列定义"""
+    try:
+        with engine.begin() as connection:
+            for column, definition in columns.items():
+                if not _column_exists(connection, table, column):
+                    connection.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {definition}"))
+                    print(f"成功添加{table}.{column}列")
+    except Exception as e:
+        print(f"修改{table}表结构时出错: {e}")
+
+
+def _ensure_indexes(table: str, indexes: dict):
+    """为表创建缺失的索引，indexes 为 索引名 -> 列列表"""
+    try:
+        with engine.begin() as connection:
+            for name, columns in indexes.items():
+                if not _index_exists(connection, table, name):
+                    connection.execute(text(f"CREATE INDEX {name} ON {table} ({', '.join(columns)})"))
+                    print(f"成功创建{name}索引")
+    except Exception as e:
+        print(f"创建{table}表索引时出错: {e}")
+
 
 def alter_table():
-    """修改pdfconversion表的列类型"""
-    connection = None
+    """修改pdfconversion表的列类型（SQLite的TEXT没有长度限制，无需修改）"""
+    if engine.dialect.name != "mysql":
+        return
     try:
-        # 连接到数据库
-        connection = pymysql.connect(
-            host=host,
-            port=port,
-            user=user,
-            password=password,
-            database=database
-        )
-        
-        # 创建游标对象
-        cursor = connection.cursor()
-        
-        # 修改text_content列为LONGTEXT类型
-        cursor.execute("ALTER TABLE pdfconversion MODIFY COLUMN text_content LONGTEXT;")
-        print("成功修改text_content列为LONGTEXT类型")
-        
-        # 修改processed_text列为LONGTEXT类型
-        cursor.execute("ALTER TABLE pdfconversion MODIFY COLUMN processed_text LONGTEXT;")
-        print("成功修改processed_text列为LONGTEXT类型")
-        
-        # 提交更改
-        connection.commit()
+        with engine.begin() as connection:
+            # 修改text_content列为LONGTEXT类型
+            connection.execute(text("ALTER TABLE pdfconversion MODIFY COLUMN text_content LONGTEXT"))
+            print("成功修改text_content列为LONGTEXT类型")
+
+            # 修改processed_text列为LONGTEXT类型
+            connection.execute(text("ALTER TABLE pdfconversion MODIFY COLUMN processed_text LONGTEXT"))
+            print("成功修改processed_text列为LONGTEXT类型")
         print("表结构修改成功")
-        
     except Exception as e:
         print(f"修改表结构时出错: {e}")
-    finally:
-        # 关闭连接
-        if connection:
-            connection.close()
+
+
+def add_image_hash_column():
+    """为image表添加内容哈希列及索引，用于上传去重"""
+    _ensure_columns("image", {"file_hash": "VARCHAR(64) NULL"})
+    _ensure_indexes("image", {"ix_image_file_hash": ["file_hash"]})
+
+
+def add_image_list_indexes():
+    """为image表添加列表分页使用的复合索引"""
+    _ensure_indexes("image", {
+        "ix_image_created_at_id": ["created_at", "id"],
+        "ix_image_content_type_created_at_id": ["content_type", "created_at", "id"],
+    })
+
+
+def add_image_variant_columns():
+    """为image表添加WebP/AVIF转码变体路径列"""
+    _ensure_columns("image", {
+        "webp_path": "VARCHAR(255) NULL",
+        "avif_path": "VARCHAR(255) NULL",
+    })
+
+
+def add_image_metadata_columns():
+    """为image表添加尺寸、格式和EXIF元数据列"""
+    _ensure_columns("image", {
+        "width": "INT NULL",
+        "height": "INT NULL",
+        "image_format": "VARCHAR(16) NULL",
+        "exif_make": "VARCHAR(255) NULL",
+        "exif_model": "VARCHAR(255) NULL",
+        "exif_orientation": "INT NULL",
+        "exif_taken_at": "DATETIME NULL",
+    })
+    _ensure_indexes("image", {
+        "ix_image_image_format": ["image_format"],
+        "ix_image_exif_taken_at": ["exif_taken_at"],
+    })
+
+
+def add_pdfconversion_list_index():
+    """为pdfconversion表添加列表分页使用的复合索引"""
+    _ensure_indexes("pdfconversion", {"ix_pdfconversion_created_at_id": ["created_at", "id"]})
+
+
+def add_pdfconversion_text_hash_columns():
+    """为pdfconversion表添加文本存储使用的内容哈希列"""
+    _ensure_columns("pdfconversion", {
+        "text_hash": "VARCHAR(64) NULL",
+        "processed_text_hash": "VARCHAR(64) NULL",
+    })
+
 
 if __name__ == "__main__":
-    alter_table() 
\ No newline at end of file
+    # 先创建缺失的表（如新增的pdftextblob），再补齐已有表的列和索引
+    create_db_and_tables()
+    alter_table()
+    add_image_hash_column()
+    add_image_list_indexes()
+    add_image_variant_columns()
+    add_image_metadata_columns()
+    add_pdfconversion_list_index()
+    add_pdfconversion_text_hash_columns()
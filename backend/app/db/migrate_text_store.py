@@ -0,0 +1,60 @@
+"""
+将pdfconversion表中已有的文本迁移到文本存储
+
+按ID分批处理，每批写入文本存储后记录内容哈希并清空主表中的文本列。
+可重复执行，已迁移的记录会被跳过。需先执行 alter_table.py 添加哈希列。
+
+用法: python -m app.db.migrate_text_store [批大小]
+"""
+import sys
+
+from sqlmodel import Session, select, or_
+
+from app.db import database
+from app.models.pdf_convert import PDFConversion
+from app.core.text_store import create_text_store
+from app.core.config import TEXT_STORE_BACKEND, TEXT_STORE_DIR, TEXT_STORE_CODEC
+
+
+def migrate(batch_size: int = 100) -> int:
+    """迁移所有仍在主表中保存文本的记录，返回迁移的记录数"""
+    store = create_text_store(TEXT_STORE_BACKEND, TEXT_STORE_DIR, TEXT_STORE_CODEC)
+    if store is None:
+        print("TEXT_STORE_BACKEND为inline，无需迁移")
+        return 0
+
+    migrated = 0
+    last_id = 0
+    while True:
+        with Session(database.engine) as session:
+            conversions = session.exec(
+                select(PDFConversion)
+                .where(PDFConversion.id > last_id)
+                .where(or_(PDFConversion.text_content.is_not(None), PDFConversion.processed_text.is_not(None)))
+                .order_by(PDFConversion.id)
+                .limit(batch_size)
+            ).all()
+            if not conversions:
+                break
+
+            for conversion in conversions:
+                if conversion.text_content:
+                    conversion.text_hash = store.put(conversion.id, "text", conversion.text_content)
+                if conversion.processed_text:
+                    conversion.processed_text_hash = store.put(conversion.id, "processed", conversion.processed_text)
+                conversion.text_content = None
+                conversion.processed_text = None
+                session.add(conversion)
+            session.commit()
+
+            last_id = conversions[-1].id
+            migrated += len(conversions)
+            print(f"已迁移 {migrated} 条记录（最后ID: {last_id}）")
+
+    return migrated
+
+
+if __name__ == "__main__":
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    total = migrate(size)
+    print(f"迁移完成，共 {total} 条记录")
@@ -0,0 +1,63 @@
+"""
+重建PDF全文索引
+
+按ID分批读取所有转换记录的文本（兼容文本存储和主表文本列）并重新索引，
+同时清理已删除记录残留的索引。用于首次启用搜索或索引文件损坏后恢复。
+
+用法: python -m app.db.rebuild_search_index [批大小]
+"""
+import sys
+
+from sqlmodel import Session, select
+
+from app.db import database
+from app.models.pdf_convert import PDFConversion
+from app.core.search_index import create_search_index
+from app.core.text_store import create_text_store
+from app.core.config import SEARCH_INDEX_PATH, TEXT_STORE_BACKEND, TEXT_STORE_DIR, TEXT_STORE_CODEC
+
+
+def rebuild(batch_size: int = 100) -> int:
+    """重新索引所有转换记录，返回索引的记录数"""
+    index = create_search_index(SEARCH_INDEX_PATH)
+    if index is None:
+        print("SEARCH_INDEX_PATH为空，未启用全文索引")
+        return 0
+    store = create_text_store(TEXT_STORE_BACKEND, TEXT_STORE_DIR, TEXT_STORE_CODEC)
+
+    existing = set()
+    indexed = 0
+    last_id = 0
+    while True:
+        with Session(database.engine) as session:
+            rows = session.exec(
+                select(PDFConversion.id, PDFConversion.text_content, PDFConversion.text_hash)
+                .where(PDFConversion.id > last_id)
+                .order_by(PDFConversion.id)
+                .limit(batch_size)
+            ).all()
+        if not rows:
+            break
+
+        for conversion_id, text_content, content_hash in rows:
+            existing.add(conversion_id)
+            if content_hash and store:
+                text_content = store.get(conversion_id, "text", content_hash)
+            if text_content:
+                index.index_conversion(conversion_id, text_content)
+                indexed += 1
+        last_id = rows[-1][0]
+        print(f"已索引 {indexed} 条记录（最后ID: {last_id}）")
+
+    stale = [conversion_id for conversion_id in index.indexed_ids() if conversion_id not in existing]
+    for conversion_id in stale:
+        index.remove_conversion(conversion_id)
+    if stale:
+        print(f"清理已删除记录的索引: {len(stale)} 条")
+    return indexed
+
+
+if __name__ == "__main__":
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    total = rebuild(size)
+    print(f"重建完成，共索引 {total} 条记录")
@@ -1,12 +1,25 @@
+import time
+
+# 记录各启动阶段耗时，用于观察冷启动
+IMPORT_STARTED = time.perf_counter()
+startup_phases = {}
+
 import os
+import asyncio
 import logging
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
+from fastapi.concurrency import run_in_threadpool
 
-from app.api import images, pdfs
+from app.api import images, pdfs, static_images
 from app.db.database import create_db_and_tables
-from app.core.config import AI_BASE_URL, AI_MODEL, PDF_UPLOAD_DIR, PDF_OUTPUT_DIR, STATIC_FILES_DIR
+from app.core import image_tasks
+from app.core.metrics import REGISTRY, HTTP_REQUEST_DURATION, HTTP_REQUESTS_IN_FLIGHT
+from app.core.record_cache import cache_stats
+from app.core.config import AI_BASE_URL, AI_MODEL, PDF_UPLOAD_DIR, PDF_OUTPUT_DIR, STATIC_FILES_DIR, IMAGE_GC_INTERVAL
+from app.core.config import PDF_JOB_SHUTDOWN_TIMEOUT, METRICS_MULTIPROC_DIR, METRICS_SNAPSHOT_INTERVAL
 
 # 配置日志
 logging.basicConfig(
@@ -34,14 +47,38 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Location"],
 )
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """按路由模板统计请求耗时"""
+    started = time.perf_counter()
+    status_code = 500
+    HTTP_REQUESTS_IN_FLIGHT.inc()
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        HTTP_REQUESTS_IN_FLIGHT.dec()
+        # 使用路由模板而非实际路径，避免标签基数无限增长
+        route = request.scope.get("route")
+        route_path = getattr(route, "path", None) or "unmatched"
+        HTTP_REQUEST_DURATION.observe(
+            time.perf_counter() - started,
+            method=request.method,
+            route=route_path,
+            status=str(status_code)
+        )
+
+
 # 注册API路由
 app.include_router(images.router, prefix="/api/images", tags=["images"])
 app.include_router(pdfs.router, prefix="/api/pdfs", tags=["pdfs"])
 
-# 挂载静态文件目录
-app.mount("/static/images", StaticFiles(directory=STATIC_FILES_DIR), name="images")
+# 图片访问路由（长期缓存、ETag、范围请求）
+app.include_router(static_images.router, prefix="/static/images")
 
 # 挂载PDF和Word文件目录
 os.makedirs(PDF_UPLOAD_DIR, exist_ok=True)
@@ -52,17 +89,88 @@ app.mount("/static/pdfs/outputs", StaticFiles(directory=PDF_OUTPUT_DIR), name="p
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
 
 
+startup_phases["import"] = time.perf_counter() - IMPORT_STARTED
+
+
 @app.on_event("startup")
 def on_startup():
     """应用启动时执行"""
     logger.info("应用启动中...")
+    started = time.perf_counter()
     create_db_and_tables()
+    startup_phases["create_tables"] = time.perf_counter() - started
     logger.info("数据库表已创建")
     logger.info(f"静态文件目录: {STATIC_FILES_DIR}")
     logger.info(f"PDF上传目录: {PDF_UPLOAD_DIR}")
     logger.info(f"PDF输出目录: {PDF_OUTPUT_DIR}")
 
 
+# 后台定时任务
+background_jobs = []
+
+
+async def write_metrics_snapshots(directory: str, interval: float):
+    """定期写入本进程的指标快照，供其他进程的 /metrics 汇总"""
+    while True:
+        try:
+            await run_in_threadpool(REGISTRY.write_snapshot, directory)
+        except Exception as e:
+            logger.warning(f"写入指标快照失败: {str(e)}")
+        await asyncio.sleep(interval)
+
+
+@app.on_event("startup")
+async def start_background_jobs():
+    """启动后台定时任务"""
+    started = time.perf_counter()
+    if IMAGE_GC_INTERVAL > 0:
+        background_jobs.append(asyncio.create_task(images.garbage_collector.run_periodically(IMAGE_GC_INTERVAL)))
+        logger.info(f"已启用图片存储垃圾回收，间隔: {IMAGE_GC_INTERVAL} 秒")
+    if METRICS_MULTIPROC_DIR:
+        background_jobs.append(asyncio.create_task(
+            write_metrics_snapshots(METRICS_MULTIPROC_DIR, METRICS_SNAPSHOT_INTERVAL)
+        ))
+    # PDF转换任务调度，工作进程在首次执行任务时才启动
+    pdfs.pdf_job_queue.start()
+    startup_phases["background_jobs"] = time.perf_counter() - started
+    
+    # 最后一个启动回调，此后即可接收请求
+    startup_phases["total"] = time.perf_counter() - IMPORT_STARTED
+    logger.info("启动耗时: " + ", ".join(f"{name} {elapsed * 1000:.0f}ms" for name, elapsed in startup_phases.items()))
+
+
+@app.on_event("shutdown")
+async def stop_background_jobs():
+    """停止后台定时任务，并等待已提交的图片后处理、缩略图和执行中的PDF转换任务完成"""
+    for job in background_jobs:
+        job.cancel()
+    started = time.perf_counter()
+    await pdfs.pdf_job_queue.stop(PDF_JOB_SHUTDOWN_TIMEOUT)
+    await run_in_threadpool(image_tasks.executor.shutdown, True)
+    await run_in_threadpool(images.thumbnail_service.executor.shutdown, True)
+    logger.info(f"后台任务已完成，等待 {(time.perf_counter() - started) * 1000:.0f}ms")
+    if METRICS_MULTIPROC_DIR:
+        # 退出前写入最终快照，本进程的累计值仍计入汇总
+        REGISTRY.write_snapshot(METRICS_MULTIPROC_DIR)
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus文本格式的监控指标（配置了 METRICS_MULTIPROC_DIR 时为所有工作进程之和）"""
+    if METRICS_MULTIPROC_DIR:
+        REGISTRY.write_snapshot(METRICS_MULTIPROC_DIR)
+        content = REGISTRY.render_multiprocess(METRICS_MULTIPROC_DIR)
+    else:
+        content = REGISTRY.render()
+    return PlainTextResponse(content, media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/metrics/cache", include_in_schema=False)
+def record_cache_metrics():
+    """当前进程的记录缓存命中统计"""
+    return cache_stats()
+
+
 @app.get("/")
 def read_root():
     """根路径"""
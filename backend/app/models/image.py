@@ -1,6 +1,7 @@
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 from sqlmodel import Field, SQLModel
+from sqlalchemy import Index
 
 
 class ImageBase(SQLModel):
@@ -11,10 +12,27 @@ class ImageBase(SQLModel):
     size: int
     content_type: str
     description: Optional[str] = None
+    file_hash: Optional[str] = Field(default=None, max_length=64, index=True)
+    webp_path: Optional[str] = None
+    avif_path: Optional[str] = None
+    # 以下字段由上传后的后台任务填充
+    width: Optional[int] = None
+    height: Optional[int] = None
+    image_format: Optional[str] = Field(default=None, max_length=16, index=True)
+    exif_make: Optional[str] = None
+    exif_model: Optional[str] = None
+    exif_orientation: Optional[int] = None
+    exif_taken_at: Optional[datetime] = Field(default=None, index=True)
 
 
 class Image(ImageBase, table=True):
     """图片数据表模型"""
+    __table_args__ = (
+        # 列表按 (created_at, id) 倒序做键集分页
+        Index("ix_image_created_at_id", "created_at", "id"),
+        Index("ix_image_content_type_created_at_id", "content_type", "created_at", "id"),
+    )
+    
     id: Optional[int] = Field(default=None, primary_key=True)
     created_at: datetime = Field(default_factory=datetime.now)
 
@@ -27,4 +45,37 @@ class ImageCreate(ImageBase):
 class ImageRead(ImageBase):
     """图片读取模型"""
     id: int
-    created_at: datetime 
\ No newline at end of file
+    created_at: datetime 
+
+class ImageBatchResult(SQLModel):
+    """批量上传中单个文件的结果"""
+    filename: Optional[str] = None
+    success: bool
+    image: Optional[ImageRead] = None
+    error: Optional[str] = None
+
+
+class ChunkedUploadCreate(SQLModel):
+    """分块上传会话创建模型"""
+    filename: str
+    content_type: str
+    size: int = Field(gt=0)
+    sha256: Optional[str] = Field(default=None, min_length=64, max_length=64)
+
+
+class ChunkedUploadStatus(SQLModel):
+    """分块上传会话状态模型"""
+    upload_id: str
+    offset: int
+    size: int
+
+
+class ImageBulkDelete(SQLModel):
+    """批量删除请求模型"""
+    ids: List[int] = Field(min_length=1, max_length=1000)
+
+
+class ImageBulkDeleteResult(SQLModel):
+    """批量删除结果模型"""
+    deleted: List[int]
+    not_found: List[int]
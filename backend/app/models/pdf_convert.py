@@ -1,7 +1,7 @@
 from datetime import datetime
 from typing import Optional
 from sqlmodel import Field, SQLModel
-from sqlalchemy import Column, Text
+from sqlalchemy import Column, Index, LargeBinary, Text
 
 
 class PDFConversionBase(SQLModel):
@@ -13,14 +13,76 @@ class PDFConversionBase(SQLModel):
     text_content: Optional[str] = Field(default=None, sa_column=Column(Text))
     processed_text: Optional[str] = Field(default=None, sa_column=Column(Text))
     markdown_path: Optional[str] = None
+    # 文本存放在文本存储中时记录内容哈希，对应的文本列为空
+    text_hash: Optional[str] = Field(default=None, max_length=64)
+    processed_text_hash: Optional[str] = Field(default=None, max_length=64)
 
 
 class PDFConversion(PDFConversionBase, table=True):
     """PDF转换数据表模型"""
+    __table_args__ = (
+        # 列表按 (created_at, id) 倒序做键集分页
+        Index("ix_pdfconversion_created_at_id", "created_at", "id"),
+    )
+    
     id: Optional[int] = Field(default=None, primary_key=True)
     created_at: datetime = Field(default_factory=datetime.now)
 
 
+class PDFTextBlob(SQLModel, table=True):
+    """压缩后的PDF文本（数据库文本存储使用）"""
+    __table_args__ = (
+        Index("ix_pdftextblob_conversion_kind_hash", "conversion_id", "kind", "content_hash"),
+    )
+    
+    id: Optional[int] = Field(default=None, primary_key=True)
+    conversion_id: int
+    kind: str = Field(max_length=16)
+    content_hash: str = Field(max_length=64)
+    codec: str = Field(max_length=8)
+    # LONGBLOB级别的长度，避免MySQL默认BLOB的64KB限制
+    data: bytes = Field(sa_column=Column(LargeBinary(length=2 ** 32 - 1), nullable=False))
+
+
+class PDFJob(SQLModel, table=True):
+    """PDF转换任务（由任务队列在工作进程中执行）"""
+    __table_args__ = (
+        # 调度时按状态取最早的任务
+        Index("ix_pdfjob_status_id", "status", "id"),
+    )
+    
+    id: Optional[int] = Field(default=None, primary_key=True)
+    original_filename: str
+    pdf_path: str
+    description: Optional[str] = Field(default=None, sa_column=Column(Text))
+    # queued / running / done / failed
+    status: str = Field(default="queued", max_length=16)
+    stage: Optional[str] = Field(default=None, max_length=32)
+    progress: int = 0
+    attempts: int = 0
+    error: Optional[str] = Field(default=None, sa_column=Column(Text))
+    conversion_id: Optional[int] = None
+    created_at: datetime = Field(default_factory=datetime.now)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    # 执行中的任务定期更新，超时未更新视为执行进程已退出，任务重新排队
+    heartbeat_at: Optional[datetime] = None
+
+
+class PDFJobEvent(SQLModel, table=True):
+    """PDF转换任务的进度事件（按ID顺序推送给客户端，ID可用作断线续传位置）"""
+    __table_args__ = (
+        Index("ix_pdfjobevent_job_id_id", "job_id", "id"),
+    )
+    
+    id: Optional[int] = Field(default=None, primary_key=True)
+    job_id: int
+    event: str = Field(max_length=32)
+    # JSON格式的事件内容
+    data: str = Field(default="{}", sa_column=Column(Text))
+    created_at: datetime = Field(default_factory=datetime.now)
+
+
 class PDFConversionCreate(PDFConversionBase):
     """PDF转换创建模型"""
     pass
@@ -31,4 +93,56 @@ class PDFConversionRead(PDFConversionBase):
     id: int
     created_at: datetime
     download_url: Optional[str] = None
-    markdown_url: Optional[str] = None 
\ No newline at end of file
+    markdown_url: Optional[str] = None 
+
+class PDFConversionSummary(SQLModel):
+    """PDF转换摘要模型（不含文本内容，用于列表和详情）"""
+    id: int
+    original_filename: str
+    output_filename: str
+    file_path: str
+    page_count: int
+    markdown_path: Optional[str] = None
+    created_at: datetime
+    download_url: Optional[str] = None
+    markdown_url: Optional[str] = None
+
+
+class PDFConversionMeta(SQLModel):
+    """PDF转换记录的摘要列和文本哈希（记录缓存保存的内容，不含文本列）"""
+    id: int
+    original_filename: str
+    output_filename: str
+    file_path: str
+    page_count: int
+    markdown_path: Optional[str] = None
+    created_at: datetime
+    text_hash: Optional[str] = None
+    processed_text_hash: Optional[str] = None
+
+
+class PDFSearchHit(SQLModel):
+    """PDF全文搜索结果（按页）"""
+    conversion_id: int
+    original_filename: str
+    page: int
+    snippet: str
+    score: Optional[float] = None
+    download_url: Optional[str] = None
+
+
+class PDFJobRead(SQLModel):
+    """PDF转换任务状态"""
+    id: int
+    original_filename: str
+    status: str
+    stage: Optional[str] = None
+    progress: int
+    attempts: int
+    error: Optional[str] = None
+    conversion_id: Optional[int] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    status_url: Optional[str] = None
+    result: Optional[PDFConversionSummary] = None
@@ -0,0 +1,99 @@
+"""
+压测用的本地替身服务：OpenAI兼容的 /v1/chat/completions 和 RAGFlow 数据集接口
+
+延迟通过环境变量配置：
+- FAKE_LLM_LATENCY: 每次补全的固定延迟秒数
+- FAKE_LLM_LATENCY_PER_KCHAR: 每千字符输出额外增加的延迟秒数，模拟生成耗时随输出长度增长
+- FAKE_LLM_STREAM_CHUNKS: 流式响应的分块数，延迟均匀分摊到各块
+- FAKE_RAGFLOW_LATENCY: RAGFlow每个请求的延迟秒数
+- FAKE_LLM_STATUS: 补全接口返回的HTTP状态码，非200时模拟模型服务出错
+
+用法: uvicorn bench.fake_services:app --port 18001
+"""
+import os
+import json
+import time
+import uuid
+import asyncio
+
+from fastapi import FastAPI, Request, UploadFile, File
+from fastapi.responses import JSONResponse, StreamingResponse
+
+LLM_LATENCY = float(os.getenv("FAKE_LLM_LATENCY", "0.5"))
+LLM_LATENCY_PER_KCHAR = float(os.getenv("FAKE_LLM_LATENCY_PER_KCHAR", "0"))
+LLM_STREAM_CHUNKS = int(os.getenv("FAKE_LLM_STREAM_CHUNKS", "20"))
+RAGFLOW_LATENCY = float(os.getenv("FAKE_RAGFLOW_LATENCY", "0.05"))
+LLM_STATUS = int(os.getenv("FAKE_LLM_STATUS", "200"))
+
+# AIProcessor的提示词以该标记结尾，之后是待处理的正文
+TEXT_MARKER = "请开始处理以下文本："
+
+app = FastAPI(title="压测替身服务")
+
+stats = {"chat_completions": 0, "ragflow_documents": 0, "ragflow_chunks": 0}
+
+
+def _fake_completion(prompt: str) -> str:
+    """回显正文部分，输出长度与真实模型处理后的文本相当"""
+    text = prompt.split(TEXT_MARKER, 1)[-1].strip()
+    return f"### 处理结果\n\n{text}"
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    stats["chat_completions"] += 1
+    payload = await request.json()
+    if LLM_STATUS != 200:
+        await asyncio.sleep(LLM_LATENCY)
+        return JSONResponse({"error": {"message": "fake failure"}}, status_code=LLM_STATUS)
+    prompt = payload["messages"][-1]["content"]
+    content = _fake_completion(prompt)
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    latency = LLM_LATENCY + LLM_LATENCY_PER_KCHAR * len(content) / 1000
+
+    if not payload.get("stream"):
+        await asyncio.sleep(latency)
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": payload.get("model"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": len(prompt), "completion_tokens": len(content), "total_tokens": len(prompt) + len(content)},
+        }
+
+    async def events():
+        chunks = max(LLM_STREAM_CHUNKS, 1)
+        size = max(len(content) // chunks + 1, 1)
+        for start in range(0, len(content), size):
+            await asyncio.sleep(latency / chunks)
+            delta = {"choices": [{"index": 0, "delta": {"content": content[start:start + size]}, "finish_reason": None}]}
+            yield f"data: {json.dumps(delta, ensure_ascii=False)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.post("/api/v1/datasets/{dataset_id}/documents")
+async def upload_documents(dataset_id: str, file: list[UploadFile] = File(...)):
+    stats["ragflow_documents"] += 1
+    await asyncio.sleep(RAGFLOW_LATENCY)
+    documents = []
+    for item in file:
+        size = len(await item.read())
+        documents.append({"id": uuid.uuid4().hex, "name": item.filename, "size": size, "dataset_id": dataset_id})
+    return {"code": 0, "data": documents}
+
+
+@app.post("/api/v1/datasets/{dataset_id}/chunks")
+async def parse_documents(dataset_id: str, request: Request):
+    stats["ragflow_chunks"] += 1
+    await request.json()
+    await asyncio.sleep(RAGFLOW_LATENCY)
+    return {"code": 0}
+
+
+@app.get("/stats")
+def get_stats():
+    """各接口被调用次数，压测结束后用于核对"""
+    return stats
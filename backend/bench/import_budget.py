@@ -0,0 +1,69 @@
+"""
+冷启动导入预算检查
+
+在全新的解释器中导入 app.main，检查：
+1. 导入耗时（取多次运行的最小值）不超过预算；
+2. PDF/AI相关的重依赖没有在导入时加载，只在首次转换时导入。
+
+超出预算或加载了延迟依赖时以非零状态退出，可直接用于CI。
+
+用法: python -m bench.import_budget --budget-ms 1000 --runs 5
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 这些模块只在PDF转换/AI处理时使用，导入 app.main 时不应加载
+DEFERRED_MODULES = ("PyPDF2", "docx", "sseclient", "requests")
+
+PROBE = """
+import sys, time, json
+started = time.perf_counter()
+import app.main
+elapsed = time.perf_counter() - started
+print(json.dumps({
+    "import_ms": elapsed * 1000,
+    "loaded": [name for name in %r if name in sys.modules],
+}))
+""" % (DEFERRED_MODULES,)
+
+
+def probe(env: dict) -> dict:
+    output = subprocess.check_output([sys.executable, "-c", PROBE], cwd=BACKEND_DIR, env=env, text=True,
+                                     stderr=subprocess.DEVNULL)
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="检查导入 app.main 的耗时预算")
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("IMPORT_BUDGET_MS", "1000")))
+    parser.add_argument("--runs", type=int, default=5, help="运行次数，取最小值以排除磁盘缓存等干扰")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    # 导入时不应连接数据库，使用SQLite避免依赖外部服务
+    env.setdefault("DATABASE_URL", "sqlite:///app/data/import_budget.db")
+
+    results = [probe(env) for _ in range(args.runs)]
+    import_ms = min(result["import_ms"] for result in results)
+    loaded = sorted({name for result in results for name in result["loaded"]})
+
+    report = {"import_ms": round(import_ms, 1), "budget_ms": args.budget_ms, "deferred_loaded": loaded}
+    print(json.dumps(report, ensure_ascii=False))
+
+    failures = []
+    if import_ms > args.budget_ms:
+        failures.append(f"导入耗时 {import_ms:.0f}ms 超出预算 {args.budget_ms:.0f}ms")
+    if loaded:
+        failures.append(f"导入时加载了应延迟的模块: {', '.join(loaded)}")
+    for failure in failures:
+        print(failure, file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
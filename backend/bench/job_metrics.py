@@ -0,0 +1,97 @@
+"""
+转换任务监控指标检查
+
+转换在工作进程中执行，其中记录的AI请求、数据库语句和各阶段耗时需要汇总到服务进程的 /metrics。
+本检查启动替身服务（补全接口返回错误）和应用，提交一个PDF转换任务，等待结束后检查 /metrics
+中包含以下时间序列：
+
+- ai_request_duration_seconds 和 ai_request_errors_total：AI请求耗时和失败次数；
+- db_query_duration_seconds：数据库语句耗时（工作进程保存转换记录时的INSERT也计入其中）；
+- pdf_conversion_stage_duration_seconds：工作进程中记录的转换阶段（extract）。
+
+缺少任一序列时以非零状态退出，可直接用于CI。
+
+用法: python -m bench.job_metrics
+"""
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+import httpx
+
+from bench.run_bench import app_env, make_pdf, start_process, wait_ready
+
+# 指标名 -> 需要出现在该指标某个时间序列中的标签片段
+REQUIRED_SERIES = {
+    "ai_request_duration_seconds_count": "",
+    "ai_request_errors_total": 'reason="http_500"',
+    "db_query_duration_seconds_count": 'operation="INSERT"',
+    "pdf_conversion_stage_duration_seconds_count": 'stage="extract"',
+}
+
+
+def series_values(metrics: str, name: str, label: str) -> list:
+    """返回名称为name且标签包含label的各时间序列的值"""
+    pattern = re.compile(rf"^{re.escape(name)}(\{{[^}}]*\}})? (\S+)$", re.MULTILINE)
+    return [float(match.group(2)) for match in pattern.finditer(metrics) if label in (match.group(1) or "")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="检查转换任务的监控指标是否汇总到 /metrics")
+    parser.add_argument("--port", type=int, default=18010)
+    parser.add_argument("--fake-port", type=int, default=18011)
+    parser.add_argument("--timeout", type=float, default=120)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="picture-job-metrics-")
+    fake_url = f"http://127.0.0.1:{args.fake_port}"
+    base_url = f"http://127.0.0.1:{args.port}"
+    env = app_env(workdir, fake_url)
+    env.update({"FAKE_LLM_STATUS": "500", "FAKE_LLM_LATENCY": "0.05", "AI_CHUNK_TOKENS": "0"})
+
+    fake = start_process("bench.fake_services:app", args.fake_port, env, os.path.join(workdir, "fake.log"))
+    server = start_process("app.main:app", args.port, env, os.path.join(workdir, "server.log"))
+    try:
+        wait_ready(f"{fake_url}/stats", fake)
+        wait_ready(f"{base_url}/", server)
+        response = httpx.post(
+            f"{base_url}/api/pdfs/convert", files={"file": ("metrics.pdf", make_pdf(2), "application/pdf")}
+        )
+        response.raise_for_status()
+        job_url = f"{base_url}/api/pdfs/jobs/{response.json()['id']}"
+        deadline = time.monotonic() + args.timeout
+        while True:
+            job = httpx.get(job_url).json()
+            if job["status"] in ("done", "failed"):
+                break
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"等待转换任务超时: {job}")
+            time.sleep(0.2)
+        metrics = httpx.get(f"{base_url}/metrics").text
+    finally:
+        for process in (server, fake):
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    found = {
+        name: sum(series_values(metrics, name, label)) for name, label in REQUIRED_SERIES.items()
+    }
+    print(json.dumps({"job_status": job["status"], "series": found}, ensure_ascii=False))
+    failures = [f"/metrics 中缺少 {name}{{{label}}}" for name, label in REQUIRED_SERIES.items() if not found[name]]
+    for failure in failures:
+        print(failure, file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
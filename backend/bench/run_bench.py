@@ -0,0 +1,419 @@
+"""
+端到端压测
+
+在临时目录中启动替身服务（bench/fake_services.py）和应用本身（SQLite数据库），
+按配置的并发驱动图片上传、图片列表、PDF转换和文件下载接口，
+以JSON输出吞吐量、p50/p95/p99延迟和服务进程及转换子进程的峰值内存，便于逐版本对比。
+
+用法: python -m bench.run_bench --concurrency 16 --requests 500 --output bench-result.json
+"""
+import os
+import io
+import sys
+import json
+import time
+import shutil
+import asyncio
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+from typing import Callable, Dict, List, Optional
+
+import httpx
+from PIL import Image
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCENARIOS = ("upload", "list", "convert", "download")
+
+
+def make_png(size: int) -> bytes:
+    """生成随机噪点PNG，避免压缩后体积过小"""
+    image = Image.frombytes("RGB", (size, size), os.urandom(size * size * 3))
+    buffer = io.BytesIO()
+    image.save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def make_pdf(pages: int, lines_per_page: int = 40) -> bytes:
+    """生成包含文本的多页PDF（仅使用标准字体，不依赖第三方库）"""
+    objects = []
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    font_id = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    pages_id = add(b"")  # 占位，页面对象创建后回填
+    page_ids = []
+    for page in range(1, pages + 1):
+        lines = [f"Benchmark page {page} line {line}: the quick brown fox jumps over the lazy dog"
+                 for line in range(1, lines_per_page + 1)]
+        text = "BT /F1 10 Tf 12 TL 50 800 Td " + " ".join(f"({line}) '" for line in lines) + " ET"
+        stream = text.encode("latin-1")
+        content_id = add(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        page_ids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>" % (pages_id, font_id, content_id)
+        ))
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids).encode()
+    objects[pages_id - 1] = b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % len(page_ids)
+    catalog_id = add(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+
+    output = io.BytesIO()
+    output.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(output.tell())
+        output.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+    xref_offset = output.tell()
+    output.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        output.write(b"%010d 00000 n \n" % offset)
+    output.write(b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+                 % (len(objects) + 1, catalog_id, xref_offset))
+    return output.getvalue()
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """最近秩百分位数"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(int(round(fraction * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(index, len(ordered) - 1)]
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> dict:
+    total = len(latencies) + errors
+    milliseconds = [value * 1000 for value in latencies]
+    return {
+        "requests": total,
+        "errors": errors,
+        "duration_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(milliseconds, 0.50), 2),
+            "p95": round(percentile(milliseconds, 0.95), 2),
+            "p99": round(percentile(milliseconds, 0.99), 2),
+            "mean": round(sum(milliseconds) / len(milliseconds), 2) if milliseconds else 0.0,
+            "max": round(max(milliseconds), 2) if milliseconds else 0.0,
+        },
+    }
+
+
+async def run_scenario(count: int, concurrency: int, request: Callable) -> dict:
+    """以固定并发执行count次请求，request(index)返回响应"""
+    latencies: List[float] = []
+    errors = 0
+    next_index = 0
+
+    async def worker():
+        nonlocal errors, next_index
+        while next_index < count:
+            index = next_index
+            next_index += 1
+            started = time.perf_counter()
+            try:
+                response = await request(index)
+                ok = response.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - started)
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, count))))
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+
+def _status_kb(pid: int, field: str) -> Optional[int]:
+    """读取 /proc/<pid>/status 中的内存字段（kB），进程不存在或非Linux时返回None"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith(f"{field}:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def peak_rss_mb(pid: int) -> Optional[float]:
+    """进程峰值常驻内存（Linux读取VmHWM，其他平台尝试psutil当前值）"""
+    peak = _status_kb(pid, "VmHWM")
+    if peak is not None:
+        return round(peak / 1024, 1)
+    try:
+        import psutil
+        return round(psutil.Process(pid).memory_info().rss / 1024 ** 2, 1)
+    except Exception:
+        return None
+
+
+def descendants(pid: int) -> List[int]:
+    """进程的所有子孙进程（Linux读取 /proc/<pid>/task/*/children）"""
+    result = []
+    pending = [pid]
+    while pending:
+        parent = pending.pop()
+        try:
+            tasks = os.listdir(f"/proc/{parent}/task")
+        except OSError:
+            continue
+        for task in tasks:
+            try:
+                with open(f"/proc/{parent}/task/{task}/children") as f:
+                    children = [int(child) for child in f.read().split()]
+            except OSError:
+                continue
+            result.extend(children)
+            pending.extend(children)
+    return result
+
+
+class MemorySampler(threading.Thread):
+    """
+    压测期间定期采样服务进程及其子孙进程（PDF转换工作进程、并行提取进程）的内存
+
+    子进程可能在压测结束前退出（如并行提取进程），因此按间隔记录每个进程的峰值（VmHWM）
+    和同一时刻整棵进程树常驻内存（VmRSS）之和的最大值。
+    """
+
+    def __init__(self, pid: int, interval: float = 0.2):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.child_peaks: Dict[int, int] = {}
+        self.total_peak = 0
+        self._stop_event = threading.Event()
+
+    def sample(self):
+        total = _status_kb(self.pid, "VmRSS") or 0
+        for child in descendants(self.pid):
+            peak = _status_kb(child, "VmHWM")
+            if peak is not None:
+                self.child_peaks[child] = max(self.child_peaks.get(child, 0), peak)
+            total += _status_kb(child, "VmRSS") or 0
+        self.total_peak = max(self.total_peak, total)
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.sample()
+
+    def stop(self) -> dict:
+        """停止采样并返回结果（MB），非Linux平台上子进程相关的值为None"""
+        self._stop_event.set()
+        self.join()
+        self.sample()
+        return {
+            "workers": len(self.child_peaks),
+            "workers_peak_rss_mb": round(max(self.child_peaks.values()) / 1024, 1) if self.child_peaks else None,
+            "total_peak_rss_mb": round(self.total_peak / 1024, 1) if self.total_peak else None,
+        }
+
+
+def start_process(module: str, port: int, env: dict, log_path: str) -> subprocess.Popen:
+    log = open(log_path, "w")
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", module, "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT
+    )
+
+
+def wait_ready(url: str, process: subprocess.Popen, timeout: float = 30) -> float:
+    """等待服务可用，返回耗时秒数"""
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        if process.poll() is not None:
+            raise RuntimeError(f"服务进程已退出: {url}")
+        try:
+            if httpx.get(url, timeout=1).status_code < 500:
+                return time.perf_counter() - started
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.05)
+    raise RuntimeError(f"等待服务超时: {url}")
+
+
+def app_env(workdir: str, fake_url: str, database_url: str = "") -> dict:
+    """应用和替身服务的环境变量：数据和文件放在临时目录中，外部服务指向替身服务"""
+    env = dict(os.environ)
+    env.update({
+        "DATABASE_URL": database_url or f"sqlite:///{workdir}/bench.db",
+        "AI_BASE_URL": f"{fake_url}/v1",
+        "RAGFLOW_BASE_URL": fake_url,
+        "STATIC_FILES_DIR": f"{workdir}/images",
+        "PDF_UPLOAD_DIR": f"{workdir}/pdfs/uploads",
+        "PDF_OUTPUT_DIR": f"{workdir}/pdfs/outputs",
+        "TEXT_STORE_DIR": f"{workdir}/texts",
+        "SEARCH_INDEX_PATH": f"{workdir}/search.db",
+        "THUMBNAIL_CACHE_DIR": f"{workdir}/cache/thumbnails",
+        "IMAGE_CHUNKED_UPLOAD_DIR": f"{workdir}/cache/uploads",
+        "IMAGE_GC_INTERVAL": "0",
+    })
+    return env
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, text=True).strip()
+    except Exception:
+        return None
+
+
+async def run_benchmarks(args, base_url: str) -> Dict[str, dict]:
+    results: Dict[str, dict] = {}
+    png = make_png(args.image_size)
+    pdf = make_pdf(args.pdf_pages)
+    image_paths: List[str] = []
+    documents: List[str] = []
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        async def upload(index):
+            response = await client.post(
+                "/api/images/upload", files={"file": (f"bench-{index}.png", png, "image/png")}
+            )
+            if response.status_code < 400:
+                image_paths.append(response.json()["file_path"])
+            return response
+
+        async def list_images(index):
+            return await client.get("/api/images/", params={"limit": 50})
+
+        async def convert(index):
+            # 提交转换任务后轮询至完成，延迟为端到端转换耗时
+            response = await client.post(
+                "/api/pdfs/convert", files={"file": (f"bench-{index}.pdf", pdf, "application/pdf")}
+            )
+            if response.status_code >= 400:
+                return response
+            job_url = f"/api/pdfs/jobs/{response.json()['id']}"
+            while True:
+                response = await client.get(job_url)
+                job = response.json()
+                if response.status_code >= 400 or job["status"] in ("done", "failed"):
+                    break
+                await asyncio.sleep(0.1)
+            if job.get("status") == "failed":
+                # 任务失败按请求错误统计
+                raise httpx.HTTPError(f"转换任务失败: {job.get('error')}")
+            if job.get("status") == "done":
+                documents.append(job["result"]["output_filename"])
+            return response
+
+        async def download(index):
+            # 交替下载Word文档和图片
+            if documents and (index % 2 == 0 or not image_paths):
+                return await client.get(f"/api/pdfs/download/{documents[index % len(documents)]}")
+            return await client.get(f"/static/images/{image_paths[index % len(image_paths)]}")
+
+        handlers = {
+            "upload": (upload, args.requests),
+            "list": (list_images, args.requests),
+            "convert": (convert, args.pdf_requests),
+            "download": (download, args.requests),
+        }
+        for name in args.scenarios:
+            handler, count = handlers[name]
+            if name == "download" and not (documents or image_paths):
+                # 下载场景依赖前面上传或转换产生的文件
+                await run_scenario(min(args.concurrency, 8), args.concurrency, upload)
+            results[name] = await run_scenario(count, args.concurrency, handler)
+            print(f"{name}: {json.dumps(results[name], ensure_ascii=False)}", file=sys.stderr)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="图床服务端到端压测")
+    parser.add_argument("--concurrency", type=int, default=8, help="并发请求数")
+    parser.add_argument("--requests", type=int, default=200, help="上传/列表/下载场景的请求数")
+    parser.add_argument("--pdf-requests", type=int, default=20, help="PDF转换场景的请求数")
+    parser.add_argument("--pdf-pages", type=int, default=5, help="测试PDF页数")
+    parser.add_argument("--image-size", type=int, default=256, help="测试图片边长（像素）")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="逗号分隔的场景列表")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="替身LLM响应延迟秒数")
+    parser.add_argument("--ragflow-latency", type=float, default=0.05, help="替身RAGFlow响应延迟秒数")
+    parser.add_argument("--database-url", default="", help="默认使用临时目录中的SQLite")
+    parser.add_argument("--port", type=int, default=18000)
+    parser.add_argument("--fake-port", type=int, default=18001)
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--output", default="", help="结果JSON文件，默认输出到标准输出")
+    parser.add_argument("--keep-workdir", action="store_true", help="保留临时目录（数据库、文件和日志）")
+    args = parser.parse_args()
+    args.scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"未知场景: {', '.join(sorted(unknown))}")
+
+    workdir = tempfile.mkdtemp(prefix="picture-bench-")
+    fake_url = f"http://127.0.0.1:{args.fake_port}"
+    base_url = f"http://127.0.0.1:{args.port}"
+
+    env = app_env(workdir, fake_url, args.database_url)
+    env.update({
+        "FAKE_LLM_LATENCY": str(args.llm_latency),
+        "FAKE_RAGFLOW_LATENCY": str(args.ragflow_latency),
+    })
+
+    fake = start_process("bench.fake_services:app", args.fake_port, env, os.path.join(workdir, "fake.log"))
+    server = start_process("app.main:app", args.port, env, os.path.join(workdir, "server.log"))
+    try:
+        wait_ready(f"{fake_url}/stats", fake)
+        startup_s = wait_ready(f"{base_url}/", server)
+        sampler = MemorySampler(server.pid)
+        sampler.start()
+        try:
+            results = asyncio.run(run_benchmarks(args, base_url))
+        finally:
+            memory = sampler.stop()
+        report = {
+            "meta": {
+                "revision": git_revision(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+                "concurrency": args.concurrency,
+                "requests": args.requests,
+                "pdf_requests": args.pdf_requests,
+                "pdf_pages": args.pdf_pages,
+                "image_size": args.image_size,
+                "llm_latency_s": args.llm_latency,
+                "ragflow_latency_s": args.ragflow_latency,
+                "database": "sqlite" if not args.database_url else args.database_url.split(":", 1)[0],
+            },
+            "server": {
+                "startup_s": round(startup_s, 3),
+                "peak_rss_mb": peak_rss_mb(server.pid),
+                **memory,
+            },
+            "fake_services": httpx.get(f"{fake_url}/stats").json(),
+            "scenarios": results,
+        }
+    finally:
+        for process in (server, fake):
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        if not args.keep_workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+        else:
+            print(f"临时目录: {workdir}", file=sys.stderr)
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
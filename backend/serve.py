@@ -0,0 +1,102 @@
+"""
+生产环境启动入口
+
+与开发用的 run.py（单进程、自动重载）不同：
+- 多个工作进程，默认按CPU核数，由uvicorn主进程监管，异常退出的进程会被重新拉起；
+- 已安装uvloop/httptools时自动使用；
+- 可配置监听队列、长连接保持时间和单进程并发上限；
+- 单进程处理指定数量的请求后优雅重启，限制内存增长；
+- 收到SIGTERM后停止接收新连接，等待进行中的上传和转换完成（最多SERVER_GRACEFUL_TIMEOUT秒），
+  并在退出前等待后台图片处理任务结束；
+- 多个工作进程时：进程内记录缓存（RECORD_CACHE_BACKEND=local）无法在进程间失效，改为不缓存（none），
+  需要缓存时配置 RECORD_CACHE_BACKEND=redis；
+  各进程的指标快照写入 METRICS_MULTIPROC_DIR（未配置时使用临时目录），/metrics 输出所有进程之和。
+
+配置见 app/core/config.py 中的 SERVER_* 项。
+
+用法: python serve.py
+"""
+import os
+import inspect
+import logging
+import tempfile
+
+import uvicorn
+from dotenv import load_dotenv
+
+logger = logging.getLogger("serve")
+
+
+def resolve_workers(configured: int) -> int:
+    """0表示按CPU核数（容器内优先使用可用的CPU集合）"""
+    if configured > 0:
+        return configured
+    try:
+        return max(len(os.sched_getaffinity(0)), 1)
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def main():
+    # 加载环境变量（需在导入配置前完成）
+    load_dotenv()
+    from app.core.config import (
+        SERVER_HOST, SERVER_PORT, SERVER_WORKERS, SERVER_LOOP, SERVER_HTTP, SERVER_BACKLOG, SERVER_KEEPALIVE,
+        SERVER_LIMIT_CONCURRENCY, SERVER_MAX_REQUESTS, SERVER_MAX_REQUESTS_JITTER, SERVER_GRACEFUL_TIMEOUT,
+        RECORD_CACHE_BACKEND, METRICS_MULTIPROC_DIR
+    )
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    workers = resolve_workers(SERVER_WORKERS)
+    if workers > 1:
+        # 进程内缓存在某个进程删除记录后无法通知其他进程，其他进程会在TTL内继续返回已删除的记录
+        if RECORD_CACHE_BACKEND == "local":
+            logger.warning(
+                f"{workers} 个工作进程不能使用进程内记录缓存，已禁用记录缓存；"
+                "需要缓存时请设置 RECORD_CACHE_BACKEND=redis"
+            )
+            os.environ["RECORD_CACHE_BACKEND"] = "none"
+        metrics_dir = METRICS_MULTIPROC_DIR or os.path.join(tempfile.gettempdir(), f"picture-beg-metrics-{SERVER_PORT}")
+        # 清除上次运行的快照和已退出进程的累计值（只删除这些文件），工作进程启动后重新写入
+        os.makedirs(metrics_dir, exist_ok=True)
+        for name in os.listdir(metrics_dir):
+            if name.endswith((".json", ".json.tmp")):
+                os.remove(os.path.join(metrics_dir, name))
+        os.environ["METRICS_MULTIPROC_DIR"] = metrics_dir
+        logger.info(f"多进程指标快照目录: {metrics_dir}")
+    # 工作进程据此计算PDF并行提取的默认进程数
+    os.environ["SERVER_WORKERS"] = str(workers)
+
+    options = {
+        "host": SERVER_HOST,
+        "port": SERVER_PORT,
+        "workers": workers,
+        "loop": SERVER_LOOP,
+        "http": SERVER_HTTP,
+        "backlog": SERVER_BACKLOG,
+        "timeout_keep_alive": SERVER_KEEPALIVE,
+        "limit_concurrency": SERVER_LIMIT_CONCURRENCY or None,
+        "limit_max_requests": SERVER_MAX_REQUESTS or None,
+        "timeout_graceful_shutdown": SERVER_GRACEFUL_TIMEOUT,
+        # 部署在反向代理之后，信任其转发的客户端地址
+        "proxy_headers": True,
+        "forwarded_allow_ips": os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1"),
+        "access_log": False,
+    }
+    # 较新的uvicorn支持按进程随机抖动重启阈值
+    if SERVER_MAX_REQUESTS and "limit_max_requests_jitter" in inspect.signature(uvicorn.Config).parameters:
+        options["limit_max_requests_jitter"] = SERVER_MAX_REQUESTS_JITTER
+
+    logger.info(f"启动参数: {options}")
+    
+    # 在主进程中建表，避免多个工作进程同时建表；需先导入模型，表才会注册到元数据
+    from app.db.database import create_db_and_tables, engine
+    import app.models.image  # noqa: F401
+    import app.models.pdf_convert  # noqa: F401
+    create_db_and_tables()
+    engine.dispose()
+    uvicorn.run("app.main:app", **options)
+
+
+if __name__ == "__main__":
+    main()
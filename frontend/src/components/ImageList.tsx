@@ -3,7 +3,7 @@ import { Table, Button, Image, Modal, message, Tooltip, Space, Card, Typography
 import { DeleteOutlined, CopyOutlined, ExclamationCircleOutlined } from '@ant-design/icons';
 import { CopyToClipboard } from 'react-copy-to-clipboard';
 import { ImageType } from '../types/image';
-import { deleteImage } from '../services/api';
+import { deleteImage, getThumbnailUrl } from '../services/api';
 import './ImageList.css';
 
 const { Text } = Typography;
@@ -77,10 +77,10 @@ const ImageList: React.FC<ImageListProps> = ({ images, loading, onDelete }) => {
       dataIndex: 'url',
       key: 'thumbnail',
       width: 100,
-      render: (url: string, record: ImageType) => (
+      render: (_url: string, record: ImageType) => (
         <div className="p-1">
           <Image
-            src={url}
+            src={getThumbnailUrl(record.id, 140, 140)}
             alt={record.original_filename}
             width={70}
             height={70}
@@ -9,12 +9,31 @@ const api = axios.create({
   },
 });
 
-// 获取所有图片
+// 分页获取图片，nextCursor为空表示没有更多
+export const getImagesPage = async (
+  cursor?: string,
+  limit = 200,
+): Promise<{ items: ImageType[]; nextCursor: string | null }> => {
+  const response = await api.get('/api/images', { params: { cursor, limit } });
+  return { items: response.data, nextCursor: response.headers['x-next-cursor'] ?? null };
+};
+
+// 获取全部图片，按游标逐页读取直到没有下一页
 export const getImages = async (): Promise<ImageType[]> => {
-  const response = await api.get('/api/images');
-  return response.data;
+  const images: ImageType[] = [];
+  let cursor: string | undefined;
+  do {
+    const page = await getImagesPage(cursor);
+    images.push(...page.items);
+    cursor = page.nextCursor || undefined;
+  } while (cursor);
+  return images;
 };
 
+// 获取图片缩略图URL
+export const getThumbnailUrl = (id: number, width: number, height: number, fmt = 'webp'): string =>
+  `${api.defaults.baseURL}/api/images/${id}/thumb?w=${width}&h=${height}&fmt=${fmt}`;
+
 // 上传图片
 export const uploadImage = async (formData: FormData): Promise<ImageType> => {
   const response = await api.post('/api/images/upload', formData, {
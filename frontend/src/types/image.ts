@@ -6,5 +6,9 @@ export interface ImageType {
   size: number;
   content_type: string;
   description?: string;
+  file_hash?: string;
+  width?: number | null;
+  height?: number | null;
+  image_format?: string | null;
   created_at: string;
 } 
\ No newline at end of file